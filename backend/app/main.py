@@ -1,8 +1,14 @@
+import time
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from datetime import datetime
 from .routes.gmail import router as gmail_router
 from .routes.time import router as time_router
+from .services.gmail_fetcher import get_gmail_fetcher
+from .services.health import get_health_monitor
+from .services.jobs import get_job_manager
+from .services.metrics import CONTENT_TYPE, HTTP_LATENCY, HTTP_REQUESTS, render_metrics
 from .services.scheduler import get_scheduler
 import logging
 
@@ -19,8 +25,50 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor"],
 )
 
+class RequestMetricsMiddleware:
+    """Count requests and time them until the response headers are sent.
+
+    A plain ASGI middleware: response bodies, including streamed exports,
+    pass through without being buffered or moved to another task.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = None
+
+        def record(code):
+            # Label by route template (/api/gmail/messages/{message_id}) to bound cardinality
+            route = scope.get('route')
+            path = getattr(route, 'path', None) or 'unmatched'
+            HTTP_LATENCY.labels(scope['method'], path).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(scope['method'], path, code).inc()
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                record(status)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            if status is None:
+                # The app raised before responding; the server answers 500
+                record(500)
+
+app.add_middleware(RequestMetricsMiddleware)
+
 # Include routers
 app.include_router(gmail_router)
 app.include_router(time_router, prefix="/api")
@@ -35,12 +83,22 @@ async def startup_event():
     except Exception as e:
         logger.error(f"Failed to start Gmail scheduler: {e}")
 
+    try:
+        # Obtain the Gmail service and token before the first request needs them
+        get_gmail_fetcher().warm_up()
+    except Exception as e:
+        logger.error(f"Failed to initialize Gmail fetcher: {e}")
+    get_health_monitor().start()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop the Gmail scheduler on application shutdown."""
     try:
         scheduler = get_scheduler()
         scheduler.stop()
+        get_job_manager().shutdown()
+        get_health_monitor().stop()
+        get_gmail_fetcher().invalidate_service()
         logger.info("Gmail scheduler stopped on application shutdown")
     except Exception as e:
         logger.error(f"Failed to stop Gmail scheduler: {e}")
@@ -49,6 +107,11 @@ async def shutdown_event():
 def health():
     return {"status": "ok", "service": "GenAI Go Backend"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics in the text exposition format."""
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
 # Keep the original time endpoint for backward compatibility
 @app.get("/api/time")
 def get_current_time_legacy():
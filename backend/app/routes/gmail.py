@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from typing import List, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Iterator, List, Dict, Literal, Optional, Union
 from pydantic import BaseModel
+import json
 import logging
-from ..services.gmail_fetcher import GmailFetcher
+import zlib
+from ..services.gmail_fetcher import GmailFetcher, get_gmail_fetcher
+from ..services.message_store import decode_cursor, encode_cursor
+from ..services.health import get_health_monitor
+from ..services.jobs import get_job_manager
 from ..services.scheduler import get_scheduler
 
 # Configure logging
@@ -14,10 +20,12 @@ router = APIRouter(prefix="/api/gmail", tags=["gmail"])
 # Pydantic models for request/response
 class FetchResult(BaseModel):
     status: str
-    processed: int
+    processed: int = 0
     skipped: Optional[int] = None
     total_found: Optional[int] = None
+    sync_mode: Optional[str] = None
     message: Optional[str] = None
+    accounts: Optional[Dict[str, Dict]] = None
 
 class MessageData(BaseModel):
     messageId: str
@@ -27,62 +35,255 @@ class MessageData(BaseModel):
     retrievalTimestamp: str
     body: str
     bodyHash: str
+    normalizedHash: Optional[str] = None
+    clusterId: Optional[str] = None
+    account: Optional[str] = None
+
+class MessageSummary(BaseModel):
+    messageId: str
+    subject: str
+    sender: str
+    date: str
+    retrievalTimestamp: str
+    bodyHash: str
+    normalizedHash: Optional[str] = None
+    clusterId: Optional[str] = None
+    snippet: Optional[str] = None
+    account: Optional[str] = None
+
+class SearchResult(BaseModel):
+    messageId: str
+    subject: str
+    sender: str
+    date: Optional[str] = None
+    retrievalTimestamp: Optional[str] = None
+    score: float
+    snippet: Optional[str] = None
 
 class MessageStats(BaseModel):
     total_messages: int
     unique_senders: int
     date_range: Optional[Dict] = None
     senders: List[str] = []
+    sender_counts: Dict[str, int] = {}
 
 class SchedulerInfo(BaseModel):
     running: bool
     next_run_time: Optional[str] = None
     schedule: str
 
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    progress: Dict[str, int] = {}
+    result: Optional[FetchResult] = None
+    error: Optional[str] = None
+
 class JobLog(BaseModel):
     timestamp: str
     result: Dict
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    duration_seconds: Optional[float] = None
+    trigger: Optional[str] = None
+    stage_seconds: Optional[Dict[str, float]] = None
+    api_calls: Optional[Dict[str, int]] = None
+
+def shared_fetcher() -> GmailFetcher:
+    """Dependency providing the process-wide fetcher (config, credentials and service are cached)."""
+    try:
+        return get_gmail_fetcher()
+    except Exception as e:
+        logger.error(f"Failed to load Gmail fetcher: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/health")
-async def gmail_health():
-    """Check if Gmail fetcher is properly configured."""
+def gmail_health():
+    """Cached readiness: config, token expiry and last fetch outcome.
+
+    Served from a result refreshed in the background, so it is cheap
+    enough for frequent probes; a missing or stale result is recomputed
+    inline, in the threadpool rather than on the event loop. ``unhealthy``
+    is answered with 503 so probes fail; ``degraded`` keeps 200 since a
+    restart would not fix a failed fetch. Use ``/health/deep`` to contact Gmail.
+    """
+    result = get_health_monitor().get()
+    if result.get('status') == 'unhealthy':
+        return JSONResponse(status_code=503, content=result)
+    return result
+
+@router.get("/health/deep")
+def gmail_health_deep():
+    """Check connectivity by calling the Gmail API (users.getProfile)."""
     try:
-        fetcher = GmailFetcher()
-        # Try to initialize (this will check credentials)
-        service = fetcher._get_gmail_service()
-        return {"status": "healthy", "configured": True}
+        result = get_health_monitor().deep_check()
+        if result['status'] != 'healthy':
+            return JSONResponse(status_code=503, content=result)
+        return result
     except ValueError as e:
-        return {"status": "unhealthy", "configured": False, "error": str(e)}
+        return JSONResponse(status_code=503, content={"status": "unhealthy", "configured": False, "error": str(e)})
     except Exception as e:
-        return {"status": "unhealthy", "configured": False, "error": f"Unexpected error: {str(e)}"}
+        return JSONResponse(status_code=503, content={"status": "unhealthy", "configured": True, "error": f"Unexpected error: {str(e)}"})
+
+@router.post("/fetch", response_model=JobStatus, status_code=202)
+async def fetch_emails_now(fetcher: GmailFetcher = Depends(shared_fetcher)):
+    """Manually trigger email fetching.
 
-@router.post("/fetch", response_model=FetchResult)
-async def fetch_emails_now():
-    """Manually trigger email fetching."""
+    The fetch runs on a background worker; poll ``GET /jobs/{job_id}``
+    for progress and the final result.
+    """
     try:
-        fetcher = GmailFetcher()
-        result = fetcher.fetch_recent_emails()
-        return FetchResult(**result)
+        job = get_job_manager().submit("fetch", lambda progress: fetcher.fetch_recent_emails(progress=progress))
+        return JobStatus(**job.to_dict())
     except Exception as e:
         logger.error(f"Manual fetch failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/messages", response_model=List[MessageData])
-async def get_messages(limit: int = 100):
-    """Get stored messages."""
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str):
+    """Get the status, progress and result of a background fetch job."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobStatus(**job.to_dict())
+
+@router.get("/messages", response_model=List[Union[MessageSummary, MessageData]])
+def get_messages(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    view: Literal["summary", "full"] = "summary",
+    snippet: int = Query(0, ge=0, description="Include the first N characters of the body in summaries"),
+    before: Optional[str] = Query(None, description="Cursor: return messages older than this one"),
+    after: Optional[str] = Query(None, description="Cursor: return messages newer than this one"),
+    dedupe: Optional[Literal["near"]] = Query(None, description="near: only the first message of each near-duplicate cluster"),
+    fetcher: GmailFetcher = Depends(shared_fetcher)
+):
+    """Get stored messages, newest first.
+
+    Returns summaries without bodies by default; use ``view=full`` for the
+    old shape or ``GET /messages/{message_id}`` to load a single body.
+    Pages are chained with the ``X-Next-Cursor`` (pass as ``before``) and
+    ``X-Prev-Cursor`` (pass as ``after``) response headers.
+    """
     try:
-        fetcher = GmailFetcher()
-        messages = fetcher.get_stored_messages(limit=limit)
-        return [MessageData(**msg) for msg in messages]
+        before_key = decode_cursor(before) if before else None
+        after_key = decode_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        if view == "full":
+            messages = fetcher.get_stored_messages(limit=limit, before=before_key, after=after_key, dedupe=dedupe)
+        else:
+            messages = fetcher.get_stored_messages(
+                limit=limit, include_body=False, snippet_length=snippet,
+                before=before_key, after=after_key, dedupe=dedupe
+            )
     except Exception as e:
         logger.error(f"Failed to get messages: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    if messages:
+        response.headers["X-Prev-Cursor"] = encode_cursor(messages[0])
+        if len(messages) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(messages[-1])
+
+    if view == "full":
+        return [MessageData(**msg) for msg in messages]
+    return [MessageSummary(**msg) for msg in messages]
+
+def _ndjson_lines(messages: Iterator[Dict], compress: bool, flush_bytes: int = 64 * 1024) -> Iterator[bytes]:
+    """Serialize messages as NDJSON, optionally as one streaming gzip member."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = []
+    buffered = 0
+
+    for message in messages:
+        line = (json.dumps(dict(message), ensure_ascii=False) + "\n").encode("utf-8")
+        buffer.append(line)
+        buffered += len(line)
+        if buffered >= flush_bytes:
+            chunk = b"".join(buffer)
+            buffer, buffered = [], 0
+            if compressor is None:
+                yield chunk
+            else:
+                compressed = compressor.compress(chunk)
+                if compressed:
+                    yield compressed
+
+    chunk = b"".join(buffer)
+    if compressor is None:
+        if chunk:
+            yield chunk
+    else:
+        yield compressor.compress(chunk) + compressor.flush()
+
+@router.get("/messages/export")
+def export_messages(
+    since: Optional[str] = Query(None, description="Only messages retrieved at or after this ISO timestamp"),
+    include_body: bool = True,
+    gzip: bool = Query(False, description="gzip-compress the stream (Content-Encoding: gzip)"),
+    dedupe: Optional[Literal["near"]] = Query(None, description="near: only the first message of each near-duplicate cluster"),
+    fetcher: GmailFetcher = Depends(shared_fetcher)
+):
+    """Stream the message store as NDJSON, oldest first.
+
+    Output is written one chunk at a time. The SQLite store is also read in
+    chunks, so memory use does not grow with the corpus; the JSON store is
+    loaded whole first.
+    """
+    headers = {"Content-Disposition": 'attachment; filename="messages.ndjson"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _ndjson_lines(fetcher.export_messages(since=since, include_body=include_body, dedupe=dedupe), compress=gzip),
+        media_type="application/x-ndjson",
+        headers=headers
+    )
+
+@router.get("/messages/{message_id}", response_model=MessageData)
+def get_message(message_id: str, fetcher: GmailFetcher = Depends(shared_fetcher)):
+    """Get a single stored message including its body."""
+    try:
+        message = fetcher.get_stored_message(message_id)
+    except Exception as e:
+        logger.error(f"Failed to get message {message_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if message is None:
+        raise HTTPException(status_code=404, detail=f"Message {message_id} not found")
+    return MessageData(**message)
+
+@router.get("/search", response_model=List[SearchResult])
+def search_messages(
+    q: str = Query(..., min_length=1, description='Terms and "quoted phrases"; all must match. term* matches a prefix'),
+    sender: Optional[str] = Query(None, description="Only senders containing this text"),
+    since: Optional[str] = Query(None, description="Only messages retrieved at or after this ISO timestamp"),
+    until: Optional[str] = Query(None, description="Only messages retrieved at or before this ISO timestamp"),
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    fetcher: GmailFetcher = Depends(shared_fetcher)
+):
+    """Ranked full-text search over subject, sender and body."""
+    try:
+        results = fetcher.search_messages(q, sender=sender, since=since, until=until, limit=limit, offset=offset)
+        return [SearchResult(**result) for result in results]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Search failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/stats", response_model=MessageStats)
-async def get_message_stats():
+def get_message_stats(fetcher: GmailFetcher = Depends(shared_fetcher)):
     """Get message statistics."""
     try:
-        fetcher = GmailFetcher()
         stats = fetcher.get_message_stats()
         return MessageStats(**stats)
     except Exception as e:
@@ -90,11 +291,10 @@ async def get_message_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/scheduler", response_model=SchedulerInfo)
-async def get_scheduler_info():
+async def get_scheduler_info(fetcher: GmailFetcher = Depends(shared_fetcher)):
     """Get scheduler information."""
     try:
         scheduler = get_scheduler()
-        fetcher = GmailFetcher()
         
         return SchedulerInfo(
             running=scheduler.running,
@@ -106,7 +306,7 @@ async def get_scheduler_info():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/scheduler/start")
-async def start_scheduler():
+def start_scheduler():
     """Start the email scheduler."""
     try:
         scheduler = get_scheduler()
@@ -117,7 +317,7 @@ async def start_scheduler():
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/scheduler/stop")
-async def stop_scheduler():
+def stop_scheduler():
     """Stop the email scheduler."""
     try:
         scheduler = get_scheduler()
@@ -127,19 +327,19 @@ async def stop_scheduler():
         logger.error(f"Failed to stop scheduler: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/scheduler/run-now", response_model=FetchResult)
+@router.post("/scheduler/run-now", response_model=JobStatus, status_code=202)
 async def run_scheduler_now():
-    """Manually trigger the scheduled job."""
+    """Manually trigger the scheduled job on a background worker."""
     try:
         scheduler = get_scheduler()
-        result = scheduler.run_now()
-        return FetchResult(**result)
+        job = get_job_manager().submit("scheduler", lambda progress: scheduler.run_now(progress=progress))
+        return JobStatus(**job.to_dict())
     except Exception as e:
         logger.error(f"Failed to run scheduler job: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/scheduler/logs", response_model=List[JobLog])
-async def get_scheduler_logs(limit: int = 10):
+def get_scheduler_logs(limit: int = 10):
     """Get recent scheduler job logs."""
     try:
         scheduler = get_scheduler()
@@ -150,20 +350,19 @@ async def get_scheduler_logs(limit: int = 10):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/config")
-async def get_gmail_config():
+async def get_gmail_config(fetcher: GmailFetcher = Depends(shared_fetcher)):
     """Get current Gmail fetcher configuration (without sensitive data)."""
     try:
-        fetcher = GmailFetcher()
         settings = fetcher.fetcher_settings.copy()
         
         # Add some additional info
         config_info = {
             "settings": settings,
-            "credentials_configured": bool(
-                fetcher.gmail_config.get('gmail_credentials', {}).get('client_id') and
-                fetcher.gmail_config.get('gmail_credentials', {}).get('client_secret') and
-                fetcher.gmail_config.get('gmail_credentials', {}).get('refresh_token')
-            )
+            "credentials_configured": all(account.configured for account in fetcher.accounts),
+            "accounts": [
+                {"name": account.name, "credentials_configured": account.configured}
+                for account in fetcher.accounts
+            ]
         }
         
         return config_info
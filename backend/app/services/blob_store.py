@@ -0,0 +1,60 @@
+import gzip
+import os
+import re
+import tempfile
+import logging
+from typing import Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHA256_HEX = re.compile(r'^[0-9a-f]{64}$')
+
+class BodyBlobStore:
+    """Gzip-compressed, content-addressed storage for message bodies.
+
+    Each body is written once under its SHA-256 ``bodyHash``
+    (``<root>/ab/cdef....gz``); messages sharing a body share the blob.
+    """
+
+    def __init__(self, root: str, compress_level: int = 6):
+        self.root = root
+        self.compress_level = compress_level
+
+    def _path(self, digest: str) -> str:
+        if not SHA256_HEX.match(digest or ''):
+            raise ValueError(f"Invalid body hash: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:] + '.gz')
+
+    def exists(self, digest: str) -> bool:
+        try:
+            return os.path.exists(self._path(digest))
+        except ValueError:
+            return False
+
+    def put(self, digest: str, body: str) -> bool:
+        """Store ``body`` under ``digest``. Returns False if it was already stored."""
+        path = self._path(digest)
+        if os.path.exists(path):
+            return False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(body.encode('utf-8'), compresslevel=self.compress_level))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return True
+
+    def get(self, digest: str) -> Optional[str]:
+        """Return the body stored under ``digest``, or None if it is missing."""
+        try:
+            with open(self._path(digest), 'rb') as f:
+                return gzip.decompress(f.read()).decode('utf-8')
+        except (FileNotFoundError, ValueError):
+            return None
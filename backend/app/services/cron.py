@@ -0,0 +1,160 @@
+import logging
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import Optional, Set
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MONTH_NAMES = {name: i + 1 for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])}
+DAY_NAMES = {name: i for i, name in enumerate(['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+
+MACROS = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *'
+}
+
+# Give up looking for a match this far ahead (covers Feb 29 schedules)
+MAX_LOOKAHEAD_YEARS = 8
+
+def _parse_value(value: str, names: dict, field: str) -> int:
+    value = value.lower()
+    if value in names:
+        return names[value]
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Invalid value {value!r} in cron {field} field")
+
+def _parse_field(spec: str, low: int, high: int, field: str, names: Optional[dict] = None) -> Set[int]:
+    """Expand one cron field (``*``, ``a``, ``a-b``, ``*/n``, ``a-b/n``, ``a/n`` and
+    comma-separated lists of these) into the set of values it matches."""
+    names = names or {}
+    values = set()
+    for part in spec.split(','):
+        if not part:
+            raise ValueError(f"Empty list item in cron {field} field")
+        step = 1
+        if '/' in part:
+            part, step_str = part.split('/', 1)
+            if not step_str.isdigit() or int(step_str) == 0:
+                raise ValueError(f"Invalid step {step_str!r} in cron {field} field")
+            step = int(step_str)
+
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start_str, end_str = part.split('-', 1)
+            start = _parse_value(start_str, names, field)
+            end = _parse_value(end_str, names, field)
+        else:
+            start = _parse_value(part, names, field)
+            # "a/n" means every n-th value from a to the end of the range
+            end = high if step > 1 else start
+
+        if not (low <= start <= high and low <= end <= high):
+            raise ValueError(f"Value out of range {low}-{high} in cron {field} field: {spec!r}")
+        if start > end:
+            raise ValueError(f"Invalid range {start}-{end} in cron {field} field")
+        values.update(range(start, end + 1, step))
+    return values
+
+def resolve_timezone(name: Optional[str]) -> Optional[tzinfo]:
+    """Resolve a ``schedule_timezone`` setting. None means the server's local time."""
+    if not name:
+        return None
+    if name.upper() == 'UTC':
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name!r}")
+
+class CronExpression:
+    """A standard five-field cron expression evaluated in a given timezone.
+
+    Fields are minute, hour, day of month, month and day of week (0-7,
+    Sunday is 0 or 7; month and day names are accepted). As in cron, when
+    both day fields are restricted a day matching either one fires.
+    Wall-clock times skipped by a DST change never fire, and times
+    repeated by one fire once, at their first occurrence.
+    """
+
+    def __init__(self, expression: str, tz: Optional[tzinfo] = None):
+        self.expression = expression
+        self.tz = tz
+        spec = MACROS.get(expression.strip().lower(), expression)
+        fields = spec.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields, got {len(fields)}: {expression!r}")
+
+        minute, hour, day, month, weekday = fields
+        self.minutes = _parse_field(minute, 0, 59, 'minute')
+        self.hours = _parse_field(hour, 0, 23, 'hour')
+        self.days = _parse_field(day, 1, 31, 'day-of-month')
+        self.months = _parse_field(month, 1, 12, 'month', MONTH_NAMES)
+        # Fold 7 onto 0 (both mean Sunday)
+        self.weekdays = {d % 7 for d in _parse_field(weekday, 0, 7, 'day-of-week', DAY_NAMES)}
+        # As in Vixie cron, a field starting with "*" (including "*/n") is unrestricted
+        self.day_restricted = not day.startswith('*')
+        self.weekday_restricted = not weekday.startswith('*')
+
+    def _day_matches(self, t: datetime) -> bool:
+        day_ok = t.day in self.days
+        # Python counts Monday as 0, cron counts Sunday as 0
+        weekday_ok = (t.weekday() + 1) % 7 in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def _localize(self, t: datetime) -> Optional[datetime]:
+        """Attach the timezone to a wall-clock time; None if the time does not
+        exist (skipped by a DST transition)."""
+        aware = t.replace(tzinfo=self.tz) if self.tz else t.astimezone()
+        # astimezone(None) converts to local time
+        if aware.astimezone(timezone.utc).astimezone(self.tz).replace(tzinfo=None) != t:
+            return None
+        return aware
+
+    def next_after(self, after: datetime) -> Optional[datetime]:
+        """Return the first matching time strictly after ``after`` (timezone-aware).
+
+        Returns None if the expression can never match (e.g. ``0 0 30 2 *``).
+        """
+        if after.tzinfo is None:
+            after = after.astimezone()
+        # Work in wall-clock time of the schedule's timezone
+        local = after.astimezone(self.tz) if self.tz else after.astimezone()
+        t = local.replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * MAX_LOOKAHEAD_YEARS)
+
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+                continue
+            if t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+                continue
+            aware = self._localize(t)
+            # In a DST overlap the first occurrence of a repeated time may
+            # already be behind us; don't fire the same slot twice
+            if aware is not None and aware > after:
+                return aware
+            t += timedelta(minutes=1)
+        return None
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expression!r})"
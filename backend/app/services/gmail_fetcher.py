@@ -1,22 +1,93 @@
 import json
 import os
 import hashlib
-import base64
-import email
+import html
+import re
+import stat
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Iterator, Set, Tuple
 import logging
-from google.auth.transport.requests import Request
+import queue
+import threading
+import time
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from tinydb import TinyDB, Query
-from email.mime.text import MIMEText
+from .html_normalizer import get_html_normalizer, normalized_hash
+from .message_store import Cursor, MessageStore, open_message_store
+from .near_duplicates import DEFAULT_NEAR_THRESHOLD, is_cluster_representative
+from .mime_parser import (
+    BODY_PREFERENCES, DEFAULT_BODY_PREFERENCE, DEFAULT_MAX_BODY_BYTES, extract_payload_body, parse_raw_message
+)
+from .metrics import (
+    DEDUP_HITS, FETCH_DURATION, FETCH_RUNS, GMAIL_API_CALLS, MESSAGE_PARSE_SECONDS, MESSAGES_STORED,
+    STORE_LATENCY
+)
+from .rate_limiter import (
+    DEFAULT_MAX_RETRIES, DEFAULT_RETRY_BASE_DELAY, DEFAULT_RETRY_MAX_DELAY, DEFAULT_UNITS_PER_SECOND,
+    GmailRateLimiter, error_status, is_retryable, quota_cost
+)
+from .run_log import RunStats
+from .token_manager import DEFAULT_REFRESH_MARGIN, TokenManager, parse_token_expiry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Gmail API accepts at most 100 calls per batch request
+MAX_BATCH_SIZE = 100
+# messages().list returns at most 500 ids per page
+MAX_LIST_PAGE_SIZE = 500
+
+GMAIL_CONFIG_FILE = 'gmail.json'
+FETCHER_SETTINGS_FILE = 'fetcherSettings.json'
+
+# Name of the account configured by the top-level ``gmail_credentials``
+DEFAULT_ACCOUNT = 'default'
+# messages.get formats the parser understands
+MESSAGE_FORMATS = ('full', 'raw')
+# Accounts fetched in parallel by one run
+DEFAULT_MAX_CONCURRENT_ACCOUNTS = 4
+# Account names end up in file names (per-account sync checkpoints)
+ACCOUNT_NAME = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+class GmailAccount:
+    """One mailbox: its credentials, optional sender whitelist and cached Gmail service."""
+
+    def __init__(self, name: str, credentials_data: Dict, sender_whitelist: Optional[List[str]] = None):
+        self.name = name
+        # Points into the loaded gmail.json so refreshed tokens can be written back
+        self.credentials_data = credentials_data
+        self.sender_whitelist = sender_whitelist
+        self.service = None
+        self.credentials = None
+        self.token_manager: Optional[TokenManager] = None
+        self.rate_limiter: Optional[GmailRateLimiter] = None
+        self.history_fallback = False
+        self.lock = threading.Lock()
+
+    @property
+    def configured(self) -> bool:
+        return bool(
+            self.credentials_data.get('client_id') and
+            self.credentials_data.get('client_secret') and
+            self.credentials_data.get('refresh_token')
+        )
+
+    def close(self):
+        """Stop the token refresher and drop the cached service."""
+        with self.lock:
+            if self.token_manager:
+                self.token_manager.stop()
+                self.token_manager = None
+            self.service = None
+            self.credentials = None
+
 class GmailFetcher:
     def __init__(self, config_dir: str = None):
         """Initialize Gmail fetcher with configuration."""
@@ -29,16 +100,48 @@ class GmailFetcher:
             'data'
         )
         
+        # mtime of each config file when it was last loaded
+        self._config_mtimes: Dict[str, Optional[int]] = {}
         self.gmail_config = self._load_gmail_config()
         self.fetcher_settings = self._load_fetcher_settings()
-        self.service = None
+        self.accounts = self._load_accounts()
+        # Outcome of the most recent fetch run, for health checks
+        self.last_run: Optional[Dict] = None
+        self._fetch_lock = threading.Lock()
+        self._config_write_lock = threading.Lock()
+        
+    # The first account's service and credentials, for single-account callers
+    @property
+    def service(self):
+        return self.accounts[0].service
+        
+    @service.setter
+    def service(self, service):
+        self.accounts[0].service = service
         
+    @property
+    def credentials(self):
+        return self.accounts[0].credentials
+        
+    @property
+    def token_manager(self) -> Optional[TokenManager]:
+        return self.accounts[0].token_manager
+        
+    def _config_mtime(self, filename: str) -> Optional[int]:
+        try:
+            return os.stat(os.path.join(self.config_dir, filename)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+            
     def _load_gmail_config(self) -> Dict:
         """Load Gmail OAuth2 configuration."""
-        config_path = os.path.join(self.config_dir, 'gmail.json')
+        config_path = os.path.join(self.config_dir, GMAIL_CONFIG_FILE)
         try:
+            mtime = self._config_mtime(GMAIL_CONFIG_FILE)
             with open(config_path, 'r') as f:
-                return json.load(f)
+                config = json.load(f)
+            self._config_mtimes[GMAIL_CONFIG_FILE] = mtime
+            return config
         except FileNotFoundError:
             logger.error(f"Gmail config not found at {config_path}")
             raise
@@ -48,10 +151,13 @@ class GmailFetcher:
             
     def _load_fetcher_settings(self) -> Dict:
         """Load fetcher settings configuration."""
-        settings_path = os.path.join(self.config_dir, 'fetcherSettings.json')
+        settings_path = os.path.join(self.config_dir, FETCHER_SETTINGS_FILE)
         try:
+            mtime = self._config_mtime(FETCHER_SETTINGS_FILE)
             with open(settings_path, 'r') as f:
-                return json.load(f)
+                settings = json.load(f)
+            self._config_mtimes[FETCHER_SETTINGS_FILE] = mtime
+            return settings
         except FileNotFoundError:
             logger.error(f"Fetcher settings not found at {settings_path}")
             raise
@@ -59,60 +165,195 @@ class GmailFetcher:
             logger.error(f"Invalid JSON in fetcher settings at {settings_path}")
             raise
             
-    def _get_gmail_service(self):
-        """Initialize and return Gmail API service."""
-        if self.service:
-            return self.service
+    def _load_accounts(self) -> List[GmailAccount]:
+        """Build the configured accounts.
+
+        ``gmail.json`` either holds a single ``gmail_credentials`` block (the
+        ``default`` account) or an ``accounts`` list of
+        ``{name, gmail_credentials, sender_whitelist?}`` entries.
+        """
+        entries = self.gmail_config.get('accounts')
+        if not entries:
+            return [GmailAccount(DEFAULT_ACCOUNT, self.gmail_config.setdefault('gmail_credentials', {}))]
             
-        credentials_data = self.gmail_config.get('gmail_credentials', {})
+        accounts = []
+        for index, entry in enumerate(entries):
+            name = entry.get('name') or f'account{index + 1}'
+            if not ACCOUNT_NAME.match(name):
+                raise ValueError(f"Invalid Gmail account name in gmail.json: {name!r} (use letters, digits, '.', '_' or '-')")
+            if any(account.name == name for account in accounts):
+                raise ValueError(f"Duplicate Gmail account name in gmail.json: {name}")
+            accounts.append(GmailAccount(
+                name,
+                entry.setdefault('gmail_credentials', {}),
+                entry.get('sender_whitelist')
+            ))
+        return accounts
+        
+    def get_account(self, name: Optional[str] = None) -> GmailAccount:
+        """Return the named account, or the first one when ``name`` is None."""
+        if name is None:
+            return self.accounts[0]
+        for account in self.accounts:
+            if account.name == name:
+                return account
+        raise ValueError(f"Unknown Gmail account: {name}")
+        
+    def refresh_config(self) -> bool:
+        """Reload any config file that changed on disk since it was loaded.
+
+        A changed ``gmail.json`` also drops the cached credentials and
+        service. Returns True if anything was reloaded.
+        """
+        reloaded = False
+        if self._config_mtime(FETCHER_SETTINGS_FILE) != self._config_mtimes.get(FETCHER_SETTINGS_FILE):
+            logger.info("Fetcher settings changed on disk, reloading")
+            self.fetcher_settings = self._load_fetcher_settings()
+            # Rebuilt on next use with the new quota and retry settings
+            for account in self.accounts:
+                account.rate_limiter = None
+            reloaded = True
+        if self._config_mtime(GMAIL_CONFIG_FILE) != self._config_mtimes.get(GMAIL_CONFIG_FILE):
+            logger.info("Gmail config changed on disk, reloading")
+            gmail_config = self._load_gmail_config()
+            self.invalidate_service()
+            self.gmail_config = gmail_config
+            self.accounts = self._load_accounts()
+            reloaded = True
+        return reloaded
         
-        if not all([
-            credentials_data.get('client_id'),
-            credentials_data.get('client_secret'),
-            credentials_data.get('refresh_token')
-        ]):
-            raise ValueError("Missing required Gmail credentials. Please configure gmail.json")
+    def invalidate_service(self):
+        """Drop the cached credentials and Gmail services so the next call rebuilds them."""
+        for account in self.accounts:
+            account.close()
+            
+    def warm_up(self):
+        """Build the services (and obtain tokens) in the background, ahead of the first request."""
+        def _warm():
+            for account in self.accounts:
+                try:
+                    self._get_gmail_service(account)
+                except Exception as e:
+                    logger.warning(f"Could not initialize Gmail service for account {account.name}: {e}")
+        threading.Thread(target=_warm, name='gmail-warm-up', daemon=True).start()
+            
+    def _get_gmail_service(self, account: Optional[GmailAccount] = None):
+        """Initialize and return the account's Gmail API service (built once and cached)."""
+        account = account or self.accounts[0]
+        if account.service:
+            return account.service
+        with account.lock:
+            if account.service is None:
+                account.service = self._build_gmail_service(account)
+            return account.service
+            
+    def _get_rate_limiter(self, account: Optional[GmailAccount] = None) -> GmailRateLimiter:
+        """The account's quota limiter (Gmail quotas are per mailbox)."""
+        account = account or self.accounts[0]
+        with account.lock:
+            if account.rate_limiter is None:
+                account.rate_limiter = GmailRateLimiter(
+                    units_per_second=float(self.fetcher_settings.get('quota_units_per_second', DEFAULT_UNITS_PER_SECOND)),
+                    max_retries=int(self.fetcher_settings.get('max_retries', DEFAULT_MAX_RETRIES)),
+                    base_delay=float(self.fetcher_settings.get('retry_base_delay', DEFAULT_RETRY_BASE_DELAY)),
+                    max_delay=float(self.fetcher_settings.get('retry_max_delay', DEFAULT_RETRY_MAX_DELAY))
+                )
+            return account.rate_limiter
+            
+    def _build_gmail_service(self, account: GmailAccount):
+        credentials_data = account.credentials_data
+        
+        if not account.configured:
+            if account.name == DEFAULT_ACCOUNT:
+                raise ValueError("Missing required Gmail credentials. Please configure gmail.json")
+            raise ValueError(f"Missing required Gmail credentials for account {account.name}. Please configure gmail.json")
             
         creds = Credentials(
-            token=credentials_data.get('access_token'),
+            token=credentials_data.get('access_token') or None,
             refresh_token=credentials_data.get('refresh_token'),
             token_uri='https://oauth2.googleapis.com/token',
             client_id=credentials_data.get('client_id'),
-            client_secret=credentials_data.get('client_secret')
+            client_secret=credentials_data.get('client_secret'),
+            expiry=parse_token_expiry(credentials_data.get('token_expiry'))
         )
         
-        # Refresh token if needed
-        if not creds.valid:
-            if creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-                # Update the stored token
-                self._update_access_token(creds.token)
-            else:
-                raise ValueError("Invalid credentials. Please re-authenticate.")
-                
-        self.service = build('gmail', 'v1', credentials=creds)
-        return self.service
+        # The token manager refreshes ahead of expiry from here on; only a
+        # missing or already expired token is refreshed inline
+        token_manager = TokenManager(
+            creds,
+            on_refresh=lambda token, expiry: self._update_access_token(token, expiry, account),
+            refresh_margin=self.fetcher_settings.get('token_refresh_margin', DEFAULT_REFRESH_MARGIN)
+        )
+        try:
+            token_manager.get_credentials()
+        except Exception as e:
+            raise ValueError(f"Invalid credentials. Please re-authenticate. ({e})") from e
+        token_manager.start()
+        
+        account.token_manager = token_manager
+        account.credentials = creds
+        # Use the discovery document bundled with googleapiclient rather
+        # than fetching and caching it over the network
+        return build('gmail', 'v1', credentials=creds, static_discovery=True, cache_discovery=False)
         
-    def _update_access_token(self, new_token: str):
-        """Update the access token in the configuration file."""
-        config_path = os.path.join(self.config_dir, 'gmail.json')
-        self.gmail_config['gmail_credentials']['access_token'] = new_token
-        with open(config_path, 'w') as f:
-            json.dump(self.gmail_config, f, indent=2)
-            
-    def _get_messages_db(self) -> TinyDB:
-        """Get or create the messages database."""
+    def _update_access_token(self, new_token: str, expiry: Optional[datetime] = None,
+                             account: Optional[GmailAccount] = None):
+        """Update an account's access token and expiry in the configuration file (atomically).
+
+        The rewritten file keeps the original's permissions, since it holds
+        the client secret and refresh token.
+        """
+        config_path = os.path.join(self.config_dir, GMAIL_CONFIG_FILE)
+        credentials = (account or self.accounts[0]).credentials_data
+        with self._config_write_lock:
+            credentials['access_token'] = new_token
+            credentials['token_expiry'] = expiry.isoformat() if expiry else None
+            fd, tmp_path = tempfile.mkstemp(
+                dir=self.config_dir, prefix='.' + GMAIL_CONFIG_FILE, suffix='.tmp'
+            )
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self.gmail_config, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # mkstemp creates the file as 0600; keep whatever the original had
+                try:
+                    os.chmod(tmp_path, stat.S_IMODE(os.stat(config_path).st_mode))
+                except FileNotFoundError:
+                    pass
+                os.replace(tmp_path, config_path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            # Our own write is not a config change; keep the service we just built
+            self._config_mtimes[GMAIL_CONFIG_FILE] = self._config_mtime(GMAIL_CONFIG_FILE)
+            
+    def _get_messages_db_path(self) -> str:
+        """Resolve the configured storage path to an absolute file path."""
         storage_path = self.fetcher_settings.get('storage_path', '../data/messages.json')
         if storage_path.startswith('../'):
             # Convert relative path to absolute
-            db_path = os.path.join(self.data_dir, storage_path.replace('../data/', ''))
-        else:
-            db_path = storage_path
-            
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        return TinyDB(db_path)
+            return os.path.join(self.data_dir, storage_path.replace('../data/', ''))
+        return storage_path
+        
+    def _get_messages_db(self) -> MessageStore:
+        """Open the configured message store (TinyDB or SQLite)."""
+        return open_message_store(
+            self._get_messages_db_path(),
+            self.fetcher_settings.get('storage_backend'),
+            self.fetcher_settings.get('body_storage'),
+            self.fetcher_settings.get('search_index', True),
+            self.fetcher_settings.get('near_duplicate_threshold', DEFAULT_NEAR_THRESHOLD)
+        )
         
-    def _build_search_query(self) -> str:
+    def _get_sender_whitelist(self, account: Optional[GmailAccount] = None) -> List[str]:
+        """The account's own whitelist if it has one, else the global ``sender_whitelist``."""
+        if account is not None and account.sender_whitelist is not None:
+            return account.sender_whitelist
+        return self.fetcher_settings.get('sender_whitelist', [])
+        
+    def _build_search_query(self, account: Optional[GmailAccount] = None) -> str:
         """Build Gmail search query for recent messages."""
         lookback_hours = self.fetcher_settings.get('lookback_hours', 24)
         since_date = datetime.utcnow() - timedelta(hours=lookback_hours)
@@ -121,7 +362,7 @@ class GmailFetcher:
         date_str = since_date.strftime('%Y/%m/%d')
         
         # Build sender filter
-        whitelist = self.fetcher_settings.get('sender_whitelist', [])
+        whitelist = self._get_sender_whitelist(account)
         if whitelist:
             sender_filter = ' OR '.join([f'from:{sender}' for sender in whitelist])
             query = f'after:{date_str} ({sender_filter})'
@@ -131,37 +372,44 @@ class GmailFetcher:
         logger.info(f"Gmail search query: {query}")
         return query
         
+    def _get_message_format(self) -> str:
+        """The ``format`` messages are downloaded in (``message_format`` setting)."""
+        message_format = self.fetcher_settings.get('message_format', 'full')
+        if message_format not in MESSAGE_FORMATS:
+            raise ValueError(f"Unknown message_format: {message_format}")
+        return message_format
+        
+    def _get_body_options(self) -> Tuple[str, int]:
+        preference = self.fetcher_settings.get('body_preference', DEFAULT_BODY_PREFERENCE)
+        if preference not in BODY_PREFERENCES:
+            raise ValueError(f"Unknown body_preference: {preference}")
+        max_bytes = int(self.fetcher_settings.get('max_body_bytes', DEFAULT_MAX_BODY_BYTES))
+        return preference, max_bytes
+        
     def _extract_message_data(self, message: Dict) -> Optional[Dict]:
-        """Extract relevant data from a Gmail message."""
+        """Extract relevant data from a Gmail message (``full`` or ``raw`` format)."""
         try:
-            payload = message.get('payload', {})
-            headers = payload.get('headers', [])
-            
-            # Extract headers
-            subject = None
-            sender = None
-            date = None
-            
-            for header in headers:
-                name = header.get('name', '').lower()
-                value = header.get('value', '')
+            preference, max_bytes = self._get_body_options()
+            if 'raw' in message:
+                headers, body = parse_raw_message(message['raw'], preference, max_bytes)
+            else:
+                payload = message.get('payload', {})
+                headers = {}
+                for header in payload.get('headers', []):
+                    headers.setdefault(header.get('name', '').lower(), header.get('value', ''))
+                body = extract_payload_body(payload, preference, max_bytes)
                 
-                if name == 'subject':
-                    subject = value
-                elif name == 'from':
-                    sender = value
-                elif name == 'date':
-                    date = value
-                    
-            # Extract message body
-            body = self._extract_body(payload)
+            subject = headers.get('subject')
+            sender = headers.get('from')
+            date = headers.get('date')
             
             if not all([subject, sender, date, body]):
                 logger.warning(f"Missing required fields for message {message.get('id')}")
                 return None
                 
-            # Compute body hash
+            # Compute body hash, and a hash of the text without markup and tracking
             body_hash = hashlib.sha256(body.encode('utf-8')).hexdigest()
+            text = get_html_normalizer().normalize(body, body_hash)
             
             return {
                 'messageId': message.get('id'),
@@ -170,7 +418,9 @@ class GmailFetcher:
                 'date': date,
                 'retrievalTimestamp': datetime.utcnow().isoformat() + 'Z',
                 'body': body,
-                'bodyHash': body_hash
+                'bodyHash': body_hash,
+                'normalizedHash': normalized_hash(text),
+                'snippet': html.unescape(message.get('snippet', '')) or text[:200]
             }
             
         except Exception as e:
@@ -178,29 +428,13 @@ class GmailFetcher:
             return None
             
     def _extract_body(self, payload: Dict) -> str:
-        """Extract body content from message payload."""
-        body_data = ""
-        
-        if 'parts' in payload:
-            # Multipart message
-            for part in payload['parts']:
-                if part.get('mimeType') in ['text/plain', 'text/html']:
-                    part_body = part.get('body', {}).get('data')
-                    if part_body:
-                        decoded = base64.urlsafe_b64decode(part_body).decode('utf-8')
-                        body_data += decoded + "\n"
-        else:
-            # Single part message
-            if payload.get('mimeType') in ['text/plain', 'text/html']:
-                body_content = payload.get('body', {}).get('data')
-                if body_content:
-                    body_data = base64.urlsafe_b64decode(body_content).decode('utf-8')
-                    
-        return body_data.strip()
+        """Extract body content from a ``format='full'`` message payload."""
+        preference, max_bytes = self._get_body_options()
+        return extract_payload_body(payload, preference, max_bytes)
         
-    def _is_sender_whitelisted(self, sender: str) -> bool:
+    def _is_sender_whitelisted(self, sender: str, account: Optional[GmailAccount] = None) -> bool:
         """Check if sender is in the whitelist."""
-        whitelist = self.fetcher_settings.get('sender_whitelist', [])
+        whitelist = self._get_sender_whitelist(account)
         if not whitelist:
             return True  # If no whitelist, allow all
             
@@ -212,133 +446,666 @@ class GmailFetcher:
             
         return email_part.lower() in [w.lower() for w in whitelist]
         
-    def fetch_recent_emails(self) -> Dict:
-        """Main method to fetch recent emails and store them."""
+    def _iter_full_messages(self, service, message_ids: List[str], account: Optional[GmailAccount] = None,
+                            message_format: Optional[str] = None) -> Iterator[Tuple[str, Optional[Dict], Optional[Exception]]]:
+        """Yield (message_id, message, error) for each id, fetching in batches.
+
+        Messages are retrieved with Gmail API batch requests of ``batch_size``
+        gets (configured in fetcherSettings.json), paced by the account's
+        quota limiter. Items that fail with a transient error (throttling,
+        5xx) are queued and retried in a later batch after a backoff; other
+        failures are reported per item so a single bad message does not
+        abort the rest of the batch. A ``batch_size`` of 1 falls back to one
+        request per message. ``message_format='metadata'`` gets only the
+        ``From`` header.
+        """
+        batch_size = max(1, min(int(self.fetcher_settings.get('batch_size', 50)), MAX_BATCH_SIZE))
+        message_format = message_format or self._get_message_format()
+        message_ids = list(dict.fromkeys(message_ids))
+        limiter = self._get_rate_limiter(account)
+        options = {'metadataHeaders': ['From']} if message_format == 'metadata' else {}
+
+        if batch_size == 1:
+            for msg_id in message_ids:
+                try:
+                    message = limiter.execute(
+                        service.users().messages().get(userId='me', id=msg_id, format=message_format, **options),
+                        'messages.get'
+                    )
+                    yield msg_id, message, None
+                except Exception as e:
+                    yield msg_id, None, e
+            return
+
+        for start in range(0, len(message_ids), batch_size):
+            retry_queue = message_ids[start:start + batch_size]
+            attempt = 0
+
+            while retry_queue:
+                chunk = retry_queue
+                results = {}
+
+                def _collect(request_id, response, exception):
+                    results[request_id] = (response, exception)
+
+                batch = service.new_batch_http_request(callback=_collect)
+                for msg_id in chunk:
+                    batch.add(
+                        service.users().messages().get(userId='me', id=msg_id, format=message_format, **options),
+                        request_id=msg_id
+                    )
+
+                limiter.acquire(quota_cost('messages.get', len(chunk)))
+                limiter.record_calls('messages.get', len(chunk))
+                limiter.record_calls('batch')
+                started = time.perf_counter()
+                try:
+                    batch.execute()
+                    limiter.observe_call('batch', started)
+                except Exception as e:
+                    limiter.observe_call('batch', started, e)
+                    logger.error(f"Batch request for {len(chunk)} messages failed: {e}")
+                    for msg_id in chunk:
+                        results.setdefault(msg_id, (None, e))
+
+                retry_queue = []
+                last_error = None
+                for msg_id in chunk:
+                    response, exception = results.get(
+                        msg_id, (None, RuntimeError("No response received in batch"))
+                    )
+                    GMAIL_API_CALLS.labels('messages.get', error_status(exception)).inc()
+                    if exception is not None and is_retryable(exception) and attempt < limiter.max_retries:
+                        retry_queue.append(msg_id)
+                        last_error = exception
+                        continue
+                    yield msg_id, response, exception
+
+                if retry_queue:
+                    logger.warning(f"Retrying {len(retry_queue)} messages after transient errors "
+                                   f"(attempt {attempt + 1}/{limiter.max_retries}): {last_error}")
+                    limiter.backoff(attempt, last_error)
+                    attempt += 1
+
+    def _filter_by_sender(self, service, message_ids: List[str],
+                          account: Optional[GmailAccount] = None) -> Tuple[List[str], int, int]:
+        """Keep the ids whose sender is whitelisted, reading only their ``From`` header.
+
+        History listings are not filtered by sender the way the ``from:``
+        query is, so this avoids downloading whole messages that would be
+        dropped. Returns (kept ids, skipped, failed) like ``_store_messages``.
+        """
+        kept = []
+        skipped_count = 0
+        failed_count = 0
+        for msg_id, message, error in self._iter_full_messages(service, message_ids, account, 'metadata'):
+            if error is not None:
+                logger.error(f"Error fetching headers of message {msg_id}: {error}")
+                skipped_count += 1
+                if is_retryable(error):
+                    failed_count += 1
+                continue
+            sender = next((header.get('value', '') for header in message.get('payload', {}).get('headers', [])
+                           if header.get('name', '').lower() == 'from'), '')
+            if self._is_sender_whitelisted(sender, account):
+                kept.append(msg_id)
+            else:
+                logger.info(f"Skipping message from non-whitelisted sender: {sender}")
+                skipped_count += 1
+        return kept, skipped_count, failed_count
+
+    def _iter_message_pages(self, service, query: str, http=None,
+                            account: Optional[GmailAccount] = None) -> Iterator[List[str]]:
+        """Lazily walk every page of messages().list, yielding one list of ids per page."""
+        page_size = max(1, min(int(self.fetcher_settings.get('list_page_size', 100)), MAX_LIST_PAGE_SIZE))
+        page_token = None
+
+        while True:
+            request = service.users().messages().list(
+                userId='me',
+                q=query,
+                labelIds=['INBOX'],
+                maxResults=page_size,
+                pageToken=page_token
+            )
+            result = self._get_rate_limiter(account).execute(request, 'messages.list', http=http)
+
+            message_ids = [msg_ref['id'] for msg_ref in result.get('messages', [])]
+            if message_ids:
+                yield message_ids
+
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return
+
+    def _iter_history_pages(self, service, start_history_id: str, query: str, http=None,
+                            account: Optional[GmailAccount] = None) -> Iterator[List[str]]:
+        """Yield ids of INBOX messages added since ``start_history_id``.
+
+        Gmail only keeps about a week of history; when the checkpoint is too
+        old the history API answers 404 and we fall back to the date-window
+        query instead.
+        """
+        page_size = max(1, min(int(self.fetcher_settings.get('list_page_size', 100)), MAX_LIST_PAGE_SIZE))
+        page_token = None
+
+        while True:
+            request = service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded'],
+                labelId='INBOX',
+                maxResults=page_size,
+                pageToken=page_token
+            )
+            try:
+                result = self._get_rate_limiter(account).execute(request, 'history.list', http=http)
+            except HttpError as e:
+                if page_token is None and getattr(e.resp, 'status', None) == 404:
+                    logger.warning(f"History checkpoint {start_history_id} is too old, falling back to query sync")
+                    (account or self.accounts[0]).history_fallback = True
+                    yield from self._iter_message_pages(service, query, http=http, account=account)
+                    return
+                raise
+
+            message_ids = []
+            for record in result.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    msg_id = added.get('message', {}).get('id')
+                    if msg_id:
+                        message_ids.append(msg_id)
+            if message_ids:
+                yield message_ids
+
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return
+
+    def _get_sync_state_path(self, account: Optional[GmailAccount] = None) -> str:
+        """Path of the file holding an account's incremental sync checkpoint."""
+        name = (account or self.accounts[0]).name
+        if name == DEFAULT_ACCOUNT:
+            return os.path.join(self.data_dir, 'gmail_sync_state.json')
+        return os.path.join(self.data_dir, f'gmail_sync_state.{name}.json')
+
+    def _load_history_checkpoint(self, account: Optional[GmailAccount] = None) -> Optional[str]:
+        """Return the last persisted historyId, if any."""
+        state_path = self._get_sync_state_path(account)
+        try:
+            with open(state_path, 'r') as f:
+                return json.load(f).get('historyId')
+        except FileNotFoundError:
+            return None
+        except (json.JSONDecodeError, AttributeError):
+            logger.warning(f"Ignoring unreadable sync state at {state_path}")
+            return None
+
+    def _save_history_checkpoint(self, history_id: str, account: Optional[GmailAccount] = None):
+        """Persist the historyId reached by a successful run (atomically)."""
+        state_path = self._get_sync_state_path(account)
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'historyId': history_id,
+                'updatedAt': datetime.utcnow().isoformat() + 'Z'
+            }, f, indent=2)
+        os.replace(tmp_path, state_path)
+
+    def _new_listing_http(self, account: Optional[GmailAccount] = None):
+        """Build a dedicated authorized HTTP client for the read-ahead lister.
+
+        httplib2 connections are not thread-safe, so listing in a background
+        thread must not share the service's transport.
+        """
+        credentials = (account or self.accounts[0]).credentials
+        if credentials is None:
+            return None
+        return AuthorizedHttp(credentials, http=httplib2.Http())
+
+    def _read_ahead(self, iterable: Iterator, depth: int = 1) -> Iterator:
+        """Consume ``iterable`` in a background thread, keeping ``depth`` items ready.
+
+        Used to list page N+1 while page N is being fetched and parsed.
+        Exceptions raised by the producer are re-raised in the consumer.
+        """
+        items = queue.Queue(maxsize=max(1, depth))
+        stop = threading.Event()
+        done = object()
+
+        def _put(entry) -> bool:
+            # Never block for good: the consumer may have stopped reading
+            while not stop.is_set():
+                try:
+                    items.put(entry, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def _produce():
+            try:
+                for item in iterable:
+                    if not _put((item, None)):
+                        return
+                _put((done, None))
+            except Exception as e:
+                _put((done, e))
+
+        producer = threading.Thread(target=_produce, name='gmail-read-ahead', daemon=True)
+        producer.start()
+        try:
+            while True:
+                item, error = items.get()
+                if error is not None:
+                    raise error
+                if item is done:
+                    return
+                yield item
+        finally:
+            stop.set()
+
+    def _store_messages(self, service, message_ids: List[str], pending: List[Dict],
+                        known_ids, queued_ids: Set[str], account: Optional[GmailAccount] = None,
+                        store_lock: Optional[threading.Lock] = None) -> Tuple[int, int, int]:
+        """Fetch and parse the given messages, queueing new ones on ``pending``.
+
+        Queued messages are written to the store in bulk by the caller and
+        tagged with the account they came from. Their ids go to
+        ``queued_ids``; they only join ``known_ids`` once written, so a run
+        that fails before flushing never marks them as stored. ``store_lock``
+        guards both when several accounts are fetched at once.
+        Returns (processed, skipped, failed). Failed messages are those
+        still failing with a transient error after retries; they are also
+        counted as skipped. Permanent errors (e.g. a 404 for a message
+        deleted since it was listed) only count as skipped.
+        """
+        account = account or self.accounts[0]
+        store_lock = store_lock or nullcontext()
+        processed_count = 0
+        skipped_count = 0
+        failed_count = 0
+
+        for msg_id, message, error in self._iter_full_messages(service, message_ids, account):
+            if error is not None:
+                logger.error(f"Error fetching message {msg_id}: {error}")
+                skipped_count += 1
+                if is_retryable(error):
+                    failed_count += 1
+                continue
+
+            try:
+                # Extract message data
+                with MESSAGE_PARSE_SECONDS.time():
+                    message_data = self._extract_message_data(message)
+                if not message_data:
+                    skipped_count += 1
+                    continue
+                    
+                # Check if sender is whitelisted
+                if not self._is_sender_whitelisted(message_data['sender'], account):
+                    logger.info(f"Skipping message from non-whitelisted sender: {message_data['sender']}")
+                    skipped_count += 1
+                    continue
+                    
+                # Guard against the same id being listed twice in one run
+                with store_lock:
+                    message_id = message_data['messageId']
+                    duplicate = message_id in known_ids or message_id in queued_ids
+                    if not duplicate:
+                        queued_ids.add(message_id)
+                if duplicate:
+                    DEDUP_HITS.labels('fetch').inc()
+                    logger.info(f"Message {message_data['messageId']} already exists, skipping")
+                    skipped_count += 1
+                    continue
+                    
+                # Queue message for the next bulk write
+                message_data['account'] = account.name
+                pending.append(message_data)
+                processed_count += 1
+                logger.info(f"Stored message: {message_data['subject'][:50]}...")
+                
+            except Exception as e:
+                # Parsing fails the same way on every run; don't hold the checkpoint back
+                logger.error(f"Error processing message {msg_id}: {e}")
+                skipped_count += 1
+                continue
+
+        return processed_count, skipped_count, failed_count
+
+    def fetch_recent_emails(self, progress: Optional[Callable[[str, int], None]] = None) -> Dict:
+        """Main method to fetch recent emails and store them.
+
+        ``progress(stage, count)`` is called as messages are listed,
+        fetched and stored, for callers that report on running jobs.
+        Runs on a shared instance are serialized.
+        """
+        with self._fetch_lock:
+            with FETCH_DURATION.time():
+                result = self._fetch_recent_emails(progress)
+            FETCH_RUNS.labels(result.get('status')).inc()
+            self.last_run = {
+                'status': result.get('status'),
+                'finished_at': datetime.utcnow().isoformat() + 'Z',
+                'message': result.get('message')
+            }
+            return result
+            
+    def _fetch_recent_emails(self, progress: Optional[Callable[[str, int], None]]) -> Dict:
         if not self.fetcher_settings.get('enabled', True):
             logger.info("Gmail fetcher is disabled")
             return {'status': 'disabled', 'processed': 0}
             
+        db = None
         try:
-            service = self._get_gmail_service()
-            query = self._build_search_query()
+            # Reject bad parser settings before anything is downloaded
+            self._get_message_format()
+            self._get_body_options()
             
-            # List messages
-            result = service.users().messages().list(
-                userId='me',
-                q=query,
-                labelIds=['INBOX']
-            ).execute()
+            # One store (and index of ids it already holds) shared by all accounts
+            db = self._get_messages_db()
+            with STORE_LATENCY.labels('load_ids').time():
+                known_ids = db.load_known_ids()
+            # Fetched this run but not yet written to the store
+            queued_ids: Set[str] = set()
+            store_lock = threading.Lock()
+            report = progress or (lambda stage, count: None)
+            stats = RunStats()
             
-            messages = result.get('messages', [])
-            logger.info(f"Found {len(messages)} messages matching criteria")
+            accounts = list(self.accounts)
+            workers = max(1, min(len(accounts), int(self.fetcher_settings.get(
+                'max_concurrent_accounts', DEFAULT_MAX_CONCURRENT_ACCOUNTS))))
+            if workers == 1:
+                results = {
+                    account.name: self._fetch_account(account, db, known_ids, queued_ids, store_lock, report, stats)
+                    for account in accounts
+                }
+            else:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gmail-account') as pool:
+                    futures = {
+                        account.name: pool.submit(
+                            self._fetch_account, account, db, known_ids, queued_ids, store_lock, report, stats
+                        )
+                        for account in accounts
+                    }
+                    results = {name: future.result() for name, future in futures.items()}
+                    
+            with stats.timed('store'), STORE_LATENCY.labels('save_ids').time():
+                known_ids.save()
+            result = self._combine_account_results(results)
+            result['stats'] = stats.to_dict()
+            return result
             
-            if not messages:
-                return {'status': 'success', 'processed': 0}
+        except Exception as e:
+            logger.error(f"Unexpected error: {e}")
+            return {'status': 'error', 'message': str(e)}
+        finally:
+            if db is not None:
+                db.close()
                 
-            # Get database
-            db = self._get_messages_db()
-            Message = Query()
+    def _fetch_account(self, account: GmailAccount, db: MessageStore, known_ids, queued_ids: Set[str],
+                       store_lock: threading.Lock, report: Callable[[str, int], None],
+                       stats: Optional[RunStats] = None) -> Dict:
+        """Fetch one account's new messages into the shared store.
+
+        Time spent listing, fetching and storing, and the API calls made,
+        are added to ``stats``.
+        """
+        stats = stats or RunStats()
+        limiter = self._get_rate_limiter(account)
+        calls_before = limiter.call_counts()
+        try:
+            return self._fetch_account_messages(account, db, known_ids, queued_ids, store_lock, report, stats)
+        finally:
+            calls_after = limiter.call_counts()
+            stats.count_calls({
+                method: count - calls_before.get(method, 0)
+                for method, count in calls_after.items()
+                if count != calls_before.get(method, 0)
+            })
+            
+    def _fetch_account_messages(self, account: GmailAccount, db: MessageStore, known_ids,
+                                queued_ids: Set[str], store_lock: threading.Lock, report: Callable[[str, int], None],
+                                stats: RunStats) -> Dict:
+        try:
+            service = self._get_gmail_service(account)
+            query = self._build_search_query(account)
+            max_messages = int(self.fetcher_settings.get('max_messages_per_run') or 0)
+            
+            # Capture the mailbox historyId before listing so nothing that
+            # arrives during the run is missed by the next incremental sync
+            with stats.timed('profile'):
+                history_id = self._get_rate_limiter(account).execute(
+                    service.users().getProfile(userId='me'), 'getProfile'
+                ).get('historyId')
+            checkpoint = None
+            if self.fetcher_settings.get('sync_mode', 'query') == 'incremental':
+                checkpoint = self._load_history_checkpoint(account)
+            account.history_fallback = False
+            
+            flush_threshold = max(1, int(self.fetcher_settings.get('bulk_flush_threshold', 500)))
+            pending = []
+            
+            def _flush():
+                with stats.timed('store'), store_lock:
+                    with STORE_LATENCY.labels('insert').time():
+                        db.insert_many(pending)
+                    # Only written messages are recorded in the saved id index
+                    for message in pending:
+                        known_ids.add(message['messageId'])
+                        queued_ids.discard(message['messageId'])
+                MESSAGES_STORED.labels(account.name).inc(len(pending))
+                report('stored', len(pending))
+                pending.clear()
             
             processed_count = 0
             skipped_count = 0
+            failed_count = 0
+            total_found = 0
+            capped = False
             
-            for msg_ref in messages:
-                try:
-                    # Get full message
-                    message = service.users().messages().get(
-                        userId='me',
-                        id=msg_ref['id'],
-                        format='full'
-                    ).execute()
-                    
-                    # Extract message data
-                    message_data = self._extract_message_data(message)
-                    if not message_data:
-                        skipped_count += 1
-                        continue
-                        
-                    # Check if sender is whitelisted
-                    if not self._is_sender_whitelisted(message_data['sender']):
-                        logger.info(f"Skipping message from non-whitelisted sender: {message_data['sender']}")
-                        skipped_count += 1
-                        continue
-                        
-                    # Check if message already exists (by messageId)
-                    existing = db.search(Message.messageId == message_data['messageId'])
-                    if existing:
-                        logger.info(f"Message {message_data['messageId']} already exists, skipping")
-                        skipped_count += 1
-                        continue
-                        
-                    # Store message
-                    db.insert(message_data)
-                    processed_count += 1
-                    logger.info(f"Stored message: {message_data['subject'][:50]}...")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing message {msg_ref.get('id')}: {e}")
-                    skipped_count += 1
-                    continue
+            # List pages lazily; the next page is listed while this one is processed
+            listing_http = self._new_listing_http(account)
+            if checkpoint:
+                logger.info(f"[{account.name}] Incremental sync from historyId {checkpoint}")
+                pages = self._iter_history_pages(service, checkpoint, query, http=listing_http, account=account)
+            else:
+                pages = self._iter_message_pages(service, query, http=listing_http, account=account)
+                
+            page_iter = self._read_ahead(pages)
+            try:
+                while True:
+                    # Time spent waiting for the lister to deliver the next page
+                    with stats.timed('list'):
+                        message_ids = next(page_iter, None)
+                    if message_ids is None:
+                        break
+                    if max_messages:
+                        message_ids = message_ids[:max_messages - total_found]
+                    total_found += len(message_ids)
+                    report('listed', len(message_ids))
+                
+                    # Never download messages that are already stored
+                    new_ids = [msg_id for msg_id in message_ids if msg_id not in known_ids]
+                    skipped_count += len(message_ids) - len(new_ids)
+                    DEDUP_HITS.labels('listing').inc(len(message_ids) - len(new_ids))
+                    logger.info(f"[{account.name}] Listed {len(message_ids)} messages ({total_found} so far), {len(new_ids)} new")
+                
+                    # History pages are not filtered by sender; check From before downloading
+                    if checkpoint and not account.history_fallback and new_ids and self._get_sender_whitelist(account):
+                        with stats.timed('fetch'):
+                            new_ids, skipped, failed = self._filter_by_sender(service, new_ids, account)
+                        skipped_count += skipped
+                        failed_count += failed
+                
+                    with stats.timed('fetch'):
+                        processed, skipped, failed = self._store_messages(
+                            service, new_ids, pending, known_ids, queued_ids, account=account, store_lock=store_lock
+                        )
+                    processed_count += processed
+                    skipped_count += skipped
+                    failed_count += failed
+                    report('fetched', len(new_ids) - failed)
+                
+                    # Very large runs are written in several bulk commits
+                    if len(pending) >= flush_threshold:
+                        _flush()
+                
+                    if max_messages and total_found >= max_messages:
+                        logger.info(f"[{account.name}] Reached max_messages_per_run ({max_messages}), stopping")
+                        capped = True
+                        break
+            finally:
+                # Stop the read-ahead lister if we stopped early or failed
+                page_iter.close()
                     
-            logger.info(f"Processed {processed_count} new messages, skipped {skipped_count}")
+            if pending:
+                _flush()
+            logger.info(f"[{account.name}] Found {total_found} messages matching criteria")
+            logger.info(f"[{account.name}] Processed {processed_count} new messages, skipped {skipped_count}")
+            
+            sync_mode = 'incremental' if checkpoint and not account.history_fallback else 'query'
+            
+            # Only advance the checkpoint when every listed message was handled;
+            # messages that failed permanently will not succeed on a later run
+            if history_id and not capped and not failed_count:
+                self._save_history_checkpoint(history_id, account)
             
             return {
                 'status': 'success',
                 'processed': processed_count,
                 'skipped': skipped_count,
-                'total_found': len(messages)
+                'total_found': total_found,
+                'sync_mode': sync_mode
             }
             
         except HttpError as e:
-            logger.error(f"Gmail API error: {e}")
+            logger.error(f"[{account.name}] Gmail API error: {e}")
             return {'status': 'error', 'message': str(e)}
         except Exception as e:
-            logger.error(f"Unexpected error: {e}")
+            logger.error(f"[{account.name}] Unexpected error: {e}")
             return {'status': 'error', 'message': str(e)}
             
-    def get_stored_messages(self, limit: int = 100) -> List[Dict]:
-        """Retrieve stored messages from database."""
+    def _combine_account_results(self, results: Dict[str, Dict]) -> Dict:
+        """Merge per-account results into one run result.
+
+        A single account's result is returned as is. Otherwise counts are
+        summed, per-account results are kept under ``accounts`` and the
+        status is ``partial`` when only some accounts failed.
+        """
+        if len(results) == 1:
+            return next(iter(results.values()))
+            
+        failed = {name: result for name, result in results.items() if result.get('status') == 'error'}
+        if len(failed) == len(results):
+            status = 'error'
+        elif failed:
+            status = 'partial'
+        else:
+            status = 'success'
+            
+        combined = {
+            'status': status,
+            'processed': sum(result.get('processed', 0) for result in results.values()),
+            'skipped': sum(result.get('skipped', 0) for result in results.values()),
+            'total_found': sum(result.get('total_found', 0) for result in results.values())
+        }
+        sync_modes = {result['sync_mode'] for result in results.values() if result.get('sync_mode')}
+        if sync_modes:
+            combined['sync_mode'] = sync_modes.pop() if len(sync_modes) == 1 else 'mixed'
+        if failed:
+            combined['message'] = '; '.join(f"{name}: {result.get('message')}" for name, result in failed.items())
+        combined['accounts'] = results
+        return combined
+            
+    def get_stored_messages(self, limit: int = 100, include_body: bool = True,
+                            snippet_length: int = 0, before: Optional[Cursor] = None,
+                            after: Optional[Cursor] = None, dedupe: Optional[str] = None) -> List[Dict]:
+        """Retrieve stored messages from database, newest first.
+
+        With ``include_body=False`` only summary fields are returned, plus a
+        ``snippet`` of up to ``snippet_length`` characters when requested.
+        ``before``/``after`` are keyset cursors (see ``MessageStore.get_page``).
+        ``dedupe='near'`` returns only the first message of each near-duplicate cluster.
+        """
         db = self._get_messages_db()
-        all_messages = db.all()
-        
-        # Sort by retrievalTimestamp (most recent first)
-        sorted_messages = sorted(
-            all_messages, 
-            key=lambda x: x.get('retrievalTimestamp', ''), 
-            reverse=True
-        )
+        try:
+            with STORE_LATENCY.labels('page').time():
+                if dedupe == 'near':
+                    messages = db.get_distinct_page(limit, before=before, after=after, include_body=include_body)
+                else:
+                    messages = db.get_page(limit, before=before, after=after, include_body=include_body)
+            if include_body:
+                return [db.load_body(msg) for msg in messages]
+                
+            summaries = []
+            for msg in messages:
+                snippet = msg.pop('snippet', None)
+                if snippet_length > 0:
+                    if not snippet:
+                        # Older records have no stored snippet; fall back to the body text
+                        record = db.load_body(db.get_message(msg['messageId']) or msg)
+                        snippet = get_html_normalizer().normalize(record.get('body', ''), record.get('bodyHash'))
+                    msg['snippet'] = snippet[:snippet_length]
+                summaries.append(msg)
+            return summaries
+        finally:
+            db.close()
+            
+    def get_stored_message(self, message_id: str) -> Optional[Dict]:
+        """Retrieve a single stored message, including its body."""
+        db = self._get_messages_db()
+        try:
+            with STORE_LATENCY.labels('get').time():
+                message = db.get_message(message_id)
+                return db.load_body(message) if message else None
+        finally:
+            db.close()
         
-        return sorted_messages[:limit]
+    def export_messages(self, since: Optional[str] = None, include_body: bool = True,
+                        dedupe: Optional[str] = None) -> Iterator[Dict]:
+        """Stream every stored message oldest first (for bulk exports).
+
+        ``dedupe='near'`` skips all but the first message of each near-duplicate cluster.
+        """
+        db = self._get_messages_db()
+        try:
+            for message in db.iter_messages(since=since, include_body=include_body):
+                if dedupe != 'near' or is_cluster_representative(message):
+                    yield message
+        finally:
+            db.close()
+            
+    def search_messages(self, query: str, sender: Optional[str] = None, since: Optional[str] = None,
+                        until: Optional[str] = None, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """Full-text search over stored messages, best matches first."""
+        db = self._get_messages_db()
+        try:
+            with STORE_LATENCY.labels('search').time():
+                return db.search(query, sender=sender, since=since, until=until, limit=limit, offset=offset)
+        finally:
+            db.close()
         
     def get_message_stats(self) -> Dict:
         """Get statistics about stored messages."""
         db = self._get_messages_db()
-        all_messages = db.all()
-        
-        if not all_messages:
-            return {
-                'total_messages': 0,
-                'unique_senders': 0,
-                'date_range': None
-            }
-            
-        # Count unique senders
-        senders = set(msg.get('sender', '') for msg in all_messages)
-        
-        # Get date range
-        timestamps = [msg.get('retrievalTimestamp', '') for msg in all_messages if msg.get('retrievalTimestamp')]
-        timestamps.sort()
-        
-        date_range = None
-        if timestamps:
-            date_range = {
-                'earliest': timestamps[0],
-                'latest': timestamps[-1]
-            }
-            
-        return {
-            'total_messages': len(all_messages),
-            'unique_senders': len(senders),
-            'date_range': date_range,
-            'senders': list(senders)
-        }
+        try:
+            with STORE_LATENCY.labels('stats').time():
+                return db.get_stats()
+        finally:
+            db.close()
+
+# Process-wide fetcher shared by the API routes and the scheduler
+gmail_fetcher = None
+_gmail_fetcher_lock = threading.Lock()
+
+def get_gmail_fetcher() -> GmailFetcher:
+    """Get or create the shared fetcher, reloading config that changed on disk."""
+    global gmail_fetcher
+    with _gmail_fetcher_lock:
+        if gmail_fetcher is None:
+            gmail_fetcher = GmailFetcher()
+        else:
+            gmail_fetcher.refresh_config()
+        return gmail_fetcher
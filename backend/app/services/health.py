@@ -0,0 +1,203 @@
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+from .gmail_fetcher import DEFAULT_ACCOUNT, get_gmail_fetcher
+from .scheduler import get_scheduler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds a readiness result is served from cache before it is recomputed
+DEFAULT_HEALTH_TTL = 15
+
+def _age_seconds(timestamp: Optional[str]) -> Optional[float]:
+    if not timestamp:
+        return None
+    try:
+        then = datetime.fromisoformat(timestamp.rstrip('Z'))
+    except ValueError:
+        return None
+    return round((datetime.utcnow() - then).total_seconds(), 1)
+
+class HealthMonitor:
+    """Cached readiness of the Gmail integration.
+
+    The checks only look at local state (config, token expiry, last fetch
+    run) and are recomputed every ``ttl`` seconds on a background thread,
+    so serving a probe is a dictionary lookup. :meth:`deep_check` is the
+    explicit, expensive check that calls the Gmail API.
+    """
+
+    def __init__(self, ttl: int = DEFAULT_HEALTH_TTL):
+        self.ttl = ttl
+        self.result: Optional[Dict] = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = None
+
+    def get(self) -> Dict:
+        """Return the cached readiness result, recomputing it only if stale."""
+        if self.result is None or time.monotonic() - self.checked_at > self.ttl:
+            with self.lock:
+                if self.result is None or time.monotonic() - self.checked_at > self.ttl:
+                    self.refresh()
+        return self.result
+
+    def refresh(self) -> Dict:
+        result = self._check()
+        self.result = result
+        self.checked_at = time.monotonic()
+        return result
+
+    def _check(self) -> Dict:
+        checks = {}
+        error = None
+        try:
+            fetcher = get_gmail_fetcher()
+        except Exception as e:
+            return {
+                'status': 'unhealthy',
+                'configured': False,
+                'error': f"Configuration error: {e}",
+                'checks': {'config': {'ok': False}},
+                'checked_at': datetime.utcnow().isoformat() + 'Z'
+            }
+
+        unconfigured = [account.name for account in fetcher.accounts if not account.configured]
+        configured = not unconfigured
+        checks['config'] = {'ok': configured}
+        if not configured:
+            if unconfigured == [DEFAULT_ACCOUNT]:
+                error = "Missing required Gmail credentials. Please configure gmail.json"
+            else:
+                error = f"Missing required Gmail credentials for: {', '.join(unconfigured)}"
+
+        tokens = {account.name: self._token_check(account) for account in fetcher.accounts}
+        if len(tokens) == 1:
+            checks['token'] = next(iter(tokens.values()))
+        else:
+            checks['token'] = {'ok': all(token['ok'] for token in tokens.values()), 'accounts': tokens}
+        if not checks['token']['ok'] and error is None:
+            error = "Access token expired and could not be refreshed"
+
+        last_run = fetcher.last_run
+        if last_run is None:
+            # Nothing fetched since startup; fall back to the scheduler's log
+            logs = get_scheduler().get_job_logs(limit=1)
+            if logs:
+                last_run = {
+                    'status': logs[-1].get('result', {}).get('status'),
+                    'finished_at': logs[-1].get('timestamp'),
+                    'message': logs[-1].get('result', {}).get('message')
+                }
+        if last_run:
+            checks['last_fetch'] = {
+                'ok': last_run.get('status') not in ('error', 'partial'),
+                'status': last_run.get('status'),
+                'finished_at': last_run.get('finished_at'),
+                'age_seconds': _age_seconds(last_run.get('finished_at')),
+                'message': last_run.get('message')
+            }
+        else:
+            checks['last_fetch'] = {'ok': True, 'status': None, 'finished_at': None, 'age_seconds': None}
+
+        if not checks['config']['ok'] or not checks['token']['ok']:
+            status = 'unhealthy'
+        elif not checks['last_fetch']['ok']:
+            status = 'degraded'
+        else:
+            status = 'healthy'
+
+        result = {
+            'status': status,
+            'configured': configured,
+            'checks': checks,
+            'checked_at': datetime.utcnow().isoformat() + 'Z'
+        }
+        if error:
+            result['error'] = error
+        return result
+
+    def _token_check(self, account) -> Dict:
+        token_manager = account.token_manager
+        if token_manager is None:
+            # Service not built yet; the token is obtained on first use
+            return {'ok': account.configured, 'state': 'not_initialized', 'expiry': None}
+        creds = token_manager.credentials
+        return {
+            'ok': creds.valid,
+            'state': 'valid' if creds.valid else 'expired',
+            'expiry': creds.expiry.isoformat() + 'Z' if creds.expiry else None
+        }
+
+    def deep_check(self) -> Dict:
+        """Contact Gmail (users.getProfile) and report the round-trip time.
+
+        With several accounts each one is checked and reported under
+        ``accounts``; a failing account makes the result unhealthy.
+        """
+        fetcher = get_gmail_fetcher()
+        if len(fetcher.accounts) == 1:
+            return self._profile_check(fetcher, fetcher.accounts[0])
+
+        accounts = {}
+        for account in fetcher.accounts:
+            try:
+                accounts[account.name] = self._profile_check(fetcher, account)
+            except Exception as e:
+                accounts[account.name] = {'status': 'unhealthy', 'configured': account.configured, 'error': str(e)}
+        healthy = all(result['status'] == 'healthy' for result in accounts.values())
+        return {
+            'status': 'healthy' if healthy else 'unhealthy',
+            'configured': all(account.configured for account in fetcher.accounts),
+            'accounts': accounts
+        }
+
+    def _profile_check(self, fetcher, account) -> Dict:
+        started = time.monotonic()
+        service = fetcher._get_gmail_service(account)
+        profile = service.users().getProfile(userId='me').execute()
+        return {
+            'status': 'healthy',
+            'configured': True,
+            'email_address': profile.get('emailAddress'),
+            'messages_total': profile.get('messagesTotal'),
+            'history_id': profile.get('historyId'),
+            'latency_ms': round((time.monotonic() - started) * 1000, 1)
+        }
+
+    def start(self):
+        """Keep the cached result fresh on a background thread."""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name='gmail-health', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.lock:
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"Health check failed: {e}")
+            self._stop.wait(self.ttl)
+
+# Global health monitor instance
+health_monitor = None
+
+def get_health_monitor():
+    """Get or create the global health monitor instance."""
+    global health_monitor
+    if health_monitor is None:
+        health_monitor = HealthMonitor()
+    return health_monitor
@@ -0,0 +1,166 @@
+import hashlib
+import re
+import threading
+import logging
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Normalized bodies remembered by raw bodyHash
+DEFAULT_CACHE_SIZE = 1024
+
+# Elements whose content is never text
+DROPPED_TAGS = {'head', 'title', 'script', 'style', 'noscript', 'template', 'svg', 'object', 'iframe'}
+# Elements that start a new line in the text
+BLOCK_TAGS = {'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'footer',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p',
+              'pre', 'section', 'table', 'td', 'th', 'tr', 'ul'}
+# Elements that never have an end tag
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param',
+             'source', 'track', 'wbr'}
+
+HTML_MARKER = re.compile(r'<(?:!doctype|html|head|body|div|p|table|br|span|a)\b', re.IGNORECASE)
+# Preheaders and tracking blocks are hidden from the reader
+HIDDEN_STYLE = re.compile(r'display\s*:\s*none|visibility\s*:\s*hidden|max-height\s*:\s*0|font-size\s*:\s*0',
+                          re.IGNORECASE)
+# Zero-width and soft-hyphen characters used to pad preheaders
+INVISIBLE_CHARS = re.compile('[\u00ad\u034f\u200b-\u200f\u2060\ufeff]')
+URL = re.compile(r'https?://[^\s<>"\')\]]+')
+# Footer lines that differ per recipient or carry no content
+BOILERPLATE_LINE = re.compile(
+    r'unsubscribe|view (?:this email |it |this )?(?:in|on) (?:your|a|the) (?:browser|web)|view online'
+    r'|manage (?:your )?(?:preferences|subscriptions?|email settings)|update (?:your )?preferences'
+    r'|(?:you are|you\'re) receiving this|you received this (?:email|message)'
+    r'|no longer wish to receive|add us to your address book',
+    re.IGNORECASE
+)
+# Longer lines are content that happens to mention e.g. "unsubscribe"
+MAX_BOILERPLATE_LINE = 200
+
+def looks_like_html(body: str) -> bool:
+    return '<' in body and HTML_MARKER.search(body[:4096]) is not None
+
+def _strip_url_tracking(match) -> str:
+    # Per-recipient tokens live in the query string and fragment
+    return re.split(r'[?#]', match.group(0), maxsplit=1)[0]
+
+class _TextExtractor(HTMLParser):
+    """Streams the visible text out of an HTML document in one pass.
+
+    Only a stack of open elements is kept (no tree), which is several times
+    faster than building a BeautifulSoup document. Comments are ignored by
+    not handling them.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.pieces: List[str] = []
+        # (tag, hidden) for each open element
+        self.open: List = []
+        self.hidden_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.pieces.append('\n')
+        if tag in VOID_TAGS:
+            return
+        hidden = tag in DROPPED_TAGS or any(
+            name == 'hidden' or (name == 'style' and value and HIDDEN_STYLE.search(value))
+            for name, value in attrs
+        )
+        self.open.append((tag, hidden))
+        if hidden:
+            self.hidden_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.pieces.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in BLOCK_TAGS:
+            self.pieces.append('\n')
+        # Close the innermost matching element and anything left open inside it
+        for i in range(len(self.open) - 1, -1, -1):
+            if self.open[i][0] == tag:
+                self.hidden_depth -= sum(1 for _, hidden in self.open[i:] if hidden)
+                del self.open[i:]
+                return
+
+    def handle_data(self, data):
+        if not self.hidden_depth:
+            self.pieces.append(data)
+
+def _html_to_text(body: str) -> str:
+    extractor = _TextExtractor()
+    extractor.feed(body)
+    extractor.close()
+    return ''.join(extractor.pieces)
+
+def _clean_lines(text: str) -> str:
+    lines = []
+    for line in INVISIBLE_CHARS.sub('', text).splitlines():
+        line = ' '.join(URL.sub(_strip_url_tracking, line).split())
+        if not line:
+            continue
+        if len(line) <= MAX_BOILERPLATE_LINE and BOILERPLATE_LINE.search(line):
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+def normalized_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class HtmlNormalizer:
+    """Turns message bodies into compact plain text for hashing and search.
+
+    HTML is reduced to its visible text (scripts, styles, hidden preheaders
+    and comments dropped, block elements on their own lines).
+    For all bodies, URLs lose their query strings, footer boilerplate
+    lines are removed and whitespace is collapsed, so the same newsletter
+    sent to different recipients normalizes to the same text. Results are
+    memoized by the raw ``bodyHash``.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.cache: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def normalize(self, body: str, body_hash: Optional[str] = None) -> str:
+        if body_hash:
+            with self.lock:
+                text = self.cache.get(body_hash)
+                if text is not None:
+                    self.cache.move_to_end(body_hash)
+                    self.hits += 1
+                    return text
+                self.misses += 1
+
+        try:
+            text = _clean_lines(_html_to_text(body) if looks_like_html(body) else body)
+        except Exception as e:
+            logger.warning(f"Failed to normalize body {body_hash}: {e}")
+            text = _clean_lines(body)
+
+        if body_hash and self.cache_size > 0:
+            with self.lock:
+                self.cache[body_hash] = text
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return text
+
+# Global normalizer instance
+html_normalizer = None
+
+def get_html_normalizer() -> HtmlNormalizer:
+    """Get or create the global normalizer (and its memo cache)."""
+    global html_normalizer
+    if html_normalizer is None:
+        html_normalizer = HtmlNormalizer()
+    return html_normalizer
@@ -0,0 +1,114 @@
+import threading
+import uuid
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + 'Z'
+
+class FetchJob:
+    """A fetch run executing on the worker pool, with live progress counters."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'
+        self.created_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.progress: Dict[str, int] = {'listed': 0, 'fetched': 0, 'stored': 0}
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def report(self, stage: str, count: int = 1):
+        """Progress callback passed to the fetcher: add ``count`` to ``stage``."""
+        with self._lock:
+            self.progress[stage] = self.progress.get(stage, 0) + count
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'progress': dict(self.progress),
+                'result': self.result,
+                'error': self.error
+            }
+
+class JobManager:
+    """Runs fetch jobs off the request path and keeps their recent history.
+
+    Only one fetch runs at a time: submitting while a job is queued or
+    running returns that job instead of starting another.
+    """
+
+    def __init__(self, max_workers: int = 1, history_size: int = 100):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gmail-job')
+        self.history_size = history_size
+        self.jobs: 'OrderedDict[str, FetchJob]' = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable[[Callable[[str, int], None]], Dict]) -> FetchJob:
+        """Queue ``func(progress)`` and return its job immediately."""
+        with self.lock:
+            for job in self.jobs.values():
+                if job.active:
+                    logger.info(f"Fetch job {job.id} already in progress, not starting another")
+                    return job
+
+            job = FetchJob(kind)
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.history_size:
+                self.jobs.popitem(last=False)
+
+        self.executor.submit(self._run, job, func)
+        return job
+
+    def _run(self, job: FetchJob, func: Callable):
+        job.status = 'running'
+        job.started_at = _now()
+        try:
+            result = func(job.report)
+            job.result = result
+            job.status = 'failed' if result.get('status') == 'error' else 'succeeded'
+            if job.status == 'failed':
+                job.error = result.get('message')
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = _now()
+
+    def get(self, job_id: str) -> Optional[FetchJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# Global job manager instance
+job_manager = None
+
+def get_job_manager():
+    """Get or create the global job manager instance."""
+    global job_manager
+    if job_manager is None:
+        job_manager = JobManager()
+    return job_manager
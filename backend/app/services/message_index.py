@@ -0,0 +1,69 @@
+import json
+import os
+import logging
+from typing import Iterable, Optional, Set
+from tinydb import TinyDB
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class MessageIdIndex:
+    """Persistent set of stored messageIds, kept in a sidecar file next to the store.
+
+    The sidecar records the size and mtime of the store file it was built
+    from. If the store was changed behind the index's back (or the sidecar is
+    missing), the index is rebuilt from the store on load.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.index_path = db_path + '.ids.json'
+        self.ids: Set[str] = set()
+
+    def _source_signature(self) -> Optional[dict]:
+        """Size and mtime of the store file, used to detect drift."""
+        try:
+            stat = os.stat(self.db_path)
+        except FileNotFoundError:
+            return None
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def load(self, db: TinyDB) -> 'MessageIdIndex':
+        """Load ids from the sidecar, rebuilding from ``db`` if it is stale."""
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            if data.get('source') == self._source_signature():
+                self.ids = set(data.get('ids', []))
+                return self
+            logger.info("Message id index is stale, rebuilding")
+        except FileNotFoundError:
+            logger.info("Message id index not found, building")
+        except (json.JSONDecodeError, AttributeError):
+            logger.warning(f"Unreadable message id index at {self.index_path}, rebuilding")
+
+        self.rebuild(doc.get('messageId') for doc in db.all())
+        return self
+
+    def rebuild(self, message_ids: Iterable[Optional[str]]):
+        """Replace the index contents with ``message_ids``."""
+        self.ids = {msg_id for msg_id in message_ids if msg_id}
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, message_id: str):
+        """Record a newly stored message id."""
+        self.ids.add(message_id)
+
+    def save(self):
+        """Write the index atomically, stamped with the current store signature."""
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'source': self._source_signature(), 'ids': sorted(self.ids)}, f)
+        os.replace(tmp_path, self.index_path)
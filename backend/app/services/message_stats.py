@@ -0,0 +1,96 @@
+import json
+import os
+import logging
+from typing import Dict, Iterable, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class MessageStatsTracker:
+    """Message statistics maintained incrementally and persisted next to the store.
+
+    Counts are updated as messages are inserted, so reading them
+    never touches the store itself. ``rebuild`` recomputes everything from
+    scratch when the sidecar is missing or has drifted.
+    """
+
+    def __init__(self, stats_path: str):
+        self.stats_path = stats_path
+        self.total = 0
+        self.sender_counts: Dict[str, int] = {}
+        self.earliest: Optional[str] = None
+        self.latest: Optional[str] = None
+
+    def load(self) -> bool:
+        """Load persisted stats. Returns False if there is nothing usable on disk."""
+        try:
+            with open(self.stats_path, 'r') as f:
+                data = json.load(f)
+            self.total = int(data['total'])
+            self.sender_counts = dict(data['sender_counts'])
+            self.earliest = data.get('earliest')
+            self.latest = data.get('latest')
+            return True
+        except FileNotFoundError:
+            return False
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+            logger.warning(f"Unreadable message stats at {self.stats_path}")
+            return False
+
+    def save(self):
+        """Persist stats atomically."""
+        os.makedirs(os.path.dirname(self.stats_path), exist_ok=True)
+        tmp_path = self.stats_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'total': self.total,
+                'sender_counts': self.sender_counts,
+                'earliest': self.earliest,
+                'latest': self.latest
+            }, f)
+        os.replace(tmp_path, self.stats_path)
+
+    def apply_insert(self, messages: Iterable[Dict]):
+        for message in messages:
+            self.total += 1
+            sender = message.get('sender', '')
+            self.sender_counts[sender] = self.sender_counts.get(sender, 0) + 1
+
+            timestamp = message.get('retrievalTimestamp')
+            if timestamp:
+                if self.earliest is None or timestamp < self.earliest:
+                    self.earliest = timestamp
+                if self.latest is None or timestamp > self.latest:
+                    self.latest = timestamp
+
+    def rebuild(self, messages: Iterable[Dict]):
+        """Recompute all stats from the full set of stored messages."""
+        self.total = 0
+        self.sender_counts = {}
+        self.earliest = None
+        self.latest = None
+        self.apply_insert(messages)
+
+    def to_dict(self) -> Dict:
+        if not self.total:
+            return {
+                'total_messages': 0,
+                'unique_senders': 0,
+                'date_range': None
+            }
+
+        date_range = None
+        if self.earliest:
+            date_range = {
+                'earliest': self.earliest,
+                'latest': self.latest
+            }
+
+        return {
+            'total_messages': self.total,
+            'unique_senders': len(self.sender_counts),
+            'date_range': date_range,
+            'senders': list(self.sender_counts),
+            'sender_counts': dict(self.sender_counts)
+        }
@@ -0,0 +1,597 @@
+import base64
+import binascii
+import heapq
+import json
+import os
+import sqlite3
+import stat
+import tempfile
+import threading
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, List, Optional, Tuple
+from tinydb import TinyDB, Query
+from tinydb.storages import Storage
+from .blob_store import BodyBlobStore
+from .message_index import MessageIdIndex
+from .message_stats import MessageStatsTracker
+from .metrics import NEAR_DUPLICATES
+from .html_normalizer import get_html_normalizer
+from .near_duplicates import DEFAULT_NEAR_THRESHOLD, NearDuplicateIndex, is_cluster_representative
+from .search_index import SearchIndex
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fields stored in dedicated columns by the SQLite backend; anything else
+# goes into the JSON ``extra`` column.
+CORE_FIELDS = ('messageId', 'subject', 'sender', 'date', 'retrievalTimestamp', 'body', 'bodyHash')
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+BODY_STORAGE_MODES = ('inline', 'blob')
+
+# (retrievalTimestamp, messageId) position used for keyset pagination
+Cursor = Tuple[str, str]
+
+
+class KnownIds(set):
+    """In-memory set of stored ids for backends that need no sidecar index."""
+
+    def save(self):
+        pass
+
+
+class AtomicJSONStorage(Storage):
+    """TinyDB storage that never rewrites the JSON file in place.
+
+    Each write goes to a temporary file in the same directory, is fsynced,
+    and then renamed over the original, so a crash mid-write leaves either
+    the old or the new file but never a truncated one. The renamed file
+    keeps the original's permissions.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__()
+        self.path = path
+        self.kwargs = kwargs
+        # Like TinyDB's JSONStorage, create the file up front; it gets the
+        # usual umask-based mode, which every later write then preserves
+        open(path, 'a').close()
+
+    def read(self) -> Optional[Dict]:
+        try:
+            with open(self.path, 'r') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        if not content.strip():
+            # Empty file: let TinyDB initialize the database
+            return None
+        return json.loads(content)
+
+    def write(self, data: Dict):
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix='.' + os.path.basename(self.path), suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, **self.kwargs)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file as 0600
+            try:
+                os.chmod(tmp_path, stat.S_IMODE(os.stat(self.path).st_mode))
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class MessageStore(ABC):
+    """Storage backend for fetched Gmail messages.
+
+    With ``body_storage='blob'`` bodies are moved out of the records into a
+    content-addressed :class:`BodyBlobStore`; records keep only ``bodyHash``.
+    Reading bodies back works in either mode via :meth:`load_body`.
+    """
+
+    path: str
+    blob_store: Optional[BodyBlobStore] = None
+    body_storage: str = 'inline'
+    # Sidecar indexes are opened on first use; most reads never need them
+    search_index_path: Optional[str] = None
+    near_index_path: Optional[str] = None
+    near_threshold: float = DEFAULT_NEAR_THRESHOLD
+    _search_index: Optional[SearchIndex] = None
+    _near_index: Optional[NearDuplicateIndex] = None
+    _stats: Optional[MessageStatsTracker] = None
+
+    @property
+    def search_index(self) -> Optional[SearchIndex]:
+        """The full-text index (None when disabled)."""
+        if self._search_index is None and self.search_index_path:
+            self._search_index = SearchIndex(self.search_index_path)
+        return self._search_index
+
+    @property
+    def near_index(self) -> Optional[NearDuplicateIndex]:
+        """The near-duplicate index (None when disabled)."""
+        if self._near_index is None and self.near_index_path:
+            self._near_index = NearDuplicateIndex(self.near_index_path, self.near_threshold)
+        return self._near_index
+
+    def insert(self, message: Dict):
+        self.insert_many([message])
+
+    def insert_many(self, messages: List[Dict]):
+        """Insert several messages as a single write."""
+        self._assign_clusters(messages)
+        records = [self._externalize_body(message) for message in messages]
+        if not records:
+            return
+        # Load (or build) stats before writing so new records aren't counted twice
+        stats = self._get_stats_tracker()
+        inserted = self._write_records(records)
+        if inserted:
+            stats.apply_insert(inserted)
+            stats.save()
+            self._index_inserted(messages, inserted)
+
+    def _assign_clusters(self, messages: List[Dict]):
+        """Set ``clusterId`` on messages (which must carry their body)."""
+        if self.near_index is None:
+            return
+        normalizer = get_html_normalizer()
+        try:
+            texts = [normalizer.normalize(msg.get('body') or '', msg.get('bodyHash')) for msg in messages]
+            NEAR_DUPLICATES.inc(self.near_index.assign(messages, texts))
+        except Exception as e:
+            # Messages without a clusterId are listed as their own cluster
+            logger.error(f"Failed to assign near-duplicate clusters: {e}")
+
+    def _index_inserted(self, messages: List[Dict], inserted: List[Dict]):
+        """Add newly inserted messages (with bodies) to the search index."""
+        if self.search_index is None:
+            return
+        inserted_ids = {record.get('messageId') for record in inserted}
+        try:
+            self.search_index.add_many(msg for msg in messages if msg.get('messageId') in inserted_ids)
+        except Exception as e:
+            # The store is the source of truth; a rebuild will catch the index up
+            logger.error(f"Failed to update search index: {e}")
+
+    @abstractmethod
+    def _write_records(self, records: List[Dict]) -> List[Dict]:
+        """Persist records, returning the ones actually inserted."""
+        pass
+
+    def _externalize_body(self, message: Dict) -> Dict:
+        """Move the body into the blob store when blob storage is enabled."""
+        if self.body_storage != 'blob' or self.blob_store is None:
+            return message
+        body = message.get('body')
+        body_hash = message.get('bodyHash')
+        if body is None or not body_hash:
+            return message
+        try:
+            self.blob_store.put(body_hash, body)
+        except ValueError:
+            # Not a SHA-256 digest; keep the body inline
+            return message
+        return _without_body(message)
+
+    def load_body(self, message: Dict) -> Dict:
+        """Return ``message`` with its body filled in from the blob store if needed."""
+        if 'body' in message or self.blob_store is None:
+            return message
+        body = self.blob_store.get(message.get('bodyHash', ''))
+        if body is None:
+            logger.warning(f"Body {message.get('bodyHash')} for message {message.get('messageId')} is missing")
+            body = ''
+        return {**message, 'body': body}
+
+    @abstractmethod
+    def load_known_ids(self):
+        """Return a set-like object of stored messageIds supporting ``add`` and ``save``."""
+        pass
+
+    @abstractmethod
+    def all(self) -> List[Dict]:
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        pass
+
+    def get_recent(self, limit: int = 100, include_body: bool = True) -> List[Dict]:
+        """Most recently retrieved messages first."""
+        return self.get_page(limit, include_body=include_body)
+
+    @abstractmethod
+    def get_page(self, limit: int = 100, before: Optional[Cursor] = None,
+                 after: Optional[Cursor] = None, include_body: bool = True) -> List[Dict]:
+        """Keyset page ordered by (retrievalTimestamp, messageId), newest first.
+
+        ``before`` returns the ``limit`` messages just older than the cursor,
+        ``after`` the ``limit`` messages just newer than it.
+        """
+        pass
+
+    def get_distinct_page(self, limit: int = 100, before: Optional[Cursor] = None,
+                          after: Optional[Cursor] = None, include_body: bool = True) -> List[Dict]:
+        """Like :meth:`get_page`, but only the first message of each near-duplicate cluster.
+
+        Keeps reading pages from the cursor until ``limit`` messages are kept
+        or the store runs out.
+        """
+        ascending = after is not None and before is None
+        kept: List[Dict] = []
+        while len(kept) < limit:
+            chunk = self.get_page(limit, before=before, after=after, include_body=include_body)
+            if ascending:
+                # Pages come newest first; collect oldest first, nearest the cursor
+                chunk = chunk[::-1]
+            kept.extend(msg for msg in chunk if is_cluster_representative(msg))
+            if len(chunk) < limit:
+                break
+            if ascending:
+                after = sort_key(chunk[-1])
+            else:
+                before = sort_key(chunk[-1])
+        kept = kept[:limit]
+        return kept[::-1] if ascending else kept
+
+    def iter_messages(self, since: Optional[str] = None, include_body: bool = True,
+                      chunk_size: int = 500) -> Iterator[Dict]:
+        """Yield messages oldest first, optionally only those retrieved at or after ``since``.
+
+        Walks the store in keyset chunks so memory stays bounded.
+        """
+        position: Cursor = (since or '', '')
+        while True:
+            # get_page(after=...) returns newest first; flip to ascending
+            chunk = self.get_page(chunk_size, after=position, include_body=include_body)[::-1]
+            if not chunk:
+                return
+            for message in chunk:
+                yield self.load_body(message) if include_body else message
+            position = sort_key(chunk[-1])
+            if len(chunk) < chunk_size:
+                return
+
+    @abstractmethod
+    def get_message(self, message_id: str) -> Optional[Dict]:
+        """Look up a single message record by its messageId."""
+        pass
+
+    def _get_stats_tracker(self) -> MessageStatsTracker:
+        if self._stats is None:
+            self._stats = MessageStatsTracker(self.path + '.stats.json')
+            if not self._stats.load():
+                logger.info("Message stats not found, building from store")
+                self._stats.rebuild(self.all())
+                self._stats.save()
+        return self._stats
+
+    def get_stats(self) -> Dict:
+        """Stats updated as messages are inserted; no store scan."""
+        return self._get_stats_tracker().to_dict()
+
+    def rebuild_stats(self) -> Dict:
+        """Recompute stats from the stored messages, e.g. after drift."""
+        stats = MessageStatsTracker(self.path + '.stats.json')
+        stats.rebuild(self.all())
+        stats.save()
+        self._stats = stats
+        return stats.to_dict()
+
+    def search(self, query: str, **filters) -> List[Dict]:
+        """Ranked full-text search; see ``SearchIndex.search`` for filters."""
+        if self.search_index is None:
+            raise RuntimeError("Search index is disabled")
+        return self.search_index.search(query, **filters)
+
+    def rebuild_search_index(self, chunk_size: int = 500) -> int:
+        """Re-index every stored message. Returns the number indexed."""
+        if self.search_index is None:
+            raise RuntimeError("Search index is disabled")
+        self.search_index.clear()
+        indexed = 0
+        chunk = []
+        for message in self.all():
+            chunk.append(self.load_body(dict(message)))
+            if len(chunk) >= chunk_size:
+                self.search_index.add_many(chunk)
+                indexed += len(chunk)
+                chunk = []
+        if chunk:
+            self.search_index.add_many(chunk)
+            indexed += len(chunk)
+        return indexed
+
+    def close(self):
+        if self._search_index is not None:
+            self._search_index.close()
+        if self._near_index is not None:
+            self._near_index.close()
+
+
+class TinyDBMessageStore(MessageStore):
+    """Original JSON file backend, kept for compatibility."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = TinyDB(path, storage=AtomicJSONStorage)
+
+    def _write_records(self, records: List[Dict]) -> List[Dict]:
+        # One read and one atomic rewrite of the file for the whole batch
+        self.db.insert_multiple(records)
+        return records
+
+    def load_known_ids(self) -> MessageIdIndex:
+        return MessageIdIndex(self.path).load(self.db)
+
+    def all(self) -> List[Dict]:
+        return self.db.all()
+
+    def count(self) -> int:
+        return len(self.db)
+
+    def get_page(self, limit: int = 100, before: Optional[Cursor] = None,
+                 after: Optional[Cursor] = None, include_body: bool = True) -> List[Dict]:
+        candidates = self.db.all()
+        if before is not None:
+            candidates = (msg for msg in candidates if sort_key(msg) < before)
+        if after is not None:
+            candidates = (msg for msg in candidates if sort_key(msg) > after)
+
+        # Top-k selection instead of sorting the whole store
+        if after is not None and before is None:
+            page = heapq.nsmallest(limit, candidates, key=sort_key)[::-1]
+        else:
+            page = heapq.nlargest(limit, candidates, key=sort_key)
+
+        if include_body:
+            return page
+        return [_without_body(msg) for msg in page]
+
+    def get_message(self, message_id: str) -> Optional[Dict]:
+        Message = Query()
+        return self.db.get(Message.messageId == message_id)
+
+    def iter_messages(self, since: Optional[str] = None, include_body: bool = True,
+                      chunk_size: int = 500) -> Iterator[Dict]:
+        # The JSON file is read whole anyway, so sort once instead of paging
+        messages = self.db.all()
+        if since:
+            messages = [msg for msg in messages if (msg.get('retrievalTimestamp') or '') >= since]
+        for message in sorted(messages, key=sort_key):
+            yield self.load_body(message) if include_body else _without_body(message)
+
+    def close(self):
+        super().close()
+        self.db.close()
+
+
+class SQLiteMessageStore(MessageStore):
+    """SQLite backend: indexed lookups and appends without rewriting the store."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Connection opened on first use, so requests served from sidecars (stats) skip it."""
+        if self._conn is None:
+            with self.lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.row_factory = sqlite3.Row
+                    self._conn = conn
+                    self._init_schema()
+        return self._conn
+
+    def _init_schema(self):
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    messageId TEXT PRIMARY KEY,
+                    subject TEXT,
+                    sender TEXT,
+                    date TEXT,
+                    retrievalTimestamp TEXT,
+                    body TEXT,
+                    bodyHash TEXT,
+                    extra TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender);
+                DROP INDEX IF EXISTS idx_messages_retrieval;
+                CREATE INDEX IF NOT EXISTS idx_messages_retrieval_id ON messages(retrievalTimestamp, messageId);
+            ''')
+            self.conn.commit()
+
+    @staticmethod
+    def _to_row(message: Dict) -> tuple:
+        extra = {k: v for k, v in message.items() if k not in CORE_FIELDS}
+        return tuple(message.get(field) for field in CORE_FIELDS) + (
+            json.dumps(extra) if extra else None,
+        )
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Dict:
+        message = {field: row[field] for field in row.keys() if field in CORE_FIELDS and row[field] is not None}
+        if row['extra']:
+            message.update(json.loads(row['extra']))
+        return message
+
+    def _write_records(self, records: List[Dict]) -> List[Dict]:
+        """Insert records in one transaction, ignoring ids that already exist."""
+        placeholders = ', '.join('?' for _ in CORE_FIELDS + ('extra',))
+        statement = f"INSERT OR IGNORE INTO messages ({', '.join(CORE_FIELDS)}, extra) VALUES ({placeholders})"
+        inserted = []
+        with self.lock, self.conn:
+            for record in records:
+                if self.conn.execute(statement, self._to_row(record)).rowcount:
+                    inserted.append(record)
+        return inserted
+
+    def load_known_ids(self) -> KnownIds:
+        with self.lock:
+            return KnownIds(row[0] for row in self.conn.execute('SELECT messageId FROM messages'))
+
+    def all(self) -> List[Dict]:
+        with self.lock:
+            return [self._from_row(row) for row in self.conn.execute('SELECT * FROM messages')]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+
+    def _columns(self, include_body: bool) -> str:
+        if include_body:
+            return '*'
+        return ', '.join([field for field in CORE_FIELDS if field != 'body'] + ['extra'])
+
+    def get_page(self, limit: int = 100, before: Optional[Cursor] = None,
+                 after: Optional[Cursor] = None, include_body: bool = True) -> List[Dict]:
+        conditions = []
+        params: List = []
+        if before is not None:
+            conditions.append('(retrievalTimestamp, messageId) < (?, ?)')
+            params.extend(before)
+        if after is not None:
+            conditions.append('(retrievalTimestamp, messageId) > (?, ?)')
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        # Walk the (retrievalTimestamp, messageId) index from the cursor
+        ascending = after is not None and before is None
+        order = 'ASC' if ascending else 'DESC'
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT {self._columns(include_body)} FROM messages {where} '
+                f'ORDER BY retrievalTimestamp {order}, messageId {order} LIMIT ?',
+                params + [limit]
+            ).fetchall()
+        page = [self._from_row(row) for row in rows]
+        return page[::-1] if ascending else page
+
+    def get_message(self, message_id: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM messages WHERE messageId = ?', (message_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def close(self):
+        super().close()
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+
+
+def sort_key(message: Dict) -> Cursor:
+    """Listing order key: retrieval time, with messageId as tie-breaker."""
+    return (message.get('retrievalTimestamp') or '', message.get('messageId') or '')
+
+
+def encode_cursor(message: Dict) -> str:
+    """Opaque pagination cursor pointing at ``message``."""
+    timestamp, message_id = sort_key(message)
+    return base64.urlsafe_b64encode(f"{timestamp}|{message_id}".encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Inverse of :func:`encode_cursor`; raises ValueError on malformed input."""
+    try:
+        decoded = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except (binascii.Error, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    timestamp, sep, message_id = decoded.partition('|')
+    if not sep:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return timestamp, message_id
+
+
+def _without_body(message: Dict) -> Dict:
+    return {key: value for key, value in message.items() if key != 'body'}
+
+
+def resolve_backend(path: str, backend: Optional[str] = None) -> str:
+    """Pick the backend from an explicit setting or the file extension."""
+    if backend:
+        backend = backend.lower()
+        if backend not in ('tinydb', 'sqlite'):
+            raise ValueError(f"Unknown storage backend: {backend}")
+        return backend
+    return 'sqlite' if path.lower().endswith(SQLITE_EXTENSIONS) else 'tinydb'
+
+
+def open_message_store(path: str, backend: Optional[str] = None,
+                       body_storage: Optional[str] = None, search: bool = True,
+                       near_threshold: Optional[float] = DEFAULT_NEAR_THRESHOLD) -> MessageStore:
+    """Open the message store at ``path`` with the requested backend.
+
+    Body blobs live in a ``bodies`` directory next to the store file, the
+    full-text index in ``<store>.search.db`` and the near-duplicate index
+    in ``<store>.near.db`` (disabled when ``near_threshold`` is None). The
+    indexes are opened when first used.
+    """
+    body_storage = (body_storage or 'inline').lower()
+    if body_storage not in BODY_STORAGE_MODES:
+        raise ValueError(f"Unknown body storage mode: {body_storage}")
+    if near_threshold is not None and not 0 < float(near_threshold) <= 1:
+        raise ValueError(f"Near-duplicate threshold must be greater than 0 and at most 1: {near_threshold}")
+
+    if resolve_backend(path, backend) == 'sqlite':
+        store = SQLiteMessageStore(path)
+    else:
+        store = TinyDBMessageStore(path)
+    store.blob_store = BodyBlobStore(os.path.join(os.path.dirname(path), 'bodies'))
+    store.body_storage = body_storage
+    if search:
+        store.search_index_path = path + '.search.db'
+    if near_threshold is not None:
+        store.near_index_path = path + '.near.db'
+        store.near_threshold = float(near_threshold)
+    return store
+
+
+def migrate_store(source: MessageStore, target: MessageStore, chunk_size: int = 1000) -> Dict:
+    """Copy every message from ``source`` into ``target``, skipping ids it already has."""
+    known_ids = target.load_known_ids()
+    copied = 0
+    skipped = 0
+    pending = []
+
+    def _flush():
+        target.insert_many(pending)
+        pending.clear()
+
+    for message in source.all():
+        message_id = message.get('messageId')
+        if not message_id or message_id in known_ids:
+            skipped += 1
+            continue
+        pending.append(source.load_body(dict(message)))
+        known_ids.add(message_id)
+        copied += 1
+        if len(pending) >= chunk_size:
+            _flush()
+
+    if pending:
+        _flush()
+    known_ids.save()
+
+    logger.info(f"Migrated {copied} messages, skipped {skipped}")
+    return {'copied': copied, 'skipped': skipped}
@@ -0,0 +1,64 @@
+import logging
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Latency buckets in seconds, from sub-millisecond store reads to slow batch calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Whole fetch runs take seconds to hours
+RUN_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+# Gmail API
+GMAIL_API_CALLS = Counter(
+    'gmail_api_calls_total', 'Gmail API calls (including retries) by method and HTTP status', ('method', 'status'))
+GMAIL_API_LATENCY = Histogram(
+    'gmail_api_call_duration_seconds', 'Gmail API call latency; batch requests are observed as method "batch"',
+    ('method',), buckets=DEFAULT_BUCKETS)
+
+# Fetcher
+MESSAGE_PARSE_SECONDS = Histogram(
+    'gmail_message_parse_duration_seconds', 'Time to extract fields and body from one Gmail message',
+    buckets=DEFAULT_BUCKETS)
+DEDUP_HITS = Counter(
+    'gmail_dedup_hits_total', 'Messages skipped because they were already stored, by where they were caught',
+    ('stage',))
+MESSAGES_STORED = Counter(
+    'gmail_messages_stored_total', 'New messages written to the store', ('account',))
+FETCH_RUNS = Counter(
+    'gmail_fetch_runs_total', 'Completed fetch runs by result status', ('status',))
+FETCH_DURATION = Histogram(
+    'gmail_fetch_duration_seconds', 'Duration of whole fetch runs', buckets=RUN_BUCKETS)
+NEAR_DUPLICATES = Counter(
+    'gmail_near_duplicates_total', 'Stored messages that joined an existing near-duplicate cluster')
+
+# Message store
+STORE_LATENCY = Histogram(
+    'message_store_operation_duration_seconds', 'Message store read and write latency', ('operation',),
+    buckets=DEFAULT_BUCKETS)
+
+# Scheduler
+SCHEDULER_RUNS = Counter(
+    'scheduler_runs_total', 'Scheduler job runs by trigger and result status', ('trigger', 'status'))
+SCHEDULER_RUN_DURATION = Histogram(
+    'scheduler_run_duration_seconds', 'Duration of scheduler job runs', ('trigger',), buckets=RUN_BUCKETS)
+SCHEDULER_LAG = Histogram(
+    'scheduler_run_lag_seconds', 'Delay between a scheduled run being due and it starting',
+    buckets=DEFAULT_BUCKETS)
+SCHEDULER_NEXT_RUN = Gauge(
+    'scheduler_next_run_timestamp_seconds', 'Unix time of the next scheduled run (0 when stopped)')
+
+# HTTP API
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by method, route template and status code', ('method', 'route', 'status'))
+HTTP_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time until the response headers are sent, by route template',
+    ('method', 'route'), buckets=DEFAULT_BUCKETS)
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    return generate_latest(REGISTRY).decode('utf-8')
@@ -0,0 +1,190 @@
+import base64
+import codecs
+import email
+import logging
+from abc import ABC, abstractmethod
+from email.header import decode_header, make_header
+from email.message import Message
+from typing import Dict, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Largest body kept per message, in bytes of decoded text (0 = unlimited)
+DEFAULT_MAX_BODY_BYTES = 1024 * 1024
+# Which alternative of a multipart/alternative message is stored
+BODY_PREFERENCES = ('plain', 'html')
+DEFAULT_BODY_PREFERENCE = 'plain'
+
+def _decode_text(data: bytes, charset: Optional[str], limit: Optional[int]) -> str:
+    """Decode part bytes in their declared charset, cut to ``limit`` bytes."""
+    truncated = limit is not None and len(data) > limit
+    if truncated:
+        data = data[:limit]
+    try:
+        codec = codecs.lookup(charset or 'utf-8').name
+    except LookupError:
+        logger.warning(f"Unknown charset {charset!r}, decoding as UTF-8")
+        codec = 'utf-8'
+    text = data.decode(codec, errors='replace')
+    if truncated:
+        # Drop a multi-byte character cut in half by the limit
+        text = text.rstrip('\ufffd')
+    return text
+
+class _BodyWalker(ABC):
+    """Single recursive pass over a MIME tree collecting the body text.
+
+    multipart/alternative keeps only the preferred alternative; other
+    multiparts keep every inline text part in order. Attachments are
+    skipped. Pieces are gathered in a list and joined once, and the walk
+    stops as soon as ``max_bytes`` of text has been collected.
+    """
+
+    def __init__(self, preference: str = DEFAULT_BODY_PREFERENCE, max_bytes: int = DEFAULT_MAX_BODY_BYTES):
+        if preference not in BODY_PREFERENCES:
+            raise ValueError(f"Unknown body preference: {preference}")
+        self.order = ('text/plain', 'text/html') if preference == 'plain' else ('text/html', 'text/plain')
+        self.max_bytes = max_bytes or None
+
+    # Tree access, implemented for each message representation
+
+    @abstractmethod
+    def _content_type(self, part) -> str:
+        """The part's lower-cased MIME type."""
+
+    @abstractmethod
+    def _children(self, part) -> List:
+        """The sub-parts of a multipart part."""
+
+    @abstractmethod
+    def _is_attachment(self, part) -> bool:
+        """True if the part is an attachment rather than inline content."""
+
+    @abstractmethod
+    def _payload(self, part) -> Tuple[bytes, Optional[str]]:
+        """The part's transfer-decoded bytes and declared charset."""
+
+    def extract(self, root) -> str:
+        pieces: List[str] = []
+        self._remaining = self.max_bytes
+        self._walk(root, pieces)
+        return '\n'.join(piece.strip() for piece in pieces if piece.strip())
+
+    def _walk(self, part, pieces: List[str]):
+        if self._remaining is not None and self._remaining <= 0:
+            return
+        content_type = self._content_type(part)
+        if content_type.startswith('multipart/'):
+            children = self._children(part)
+            if content_type == 'multipart/alternative':
+                chosen = self._choose_alternative(children)
+                if chosen is not None:
+                    self._walk(chosen, pieces)
+            else:
+                for child in children:
+                    self._walk(child, pieces)
+        elif content_type in self.order and not self._is_attachment(part):
+            data, charset = self._payload(part)
+            if data:
+                text = _decode_text(data, charset, self._remaining)
+                if self._remaining is not None:
+                    self._remaining -= min(len(data), self._remaining)
+                pieces.append(text)
+
+    def _rank(self, part) -> int:
+        """Lower is better: the preferred text type, then the other, then nested multiparts."""
+        content_type = self._content_type(part)
+        if content_type in self.order:
+            return self.order.index(content_type)
+        if content_type.startswith('multipart/'):
+            # e.g. multipart/related wrapping the HTML alternative
+            return min((self._rank(child) for child in self._children(part)), default=len(self.order))
+        return len(self.order)
+
+    def _choose_alternative(self, children: List):
+        best = None
+        best_rank = len(self.order)
+        for child in children:
+            rank = self._rank(child)
+            # Among equals the last alternative is the richest (RFC 2046)
+            if rank < best_rank or (rank == best_rank and best is not None):
+                best, best_rank = child, rank
+        return best
+
+class _GmailPayloadWalker(_BodyWalker):
+    """Walks the ``payload`` tree of a ``format='full'`` Gmail message."""
+
+    def _content_type(self, part: Dict) -> str:
+        return (part.get('mimeType') or '').lower()
+
+    def _children(self, part: Dict) -> List[Dict]:
+        return part.get('parts') or []
+
+    def _is_attachment(self, part: Dict) -> bool:
+        if part.get('filename') or part.get('body', {}).get('attachmentId'):
+            return True
+        return any(header.get('name', '').lower() == 'content-disposition'
+                   and header.get('value', '').lower().startswith('attachment')
+                   for header in part.get('headers', []))
+
+    def _payload(self, part: Dict) -> Tuple[bytes, Optional[str]]:
+        data = part.get('body', {}).get('data')
+        if not data:
+            return b'', None
+        charset = None
+        for header in part.get('headers', []):
+            if header.get('name', '').lower() == 'content-type':
+                message = Message()
+                message['Content-Type'] = header.get('value', '')
+                charset = message.get_content_charset()
+                break
+        # Gmail uses unpadded base64url
+        return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4)), charset
+
+class _EmailMessageWalker(_BodyWalker):
+    """Walks a parsed RFC 822 message (``format='raw'``)."""
+
+    def _content_type(self, part: Message) -> str:
+        return part.get_content_type()
+
+    def _children(self, part: Message) -> List[Message]:
+        return part.get_payload() if part.is_multipart() else []
+
+    def _is_attachment(self, part: Message) -> bool:
+        return part.get_content_disposition() == 'attachment'
+
+    def _payload(self, part: Message) -> Tuple[bytes, Optional[str]]:
+        return part.get_payload(decode=True) or b'', part.get_content_charset()
+
+def _decode_header(value: str) -> str:
+    """Unfold a header value and decode RFC 2047 encoded words (``=?utf-8?q?...?=``)."""
+    value = value.replace('\r\n', '').replace('\n', '')
+    if '=?' not in value:
+        return value
+    try:
+        return str(make_header(decode_header(value)))
+    except (LookupError, UnicodeDecodeError, ValueError):
+        return value
+
+def extract_payload_body(payload: Dict, preference: str = DEFAULT_BODY_PREFERENCE,
+                         max_bytes: int = DEFAULT_MAX_BODY_BYTES) -> str:
+    """Body text of a Gmail ``format='full'`` payload."""
+    return _GmailPayloadWalker(preference, max_bytes).extract(payload)
+
+def parse_raw_message(raw: str, preference: str = DEFAULT_BODY_PREFERENCE,
+                      max_bytes: int = DEFAULT_MAX_BODY_BYTES) -> Tuple[Dict[str, str], str]:
+    """Parse a Gmail ``format='raw'`` message (base64url RFC 822).
+
+    Returns the decoded headers (lower-cased names, first occurrence wins)
+    and the body text.
+    """
+    data = base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4))
+    # The compat32 parser is several times faster than email.policy.default,
+    # which builds a structured object for every header
+    message = email.message_from_bytes(data)
+    headers = {}
+    for name, value in message.items():
+        headers.setdefault(name.lower(), _decode_header(str(value)))
+    return headers, _EmailMessageWalker(preference, max_bytes).extract(message)
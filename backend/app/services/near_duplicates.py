@@ -0,0 +1,178 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import logging
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# MinHash values per signature. They come from one hash per shingle,
+# split into bins (one-permutation hashing), instead of 128 hash functions.
+MINHASH_SIZE = 128
+MINHASH_MASK = (1 << 57) - 1
+# LSH: the signature is cut into LSH_BANDS bands of BAND_ROWS values; two
+# messages become candidates when any band matches exactly. With 32 x 4 a
+# pair with Jaccard similarity 0.5 is found 87% of the time, 0.6 99%,
+# and unrelated texts (similarity near 0) practically never collide.
+LSH_BANDS = 32
+BAND_ROWS = MINHASH_SIZE // LSH_BANDS
+# Smallest estimated Jaccard similarity of the shingle sets for a message
+# to join a cluster
+DEFAULT_NEAR_THRESHOLD = 0.5
+
+# Words per shingle, and the fewest shingles a text needs to get a signature
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 8
+# Only the start of very long texts is signed, bounding the cost per message
+MAX_SIGNED_CHARS = 32 * 1024
+
+WORD = re.compile(r'\w+')
+
+def _shingles(text: str) -> set:
+    words = WORD.findall(text[:MAX_SIGNED_CHARS].lower())
+    return {' '.join(shingle) for shingle in zip(*(words[i:] for i in range(SHINGLE_SIZE)))}
+
+def minhash(text: str) -> Optional[List[int]]:
+    """MinHash signature of the text's word shingles, or None if the text is too short."""
+    shingles = _shingles(text)
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    digests = b''.join(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest() for shingle in shingles)
+    bins: List[Optional[int]] = [None] * MINHASH_SIZE
+    for value in array('Q', digests):
+        index = value % MINHASH_SIZE
+        value >>= 7
+        if bins[index] is None or value < bins[index]:
+            bins[index] = value
+    # Empty bins borrow the next filled bin's value, offset by the distance
+    # so that borrowed values only match when both texts borrowed alike
+    for index in range(MINHASH_SIZE):
+        if bins[index] is None:
+            step = 1
+            while bins[(index + step) % MINHASH_SIZE] is None:
+                step += 1
+            bins[index] = (bins[(index + step) % MINHASH_SIZE] + step * 0x9E3779B97F4A7C15) & MINHASH_MASK
+    return bins
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / MINHASH_SIZE
+
+def _band_keys(signature: List[int]) -> List[int]:
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = array('Q', signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]).tobytes()
+        # 63 bits so the key fits an SQLite integer
+        keys.append(int.from_bytes(hashlib.blake2b(rows, digest_size=8).digest(), 'big') >> 1)
+    return keys
+
+def is_cluster_representative(message: Dict) -> bool:
+    """True for the first message of its near-duplicate cluster (or one with no cluster)."""
+    cluster_id = message.get('clusterId')
+    return not cluster_id or cluster_id == message.get('messageId')
+
+
+class NearDuplicateIndex:
+    """Clusters messages whose bodies share most of their word shingles.
+
+    A cluster is named after its first message (``clusterId`` equals that
+    message's ``messageId``). Only cluster representatives are kept in the
+    LSH band buckets (SQLite, indexed by band and bucket), so assigning a
+    new message looks at a handful of candidates regardless of store size,
+    and members never drift away from their representative by chaining.
+    """
+
+    def __init__(self, path: str, threshold: float = DEFAULT_NEAR_THRESHOLD):
+        if not 0 < threshold <= 1:
+            raise ValueError("Near-duplicate threshold must be greater than 0 and at most 1")
+        self.path = path
+        self.threshold = threshold
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.executescript('''
+                CREATE TABLE IF NOT EXISTS near_messages (
+                    messageId TEXT PRIMARY KEY,
+                    clusterId TEXT
+                );
+                CREATE TABLE IF NOT EXISTS near_clusters (
+                    clusterId TEXT PRIMARY KEY,
+                    signature BLOB
+                );
+                CREATE TABLE IF NOT EXISTS near_buckets (
+                    band INTEGER,
+                    bucket INTEGER,
+                    clusterId TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_near_buckets ON near_buckets(band, bucket);
+            ''')
+            self.conn.commit()
+
+    def _nearest_cluster(self, signature: List[int], keys: List[int]) -> Optional[str]:
+        candidates = set()
+        for band, bucket in enumerate(keys):
+            candidates.update(row[0] for row in self.conn.execute(
+                'SELECT clusterId FROM near_buckets WHERE band = ? AND bucket = ?', (band, bucket)
+            ))
+        best, best_similarity = None, self.threshold
+        for cluster_id in candidates:
+            row = self.conn.execute('SELECT signature FROM near_clusters WHERE clusterId = ?', (cluster_id,)).fetchone()
+            score = similarity(signature, array('Q', row[0]))
+            if score >= best_similarity:
+                best, best_similarity = cluster_id, score
+        return best
+
+    def assign(self, messages: Iterable[Dict], texts: Iterable[str]) -> int:
+        """Set ``clusterId`` on each message from its normalized body text, in order.
+
+        Messages already in the index keep their cluster; texts too short
+        to sign get no cluster. Returns how many messages joined an
+        existing cluster.
+        """
+        joined = 0
+        with self.lock, self.conn:
+            for message, text in zip(messages, texts):
+                message_id = message.get('messageId')
+                if not message_id:
+                    continue
+                row = self.conn.execute(
+                    'SELECT clusterId FROM near_messages WHERE messageId = ?', (message_id,)
+                ).fetchone()
+                if row:
+                    message['clusterId'] = row[0]
+                    continue
+                signature = minhash(text)
+                if signature is None:
+                    continue
+
+                keys = _band_keys(signature)
+                cluster_id = self._nearest_cluster(signature, keys)
+                if cluster_id is None:
+                    cluster_id = message_id
+                    self.conn.execute('INSERT INTO near_clusters (clusterId, signature) VALUES (?, ?)',
+                                      (cluster_id, array('Q', signature).tobytes()))
+                    self.conn.executemany(
+                        'INSERT INTO near_buckets (band, bucket, clusterId) VALUES (?, ?, ?)',
+                        [(band, bucket, cluster_id) for band, bucket in enumerate(keys)]
+                    )
+                else:
+                    joined += 1
+                self.conn.execute('INSERT INTO near_messages (messageId, clusterId) VALUES (?, ?)',
+                                  (message_id, cluster_id))
+                message['clusterId'] = cluster_id
+        return joined
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM near_messages').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,181 @@
+import random
+import socket
+import threading
+import time
+import logging
+from collections import Counter
+from typing import Dict, Optional
+from googleapiclient.errors import HttpError
+from .metrics import GMAIL_API_CALLS, GMAIL_API_LATENCY
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Gmail API quota units charged per method; a batch costs the sum of its calls
+QUOTA_UNITS = {
+    'messages.list': 5,
+    'messages.get': 5,
+    'history.list': 2,
+    'getProfile': 1
+}
+# Gmail allows 250 quota units per user per second
+DEFAULT_UNITS_PER_SECOND = 250
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_BASE_DELAY = 1.0
+DEFAULT_RETRY_MAX_DELAY = 60.0
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+def quota_cost(method: str, count: int = 1) -> int:
+    return QUOTA_UNITS[method] * count
+
+def is_rate_limited(error: Exception) -> bool:
+    """True for 429s and 403 rateLimitExceeded/userRateLimitExceeded."""
+    if not isinstance(error, HttpError):
+        return False
+    status = getattr(error.resp, 'status', None)
+    if status == 429:
+        return True
+    if status == 403:
+        # The reason is only in the JSON error body, e.g. {"error": {"errors": [{"reason": ...}]}}
+        content = error.content.decode('utf-8', 'replace') if isinstance(error.content, bytes) else str(error.content)
+        return any(reason in content for reason in RATE_LIMIT_REASONS)
+    return False
+
+def error_status(error: Optional[Exception]) -> str:
+    """Metrics label for a call's outcome: the HTTP status, or "error" without a response."""
+    if error is None:
+        return '200'
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return str(status) if status is not None else 'error'
+
+def is_retryable(error: Exception) -> bool:
+    """Throttling, server errors and dropped connections are worth retrying."""
+    if isinstance(error, HttpError):
+        return getattr(error.resp, 'status', None) in RETRYABLE_STATUSES or is_rate_limited(error)
+    return isinstance(error, (ConnectionError, TimeoutError, socket.timeout))
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """The ``Retry-After`` delay (in seconds) sent with an error response, if any."""
+    resp = getattr(error, 'resp', None)
+    if resp is None:
+        return None
+    value = resp.get('retry-after') if hasattr(resp, 'get') else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        # HTTP-date form is rare for Gmail; fall back to our own backoff
+        return None
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` units per second.
+
+    A request larger than the bucket is let through once the bucket is
+    full, leaving it in debt, so big batches are paced rather than blocked.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, units: float):
+        """Block until ``units`` can be spent, then spend them."""
+        needed = min(units, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.paused_until and self.tokens >= needed:
+                    self.tokens -= units
+                    return
+                wait = max(self.paused_until - now, (needed - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold back every caller for ``seconds`` (after Gmail throttled us)."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+class GmailRateLimiter:
+    """Paces one account's Gmail calls by quota units and retries transient failures.
+
+    Retries use exponential backoff with full jitter, never waiting less
+    than a ``Retry-After`` the server asked for. A throttling response also
+    pauses the account's bucket, so concurrent callers back off together.
+    """
+
+    def __init__(self, units_per_second: float = DEFAULT_UNITS_PER_SECOND,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = DEFAULT_RETRY_BASE_DELAY,
+                 max_delay: float = DEFAULT_RETRY_MAX_DELAY):
+        self.bucket = TokenBucket(units_per_second)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # API calls made through this limiter (including retries), by method
+        self.calls: Counter = Counter()
+        self._calls_lock = threading.Lock()
+
+    def acquire(self, units: int):
+        self.bucket.acquire(units)
+
+    def record_calls(self, method: str, count: int = 1):
+        with self._calls_lock:
+            self.calls[method] += count
+
+    def call_counts(self) -> Dict[str, int]:
+        with self._calls_lock:
+            return dict(self.calls)
+
+    @staticmethod
+    def observe_call(method: str, started: float, error: Optional[Exception] = None):
+        """Export one call's outcome and latency (``started`` is a perf_counter reading)."""
+        GMAIL_API_CALLS.labels(method, error_status(error)).inc()
+        GMAIL_API_LATENCY.labels(method).observe(time.perf_counter() - started)
+
+    def backoff_delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Delay before retry number ``attempt`` (0-based)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def backoff(self, attempt: int, error: Optional[Exception] = None):
+        """Sleep before a retry; throttling errors pause the whole account."""
+        delay = self.backoff_delay(attempt, error)
+        if error is not None and is_rate_limited(error):
+            logger.warning(f"Gmail rate limit hit, backing off {delay:.1f}s")
+            self.bucket.pause(delay)
+        time.sleep(delay)
+
+    def execute(self, request, method: str, http=None):
+        """Execute an API request, charging its quota cost and retrying transient errors."""
+        attempt = 0
+        while True:
+            self.acquire(quota_cost(method))
+            self.record_calls(method)
+            started = time.perf_counter()
+            try:
+                response = request.execute(http=http) if http is not None else request.execute()
+            except Exception as e:
+                self.observe_call(method, started, e)
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                logger.warning(f"{method} failed ({e}), retry {attempt + 1}/{self.max_retries}")
+                self.backoff(attempt, e)
+                attempt += 1
+                continue
+            self.observe_call(method, started)
+            return response
@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+import time
+import logging
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+DEFAULT_MAX_AGE_DAYS = 30
+# Bytes read per step when scanning a log file backwards
+TAIL_BLOCK_SIZE = 8192
+
+def _read_tail_lines(path: str, limit: int) -> List[bytes]:
+    """Return the last ``limit`` non-empty lines of a file, reading it from the end."""
+    if limit <= 0:
+        return []
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return []
+    with f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        buffer = b''
+        lines: List[bytes] = []
+        while position > 0:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            buffer = f.read(step) + buffer
+            lines = buffer.split(b'\n')
+            # The first piece may be a partial line unless we reached the start
+            complete = lines if position == 0 else lines[1:]
+            if sum(1 for line in complete if line.strip()) >= limit:
+                break
+        if position > 0:
+            lines = lines[1:]
+    return [line for line in lines if line.strip()][-limit:]
+
+class RunLog:
+    """Append-only JSON Lines log of fetch runs with size and age based rotation.
+
+    New records are appended to ``path``. When the file would grow past
+    ``max_bytes``, or its first record is older than ``max_age_days``, it is
+    rotated to ``path.1`` (older files shift up, keeping ``backup_count``).
+    :meth:`tail` reads only as much of the end of the files as it needs.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 backup_count: int = DEFAULT_BACKUP_COUNT, max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.max_age = timedelta(days=max_age_days) if max_age_days else None
+        self.lock = threading.Lock()
+        self._first_timestamp: Optional[str] = None
+
+    def _files(self) -> List[str]:
+        """The active file followed by the backups, newest first."""
+        return [self.path] + [f"{self.path}.{i}" for i in range(1, self.backup_count + 1)]
+
+    def _oldest_timestamp(self) -> Optional[str]:
+        if self._first_timestamp is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    first = f.readline()
+                self._first_timestamp = json.loads(first).get('timestamp') if first.strip() else None
+            except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+                self._first_timestamp = None
+        return self._first_timestamp
+
+    def _should_rotate(self, incoming: int, by_age: bool = True) -> bool:
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return False
+        if size and size + incoming > self.max_bytes:
+            return True
+        oldest = self._oldest_timestamp() if by_age else None
+        if self.max_age and oldest:
+            try:
+                started = datetime.fromisoformat(oldest.rstrip('Z'))
+            except ValueError:
+                return False
+            return datetime.utcnow() - started > self.max_age
+        return False
+
+    def _rotate(self):
+        files = self._files()
+        if os.path.exists(files[-1]):
+            os.remove(files[-1])
+        for src, dst in zip(reversed(files[:-1]), reversed(files[1:])):
+            if os.path.exists(src):
+                os.replace(src, dst)
+        self._first_timestamp = None
+
+    def append(self, record: Dict, rotate_by_age: bool = True):
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            if self._should_rotate(len(line), rotate_by_age):
+                self._rotate()
+            with open(self.path, 'ab') as f:
+                f.write(line)
+            if self._first_timestamp is None:
+                self._first_timestamp = record.get('timestamp')
+
+    def tail(self, limit: int = 10) -> List[Dict]:
+        """The most recent ``limit`` records, oldest first."""
+        records: List[Dict] = []
+        for path in self._files():
+            if len(records) >= limit:
+                break
+            lines = _read_tail_lines(path, limit - len(records))
+            parsed = []
+            for line in lines:
+                try:
+                    parsed.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping malformed run log line in {path}")
+            records = parsed + records
+        return records[-limit:] if limit > 0 else []
+
+    def import_legacy(self, legacy_path: str) -> int:
+        """Append the records of an old JSON-array log once, then rename it aside."""
+        if not os.path.exists(legacy_path):
+            return 0
+        try:
+            with open(legacy_path, 'r') as f:
+                entries = json.load(f)
+        except json.JSONDecodeError:
+            entries = []
+        if not isinstance(entries, list):
+            entries = []
+        for entry in entries:
+            # Legacy records are old by nature; rotating on age would push
+            # each one into its own backup and drop most of them
+            self.append(entry, rotate_by_age=False)
+        os.replace(legacy_path, legacy_path + '.imported')
+        logger.info(f"Imported {len(entries)} records from {legacy_path}")
+        return len(entries)
+
+class RunStats:
+    """Per-stage timings and Gmail API call counts collected during one fetch run."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.api_calls: Counter = Counter()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.stages[stage] += elapsed
+
+    def count_calls(self, counts: Dict[str, int]):
+        with self.lock:
+            self.api_calls.update(counts)
+
+    def to_dict(self) -> Dict:
+        with self.lock:
+            return {
+                'stage_seconds': {stage: round(seconds, 3) for stage, seconds in self.stages.items()},
+                'api_calls': dict(self.api_calls)
+            }
@@ -1,22 +1,43 @@
-import schedule
-import time
 import threading
-import json
 import os
+import time
 import logging
-from datetime import datetime
-from .gmail_fetcher import GmailFetcher
+from datetime import datetime, timezone
+from .cron import CronExpression, resolve_timezone
+from .gmail_fetcher import get_gmail_fetcher
+from .metrics import SCHEDULER_LAG, SCHEDULER_NEXT_RUN, SCHEDULER_RUN_DURATION, SCHEDULER_RUNS
+from .run_log import DEFAULT_BACKUP_COUNT, DEFAULT_MAX_AGE_DAYS, DEFAULT_MAX_BYTES, RunLog
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_SCHEDULE = '0 2 * * *'  # Daily at 2 AM
+# Longest single sleep; the due time is re-checked against the wall clock
+# after each wake so clock changes or suspend cannot delay a run by more
+MAX_SLEEP_SECONDS = 60
+
+RUN_LOG_FILE = 'gmail_runs.jsonl'
+# Array-of-records log used before the JSON Lines run log; imported once
+LEGACY_LOG_FILE = 'gmail_fetch_log.json'
+
 class GmailScheduler:
     def __init__(self):
         """Initialize the Gmail scheduler."""
-        self.fetcher = GmailFetcher()
         self.running = False
         self.thread = None
+        self.cron = None
+        self.next_run = None
+        # Each start() gets its own stop event, so a loop still finishing a
+        # job after stop() can never be revived by a later start()
+        self._stop = threading.Event()
+        self._state_lock = threading.Lock()
+        self.run_log = None
+        self._run_log_lock = threading.Lock()
+        
+    @property
+    def fetcher(self):
+        return get_gmail_fetcher()
         
     def start(self):
         """Start the scheduler in a background thread."""
@@ -24,138 +45,158 @@ class GmailScheduler:
             logger.warning("Scheduler is already running")
             return
             
-        logger.info("Starting Gmail scheduler")
-        self.running = True
-        
-        # Schedule the job based on configuration
+        # Parse the schedule before starting so a bad expression is reported
         settings = self.fetcher.fetcher_settings
-        cron_schedule = settings.get('schedule', '0 2 * * *')  # Default: 2 AM daily
-        
-        # Convert cron to schedule format (simplified for common patterns)
-        if cron_schedule == '0 2 * * *':  # Daily at 2 AM
-            schedule.every().day.at("02:00").do(self._run_fetch_job)
-        elif cron_schedule.startswith('0 */'):  # Every N hours
-            hours = int(cron_schedule.split('*/')[1].split(' ')[0])
-            schedule.every(hours).hours.do(self._run_fetch_job)
-        else:
-            # Default to daily at 2 AM if we can't parse the cron
-            logger.warning(f"Unsupported cron format: {cron_schedule}, defaulting to daily at 2 AM")
-            schedule.every().day.at("02:00").do(self._run_fetch_job)
+        cron_schedule = settings.get('schedule', DEFAULT_SCHEDULE)
+        try:
+            cron = CronExpression(cron_schedule, resolve_timezone(settings.get('schedule_timezone')))
+        except ValueError as e:
+            logger.error(f"Invalid schedule {cron_schedule!r}: {e}")
+            raise
             
-        # Start the scheduler thread
-        self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
-        self.thread.start()
+        with self._state_lock:
+            if self.running:
+                logger.warning("Scheduler is already running")
+                return
+            logger.info("Starting Gmail scheduler")
+            self.running = True
+            self.cron = cron
+            self._stop = threading.Event()
+            self.next_run = self.cron.next_after(datetime.now(timezone.utc))
+            SCHEDULER_NEXT_RUN.set(self.next_run.timestamp() if self.next_run else 0)
+            
+            # Start the scheduler thread
+            self.thread = threading.Thread(target=self._run_scheduler, args=(self._stop,),
+                                           name='gmail-scheduler', daemon=True)
+            self.thread.start()
         
-        logger.info(f"Gmail scheduler started with schedule: {cron_schedule}")
+        logger.info(f"Gmail scheduler started with schedule: {cron_schedule}, next run at {self.next_run}")
         
     def stop(self):
-        """Stop the scheduler."""
-        if not self.running:
-            return
-            
-        logger.info("Stopping Gmail scheduler")
-        self.running = False
-        schedule.clear()
-        
-        if self.thread and self.thread.is_alive():
-            self.thread.join(timeout=5)
+        """Stop the scheduler without waiting.
+
+        A job already running finishes in the background; its loop then
+        exits without scheduling another run.
+        """
+        with self._state_lock:
+            if not self.running:
+                return
+                
+            logger.info("Stopping Gmail scheduler")
+            self.running = False
+            self._stop.set()
+            self.next_run = None
+            SCHEDULER_NEXT_RUN.set(0)
             
-    def _run_scheduler(self):
-        """Run the scheduler loop."""
-        while self.running:
+    def _run_scheduler(self, stop: threading.Event):
+        """Sleep until the next due time, run the job, repeat until ``stop`` is set."""
+        cron = self.cron
+        with self._state_lock:
+            next_run = self.next_run
+        while not stop.is_set():
+            if next_run is None:
+                logger.error(f"Schedule {cron.expression!r} never fires, scheduler idle")
+                stop.wait()
+                break
+                
+            remaining = (next_run - datetime.now(timezone.utc)).total_seconds()
+            if remaining > 0:
+                # Interruptible: stop() wakes this immediately
+                stop.wait(min(remaining, MAX_SLEEP_SECONDS))
+                continue
+                
+            SCHEDULER_LAG.observe((datetime.now(timezone.utc) - next_run).total_seconds())
             try:
-                schedule.run_pending()
-                time.sleep(60)  # Check every minute
+                self._run_fetch_job(trigger='schedule')
             except Exception as e:
                 logger.error(f"Scheduler error: {e}")
-                time.sleep(60)
-                
-    def _run_fetch_job(self):
+            # Schedule from the due time (not from now) so a slow run never
+            # fires the same slot twice
+            next_run = cron.next_after(max(next_run, datetime.now(timezone.utc)))
+            with self._state_lock:
+                if stop.is_set():
+                    # Stopped (and maybe restarted) during the job; the state is no longer ours
+                    break
+                self.next_run = next_run
+                SCHEDULER_NEXT_RUN.set(next_run.timestamp() if next_run else 0)
+            
+    def _run_fetch_job(self, progress=None, trigger: str = 'manual'):
         """Execute the Gmail fetch job."""
         logger.info("Starting scheduled Gmail fetch job")
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
         try:
-            result = self.fetcher.fetch_recent_emails()
+            result = get_gmail_fetcher().fetch_recent_emails(progress=progress)
             logger.info(f"Gmail fetch job completed: {result}")
-
-            # Log results to a file for debugging
-            self._log_job_result(result)
-            return result
-
         except Exception as e:
             logger.error(f"Gmail fetch job failed: {e}")
-            error_result = {'status': 'error', 'message': str(e)}
-            self._log_job_result(error_result)
-            return error_result
-            
-    def _log_job_result(self, result: dict):
-        """Log job results to a file."""
-        try:
-            log_dir = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 
-                'data'
-            )
-            log_file = os.path.join(log_dir, 'gmail_fetch_log.json')
+            result = {'status': 'error', 'message': str(e)}
             
-            log_entry = {
-                'timestamp': datetime.utcnow().isoformat() + 'Z',
-                'result': result
-            }
+        duration = time.perf_counter() - started
+        SCHEDULER_RUNS.labels(trigger, result.get('status')).inc()
+        SCHEDULER_RUN_DURATION.labels(trigger).observe(duration)
+        self._log_job_result(result, started_at, duration, trigger)
+        return result
             
-            # Read existing log
-            logs = []
-            if os.path.exists(log_file):
+    def _get_log_dir(self) -> str:
+        return os.path.join(
+            os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 
+            'data'
+        )
+        
+    def _get_run_log(self) -> RunLog:
+        """Open the run log, importing the legacy JSON log the first time."""
+        with self._run_log_lock:
+            if self.run_log is None:
+                settings = get_gmail_fetcher().fetcher_settings
+                log_dir = self._get_log_dir()
+                run_log = RunLog(
+                    os.path.join(log_dir, RUN_LOG_FILE),
+                    max_bytes=int(settings.get('run_log_max_bytes', DEFAULT_MAX_BYTES)),
+                    backup_count=int(settings.get('run_log_backups', DEFAULT_BACKUP_COUNT)),
+                    max_age_days=float(settings.get('run_log_max_age_days', DEFAULT_MAX_AGE_DAYS))
+                )
                 try:
-                    with open(log_file, 'r') as f:
-                        logs = json.load(f)
-                except json.JSONDecodeError:
-                    logs = []
-                    
-            # Append new entry
-            logs.append(log_entry)
+                    run_log.import_legacy(os.path.join(log_dir, LEGACY_LOG_FILE))
+                except Exception as e:
+                    logger.error(f"Failed to import legacy job log: {e}")
+                self.run_log = run_log
+            return self.run_log
             
-            # Keep only the last 100 entries
-            logs = logs[-100:]
-            
-            # Write back to file
-            os.makedirs(log_dir, exist_ok=True)
-            with open(log_file, 'w') as f:
-                json.dump(logs, f, indent=2)
-                
+    def _log_job_result(self, result: dict, started_at: datetime, duration: float, trigger: str = 'manual'):
+        """Append one run record to the run log."""
+        try:
+            finished_at = datetime.utcnow().isoformat() + 'Z'
+            result = dict(result)
+            stats = result.pop('stats', None) or {}
+            self._get_run_log().append({
+                'timestamp': finished_at,
+                'started_at': started_at.isoformat() + 'Z',
+                'finished_at': finished_at,
+                'duration_seconds': round(duration, 3),
+                'trigger': trigger,
+                'result': result,
+                'stage_seconds': stats.get('stage_seconds', {}),
+                'api_calls': stats.get('api_calls', {})
+            })
         except Exception as e:
             logger.error(f"Failed to log job result: {e}")
             
-    def run_now(self):
+    def run_now(self, progress=None):
         """Manually trigger the fetch job immediately."""
         logger.info("Manually triggering Gmail fetch job")
-        return self._run_fetch_job()
+        return self._run_fetch_job(progress=progress, trigger='manual')
         
     def get_next_run_time(self):
         """Get the next scheduled run time."""
-        jobs = schedule.get_jobs()
-        if not jobs:
+        if not self.running or self.next_run is None:
             return None
-            
-        next_run = min(job.next_run for job in jobs)
-        return next_run.isoformat() if next_run else None
+        return self.next_run.isoformat()
         
     def get_job_logs(self, limit: int = 10):
-        """Get recent job execution logs."""
+        """Get recent job execution logs (oldest first), reading only the tail of the log."""
         try:
-            log_dir = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 
-                'data'
-            )
-            log_file = os.path.join(log_dir, 'gmail_fetch_log.json')
-            
-            if not os.path.exists(log_file):
-                return []
-                
-            with open(log_file, 'r') as f:
-                logs = json.load(f)
-                
-            # Return the most recent logs
-            return logs[-limit:] if logs else []
-            
+            return self._get_run_log().tail(limit)
         except Exception as e:
             logger.error(f"Failed to get job logs: {e}")
             return []
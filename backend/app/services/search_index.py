@@ -0,0 +1,158 @@
+import os
+import re
+import sqlite3
+import threading
+import logging
+from typing import Dict, Iterable, List, Optional
+from .html_normalizer import get_html_normalizer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Quoted phrases or bare terms (optionally ending in * for prefix search)
+QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+# bm25 column weights: messageId (unindexed), subject, sender, body
+BM25_WEIGHTS = (0.0, 10.0, 4.0, 1.0)
+
+def build_match_expression(query: str) -> str:
+    """Translate a user query into a safe FTS5 MATCH expression.
+
+    Supports bare terms, "quoted phrases" and trailing-* prefix terms; all
+    parts must match. Anything else is quoted so FTS5 syntax characters in
+    user input cannot break the query.
+    """
+    parts = []
+    for phrase, term in QUERY_TOKEN.findall(query or ''):
+        if phrase:
+            words = phrase.split()
+            if words:
+                parts.append('"' + ' '.join(words).replace('"', '""') + '"')
+            continue
+        prefix = term.endswith('*')
+        term = term.rstrip('*').replace('"', '""')
+        if not term:
+            continue
+        parts.append(f'"{term}"' + ('*' if prefix else ''))
+    return ' AND '.join(parts)
+
+
+class SearchIndex:
+    """Inverted full-text index (SQLite FTS5) over message subject, sender and body."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.executescript('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS message_fts USING fts5(
+                    messageId UNINDEXED,
+                    subject,
+                    sender,
+                    body,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                );
+                CREATE TABLE IF NOT EXISTS message_meta (
+                    rowid INTEGER PRIMARY KEY,
+                    messageId TEXT UNIQUE,
+                    sender TEXT,
+                    date TEXT,
+                    retrievalTimestamp TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_meta_retrieval ON message_meta(retrievalTimestamp);
+            ''')
+            self.conn.commit()
+
+    def add_many(self, messages: Iterable[Dict]):
+        """Index messages (which must carry their body), replacing existing entries.
+
+        The normalized text of the body is indexed rather than its markup.
+        """
+        normalizer = get_html_normalizer()
+        with self.lock, self.conn:
+            for message in messages:
+                message_id = message.get('messageId')
+                if not message_id:
+                    continue
+                self._remove(message_id)
+                cursor = self.conn.execute(
+                    'INSERT INTO message_meta (messageId, sender, date, retrievalTimestamp) VALUES (?, ?, ?, ?)',
+                    (message_id, message.get('sender'), message.get('date'), message.get('retrievalTimestamp'))
+                )
+                self.conn.execute(
+                    'INSERT INTO message_fts (rowid, messageId, subject, sender, body) VALUES (?, ?, ?, ?, ?)',
+                    (cursor.lastrowid, message_id, message.get('subject') or '',
+                     message.get('sender') or '', normalizer.normalize(message.get('body') or '', message.get('bodyHash')))
+                )
+
+    def _remove(self, message_id: str):
+        row = self.conn.execute('SELECT rowid FROM message_meta WHERE messageId = ?', (message_id,)).fetchone()
+        if row:
+            self.conn.execute('DELETE FROM message_fts WHERE rowid = ?', (row[0],))
+            self.conn.execute('DELETE FROM message_meta WHERE rowid = ?', (row[0],))
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM message_fts')
+            self.conn.execute('DELETE FROM message_meta')
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM message_meta').fetchone()[0]
+
+    def search(self, query: str, sender: Optional[str] = None, since: Optional[str] = None,
+               until: Optional[str] = None, limit: int = 20, offset: int = 0) -> List[Dict]:
+        """Ranked search. ``sender`` is a case-insensitive substring filter;
+        ``since``/``until`` bound ``retrievalTimestamp`` (ISO 8601)."""
+        expression = build_match_expression(query)
+        if not expression:
+            return []
+
+        conditions = ['message_fts MATCH ?']
+        params: List = [expression]
+        if sender:
+            conditions.append("m.sender LIKE ? ESCAPE '\\'")
+            escaped = sender.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f'%{escaped}%')
+        if since:
+            conditions.append('m.retrievalTimestamp >= ?')
+            params.append(since)
+        if until:
+            conditions.append('m.retrievalTimestamp <= ?')
+            params.append(until)
+
+        weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+        sql = f'''
+            SELECT m.messageId, message_fts.subject AS subject, m.sender, m.date, m.retrievalTimestamp,
+                   bm25(message_fts, {weights}) AS rank,
+                   snippet(message_fts, 3, '[', ']', '...', 16) AS snippet
+            FROM message_fts JOIN message_meta m ON m.rowid = message_fts.rowid
+            WHERE {' AND '.join(conditions)}
+            ORDER BY rank
+            LIMIT ? OFFSET ?
+        '''
+        with self.lock:
+            try:
+                rows = self.conn.execute(sql, params + [limit, offset]).fetchall()
+            except sqlite3.OperationalError as e:
+                raise ValueError(f"Invalid search query: {e}") from e
+
+        return [{
+            'messageId': row['messageId'],
+            'subject': row['subject'],
+            'sender': row['sender'],
+            'date': row['date'],
+            'retrievalTimestamp': row['retrievalTimestamp'],
+            # bm25 is lower-is-better; expose higher-is-better
+            'score': -row['rank'],
+            'snippet': row['snippet']
+        } for row in rows]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
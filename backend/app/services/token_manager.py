@@ -0,0 +1,118 @@
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Refresh this long before the access token expires
+DEFAULT_REFRESH_MARGIN = 300
+# Wait this long before retrying a failed background refresh
+DEFAULT_RETRY_INTERVAL = 30
+# Assumed token lifetime when Google does not report an expiry
+DEFAULT_TOKEN_LIFETIME = 3000
+
+def parse_token_expiry(value: Optional[str]) -> Optional[datetime]:
+    """Parse a stored ``token_expiry`` into the naive UTC datetime google-auth uses."""
+    if not value:
+        return None
+    try:
+        expiry = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        logger.warning(f"Ignoring unparseable token_expiry: {value!r}")
+        return None
+    if expiry.tzinfo is not None:
+        expiry = expiry.astimezone(timezone.utc).replace(tzinfo=None)
+    return expiry
+
+class TokenManager:
+    """Keeps the OAuth access token fresh ahead of its expiry.
+
+    A background thread refreshes the token ``refresh_margin`` seconds
+    before it expires, so API calls find a valid token instead of
+    refreshing inline. Concurrent refresh requests share a single refresh,
+    and each new token is handed to ``on_refresh(token, expiry)`` to be
+    persisted.
+    """
+
+    def __init__(self, credentials: Credentials,
+                 on_refresh: Optional[Callable[[str, Optional[datetime]], None]] = None,
+                 refresh_margin: int = DEFAULT_REFRESH_MARGIN,
+                 retry_interval: int = DEFAULT_RETRY_INTERVAL):
+        self.credentials = credentials
+        self.on_refresh = on_refresh
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.retry_interval = retry_interval
+        # Bumped on every successful refresh; lets waiting callers skip theirs
+        self.generation = 0
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = None
+
+    def seconds_until_refresh(self) -> float:
+        """Seconds until the token should next be refreshed (0 if now)."""
+        creds = self.credentials
+        if not creds.token:
+            return 0
+        if creds.expiry is None:
+            # Unknown expiry: refresh once to learn it
+            return 0 if self.generation == 0 else DEFAULT_TOKEN_LIFETIME
+        due = creds.expiry - self.refresh_margin
+        return max(0.0, (due - datetime.utcnow()).total_seconds())
+
+    def get_credentials(self) -> Credentials:
+        """Return credentials holding a usable token.
+
+        Only refreshes inline when there is no usable token at all (first
+        start, or the background refresh has been failing).
+        """
+        if not self.credentials.valid:
+            self.refresh()
+        return self.credentials
+
+    def refresh(self) -> Credentials:
+        """Refresh the access token; concurrent callers share one refresh."""
+        seen = self.generation
+        with self.lock:
+            if self.generation != seen:
+                # Another caller refreshed while we waited for the lock
+                return self.credentials
+            self.credentials.refresh(Request())
+            self.generation += 1
+            logger.info(f"Refreshed Gmail access token, expires {self.credentials.expiry}")
+            if self.on_refresh:
+                try:
+                    self.on_refresh(self.credentials.token, self.credentials.expiry)
+                except Exception as e:
+                    logger.error(f"Failed to persist refreshed token: {e}")
+        return self.credentials
+
+    def start(self):
+        """Start refreshing in the background."""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._run, name='gmail-token-refresh', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = self.seconds_until_refresh()
+            if delay > 0:
+                # Re-evaluate after waking; an inline refresh may have moved the expiry
+                self._stop.wait(delay)
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Background token refresh failed, retrying in {self.retry_interval}s: {e}")
+                self._stop.wait(self.retry_interval)
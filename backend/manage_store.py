@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Message store maintenance commands.
+
+Usage:
+    python manage_store.py migrate --to ../data/messages.db
+    python manage_store.py migrate --from ../data/messages.json --to ../data/messages.db
+    python manage_store.py migrate --to ../data/messages.db --body-storage blob
+    python manage_store.py rebuild-stats
+    python manage_store.py rebuild-search
+
+After migrating, point `storage_path` in config/fetcherSettings.json at the
+new file (and optionally set `storage_backend` to "sqlite").
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.services.message_store import migrate_store, open_message_store, resolve_backend
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+def migrate(args):
+    """Copy all messages from one store into another."""
+    source_path = os.path.abspath(args.source)
+    target_path = os.path.abspath(args.target)
+
+    if not os.path.exists(source_path):
+        print(f"Source store not found: {source_path}")
+        return 1
+    if source_path == target_path:
+        print("Source and target must be different files")
+        return 1
+
+    source_backend = resolve_backend(source_path, args.source_backend)
+    target_backend = resolve_backend(target_path, args.target_backend)
+    print(f"Migrating {source_path} ({source_backend}) -> {target_path} ({target_backend})")
+
+    source = open_message_store(source_path, source_backend)
+    target = open_message_store(target_path, target_backend, args.body_storage)
+    try:
+        result = migrate_store(source, target)
+    finally:
+        source.close()
+        target.close()
+
+    print(f"Copied {result['copied']} messages, skipped {result['skipped']}")
+    return 0
+
+def rebuild_stats(args):
+    """Recompute the persisted message statistics from the store."""
+    store_path = os.path.abspath(args.store)
+    if not os.path.exists(store_path):
+        print(f"Store not found: {store_path}")
+        return 1
+
+    store = open_message_store(store_path, args.backend)
+    try:
+        stats = store.rebuild_stats()
+    finally:
+        store.close()
+
+    print(f"Rebuilt stats: {stats['total_messages']} messages from {stats['unique_senders']} senders")
+    return 0
+
+def rebuild_search(args):
+    """Rebuild the full-text search index from the store."""
+    store_path = os.path.abspath(args.store)
+    if not os.path.exists(store_path):
+        print(f"Store not found: {store_path}")
+        return 1
+
+    store = open_message_store(store_path, args.backend)
+    try:
+        indexed = store.rebuild_search_index()
+    finally:
+        store.close()
+
+    print(f"Indexed {indexed} messages")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Message store maintenance")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help="Copy messages between store backends")
+    migrate_parser.add_argument('--from', dest='source', default=os.path.join(DATA_DIR, 'messages.json'),
+                                help="Source store (default: data/messages.json)")
+    migrate_parser.add_argument('--to', dest='target', required=True, help="Target store")
+    migrate_parser.add_argument('--from-backend', dest='source_backend', choices=['tinydb', 'sqlite'])
+    migrate_parser.add_argument('--to-backend', dest='target_backend', choices=['tinydb', 'sqlite'])
+    migrate_parser.add_argument('--body-storage', dest='body_storage', choices=['inline', 'blob'], default='inline',
+                                help="Keep bodies inline in the target or move them to the blob store")
+    migrate_parser.set_defaults(func=migrate)
+
+    stats_parser = subparsers.add_parser('rebuild-stats', help="Recompute persisted message statistics")
+    stats_parser.add_argument('--store', default=os.path.join(DATA_DIR, 'messages.json'),
+                              help="Store to rebuild (default: data/messages.json)")
+    stats_parser.add_argument('--backend', choices=['tinydb', 'sqlite'])
+    stats_parser.set_defaults(func=rebuild_stats)
+
+    search_parser = subparsers.add_parser('rebuild-search', help="Rebuild the full-text search index")
+    search_parser.add_argument('--store', default=os.path.join(DATA_DIR, 'messages.json'),
+                               help="Store to index (default: data/messages.json)")
+    search_parser.add_argument('--backend', choices=['tinydb', 'sqlite'])
+    search_parser.set_defaults(func=rebuild_search)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
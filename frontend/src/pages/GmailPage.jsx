@@ -56,7 +56,7 @@ const GmailPage = () => {
 
   const fetchMessages = async () => {
     try {
-      const response = await fetch(`${apiBase}/messages?limit=50`);
+      const response = await fetch(`${apiBase}/messages?limit=50&snippet=200`);
       const data = await response.json();
       setMessages(data);
     } catch (err) {
@@ -78,7 +78,15 @@ const GmailPage = () => {
     setLoading(true);
     try {
       const response = await fetch(`${apiBase}/fetch`, { method: 'POST' });
-      const result = await response.json();
+      let job = await response.json();
+
+      // The fetch runs in the background; poll the job until it finishes
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const jobResponse = await fetch(`${apiBase}/jobs/${job.job_id}`);
+        job = await jobResponse.json();
+      }
+      const result = job.result || { status: 'error', message: job.error };
       
       if (result.status === 'success') {
         alert(`Successfully processed ${result.processed} new messages`);
@@ -228,8 +236,7 @@ const GmailPage = () => {
               <span className="date">Date: {message.date}</span>
             </div>
             <div className="message-body">
-              {message.body.substring(0, 200)}
-              {message.body.length > 200 && '...'}
+              {message.snippet}
             </div>
           </div>
         ))}
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Ingestion benchmark against the offline Gmail stand-in (no network needed).
+
+For each mailbox size it runs a full fetch into a fresh store and reports
+throughput, time per stage, API calls and store growth, then a second run
+over the same mailbox (everything is already stored) and a first-page read.
+
+Usage:
+    python tests/bench_ingest.py
+    python tests/bench_ingest.py --sizes 1000 10000 --store sqlite
+    python tests/bench_ingest.py --mime plain=1,html=1,alternative=2,mixed=1 --duplicate-rate 0.1
+    python tests/bench_ingest.py --latency 0.05 --rate-limit-rate 0.02 --json
+    python tests/bench_ingest.py --message-format raw
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_gmail import FakeGmailService, MailboxSpec, build_fetcher
+
+def parse_mime_mix(value: str):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def store_bytes(data_dir: str) -> int:
+    """Bytes used by the store and its sidecars (ids, stats, search index, bodies)."""
+    total = 0
+    for root, _, files in os.walk(data_dir):
+        for name in files:
+            if not name.startswith('gmail_sync_state'):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def run_size(size: int, args) -> dict:
+    spec = MailboxSpec(
+        size=size,
+        body_size=args.body_size,
+        mime_mix=parse_mime_mix(args.mime),
+        duplicate_rate=args.duplicate_rate,
+        relist_rate=args.relist_rate,
+        latency=args.latency,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed
+    )
+    service = FakeGmailService(spec)
+    root = tempfile.mkdtemp(prefix=f'bench-{size}-')
+    settings = {
+        'storage_path': os.path.join(root, 'data', 'messages.db' if args.store == 'sqlite' else 'messages.json'),
+        'body_storage': args.body_storage,
+        'batch_size': args.batch_size,
+        'list_page_size': args.page_size,
+        'message_format': args.message_format
+    }
+    if args.quota:
+        settings['quota_units_per_second'] = args.quota
+    try:
+        fetcher = build_fetcher(service, root, settings)
+        data_dir = os.path.join(root, 'data')
+        bytes_before = store_bytes(data_dir)
+
+        started = time.perf_counter()
+        result = fetcher.fetch_recent_emails()
+        elapsed = time.perf_counter() - started
+        bytes_after = store_bytes(data_dir)
+        stats = result.pop('stats', {})
+
+        started = time.perf_counter()
+        rerun = fetcher.fetch_recent_emails()
+        rerun_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        fetcher.get_stored_messages(limit=50, include_body=False, snippet_length=100)
+        page_ms = (time.perf_counter() - started) * 1000
+
+        processed = result.get('processed', 0)
+        return {
+            'size': size,
+            'status': result.get('status'),
+            'message': result.get('message'),
+            'processed': processed,
+            'skipped': result.get('skipped'),
+            'seconds': round(elapsed, 3),
+            'messages_per_second': round(processed / elapsed, 1) if elapsed else None,
+            'stage_seconds': stats.get('stage_seconds', {}),
+            'api_calls': stats.get('api_calls', {}),
+            'throttled': service.calls['429'],
+            'store_bytes': bytes_after - bytes_before,
+            'bytes_per_message': round((bytes_after - bytes_before) / processed) if processed else None,
+            'rerun_seconds': round(rerun_elapsed, 3),
+            'rerun_processed': rerun.get('processed'),
+            'first_page_ms': round(page_ms, 2)
+        }
+    finally:
+        if args.keep:
+            print(f"Kept benchmark files in {root}", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+def print_report(row: dict):
+    print(f"\n== {row['size']} messages: {row['status']}"
+          + (f" ({row['message']})" if row['message'] else ''))
+    print(f"  ingested      {row['processed']} in {row['seconds']}s "
+          f"({row['messages_per_second']} msg/s), skipped {row['skipped']}")
+    stages = ', '.join(f"{stage} {seconds}s" for stage, seconds in sorted(row['stage_seconds'].items()))
+    print(f"  stages        {stages}")
+    calls = ', '.join(f"{method} {count}" for method, count in sorted(row['api_calls'].items()))
+    print(f"  api calls     {calls}; throttled {row['throttled']}")
+    print(f"  store growth  {row['store_bytes']} bytes ({row['bytes_per_message']} per message)")
+    print(f"  re-run        {row['rerun_seconds']}s, {row['rerun_processed']} new")
+    print(f"  first page    {row['first_page_ms']} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Gmail ingestion against a synthetic mailbox")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Mailbox sizes to benchmark (default: 1000 10000 100000)")
+    parser.add_argument('--store', choices=['json', 'sqlite'], default='json', help="Store backend")
+    parser.add_argument('--body-storage', choices=['inline', 'blob'], default='inline')
+    parser.add_argument('--body-size', type=int, default=2000, help="Approximate body size in bytes")
+    parser.add_argument('--mime', default='plain=1,html=1,alternative=1',
+                        help="Weighted MIME layouts: plain, html, alternative, mixed")
+    parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                        help="Fraction of messages repeating an earlier body")
+    parser.add_argument('--relist-rate', type=float, default=0.0,
+                        help="Fraction of listing entries repeating an earlier id")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to each HTTP round trip")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Probability of a 429 per call")
+    parser.add_argument('--quota', type=float, default=0,
+                        help="Quota units per second to pace at (default: unpaced)")
+    parser.add_argument('--message-format', choices=['full', 'raw'], default='full',
+                        help="Format messages are downloaded in")
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated stores")
+    parser.add_argument('--verbose', action='store_true', help="Keep the fetcher's per-message logging")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.disable(logging.INFO)
+
+    rows = []
+    for size in args.sizes:
+        row = run_size(size, args)
+        rows.append(row)
+        if not args.json:
+            print_report(row)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
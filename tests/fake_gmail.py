@@ -0,0 +1,441 @@
+"""
+Offline stand-in for the Gmail API, for tests and benchmarks.
+
+FakeGmailService implements the part of the googleapiclient surface that
+GmailFetcher uses (users().getProfile, messages().list/get, history().list
+and new_batch_http_request) over a synthetic mailbox. Messages are
+generated on demand from their index, so large mailboxes cost little
+memory. Latency and 429 throttling can be injected.
+"""
+
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Union
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+# Make the backend importable when running from the project root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+# Gmail rejects batches of more than 100 calls
+MAX_BATCH_CALLS = 100
+FIRST_HISTORY_ID = 1000
+
+WORDS = ('gmail', 'report', 'update', 'market', 'policy', 'weekly', 'brief', 'analysis', 'europe',
+         'science', 'budget', 'election', 'energy', 'climate', 'security', 'trade', 'health', 'data')
+
+# MIME layouts a synthetic message can have
+MIME_STRUCTURES = ('plain', 'html', 'alternative', 'mixed')
+
+@dataclass
+class MailboxSpec:
+    """Shape of a synthetic mailbox.
+
+    ``mime_mix`` weights the MIME layouts (plain, html, multipart/alternative,
+    and multipart/mixed holding an alternative part plus an attachment).
+    ``duplicate_rate`` is the fraction of messages whose body repeats an
+    earlier message under a new id; ``relist_rate`` the fraction of listing
+    entries that repeat an id already listed. ``latency`` seconds are added
+    to every HTTP round trip and ``rate_limit_rate`` is the probability that
+    a call is answered with a 429. ``first_id`` offsets the message ids so
+    that several fake mailboxes do not share ids.
+    """
+    size: int = 1000
+    body_size: int = 2000
+    mime_mix: Dict[str, float] = field(default_factory=lambda: {'plain': 1.0})
+    senders: Sequence[str] = ('ga@gmail.com',)
+    duplicate_rate: float = 0.0
+    relist_rate: float = 0.0
+    latency: float = 0.0
+    rate_limit_rate: float = 0.0
+    seed: int = 0
+    first_id: int = 0
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii')
+
+def _rate_limit_error() -> HttpError:
+    content = json.dumps({'error': {'code': 429, 'message': 'Too many concurrent requests for user',
+                                    'errors': [{'reason': 'rateLimitExceeded'}]}}).encode('utf-8')
+    return HttpError(httplib2.Response({'status': 429, 'retry-after': '0'}), content)
+
+def _not_found_error() -> HttpError:
+    return HttpError(httplib2.Response({'status': 404}), b'{"error": {"code": 404, "message": "Not Found"}}')
+
+def _bad_request_error() -> HttpError:
+    return HttpError(httplib2.Response({'status': 400}), b'{"error": {"code": 400, "message": "Bad Request"}}')
+
+class FakeRequest:
+    def __init__(self, service: 'FakeGmailService', method: str, handler):
+        self.service = service
+        self.method = method
+        self.handler = handler
+
+    def execute(self, http=None, num_retries=0):
+        self.service._round_trip()
+        return self.service._call(self.method, self.handler)
+
+class FakeBatch:
+    def __init__(self, service: 'FakeGmailService', callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request: FakeRequest, callback=None, request_id=None):
+        if len(self.requests) >= MAX_BATCH_CALLS:
+            raise ValueError(f"Batch exceeds {MAX_BATCH_CALLS} calls")
+        self.requests.append((request_id or str(len(self.requests)), request, callback or self.callback))
+
+    def execute(self, http=None):
+        # One round trip for the whole batch; each call succeeds or fails on its own
+        self.service._round_trip()
+        with self.service._lock:
+            self.service.calls['batch'] += 1
+        for request_id, request, callback in self.requests:
+            try:
+                response, error = self.service._call(request.method, request.handler), None
+            except HttpError as e:
+                response, error = None, e
+            if callback:
+                callback(request_id, response, error)
+
+class _Resource:
+    """What ``users()`` returns."""
+
+    def __init__(self, service: 'FakeGmailService'):
+        self.service = service
+
+    def getProfile(self, userId='me'):
+        return FakeRequest(self.service, 'getProfile', self.service._profile)
+
+    def messages(self):
+        return _Messages(self.service)
+
+    def history(self):
+        return _History(self.service)
+
+class _Messages:
+    def __init__(self, service: 'FakeGmailService'):
+        self.service = service
+
+    def list(self, userId='me', q=None, labelIds=None, maxResults=100, pageToken=None, **kwargs):
+        return FakeRequest(self.service, 'messages.list',
+                           lambda: self.service._list_page(int(pageToken or 0), min(int(maxResults or 100), 500)))
+
+    def get(self, userId='me', id=None, format='full', **kwargs):
+        return FakeRequest(self.service, 'messages.get', lambda: self.service.get_message(id, format))
+
+class _History:
+    def __init__(self, service: 'FakeGmailService'):
+        self.service = service
+
+    def list(self, userId='me', startHistoryId=None, maxResults=100, pageToken=None, **kwargs):
+        return FakeRequest(self.service, 'history.list',
+                           lambda: self.service._history_page(int(startHistoryId), int(pageToken or 0),
+                                                              min(int(maxResults or 100), 500)))
+
+class FakeGmailService:
+    """In-memory Gmail API double over a synthetic mailbox (see MailboxSpec)."""
+
+    def __init__(self, spec: Optional[MailboxSpec] = None, **overrides):
+        self.spec = spec or MailboxSpec(**overrides)
+        self.size = self.spec.size
+        self.calls: Counter = Counter()
+        # Oldest history id still available; older checkpoints get a 404
+        self.history_floor = FIRST_HISTORY_ID
+        self.now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        self._random = random.Random(self.spec.seed)
+        self._lock = threading.Lock()
+        self._listing_ids: List[str] = []
+        self._listing_size = None
+        # Ids that still appear in listings and history but answer 404
+        self.deleted = set()
+        # Listing pages from this offset on answer 400 (None: never)
+        self.list_failure_offset: Optional[int] = None
+        names = list(self.spec.mime_mix)
+        weights = [self.spec.mime_mix[name] for name in names]
+        unknown = set(names) - set(MIME_STRUCTURES)
+        if unknown:
+            raise ValueError(f"Unknown MIME structures: {sorted(unknown)}")
+        self._structure_names = names
+        self._structure_weights = weights
+
+    # Client surface
+
+    def users(self):
+        return _Resource(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    # Mailbox
+
+    def add_messages(self, count: int):
+        """Deliver ``count`` new messages (they appear in listings and history)."""
+        with self._lock:
+            self.size += count
+
+    def delete_message(self, message_id: str):
+        """Permanently delete a message; it stays in history but can no longer be fetched."""
+        with self._lock:
+            self.deleted.add(message_id)
+
+    def message_id(self, index: int) -> str:
+        return f"{self.spec.first_id + index:016x}"
+
+    def _index(self, message_id: str) -> int:
+        try:
+            index = int(message_id, 16) - self.spec.first_id
+        except (TypeError, ValueError):
+            raise _not_found_error()
+        if not 0 <= index < self.size:
+            raise _not_found_error()
+        return index
+
+    def _structure(self, index: int) -> str:
+        return random.Random(index * 7919 + self.spec.seed).choices(
+            self._structure_names, self._structure_weights)[0]
+
+    def _body_text(self, index: int) -> str:
+        rng = random.Random(index * 104729 + self.spec.seed)
+        # Duplicates copy the body of an earlier message
+        if index and rng.random() < self.spec.duplicate_rate:
+            return self._body_text(rng.randrange(index))
+        words = []
+        length = 0
+        while length < self.spec.body_size:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return f"Message {index}. " + ' '.join(words)
+
+    def _headers(self, index: int) -> Dict[str, str]:
+        sender = self.spec.senders[index % len(self.spec.senders)]
+        return {
+            'Subject': f"Synthetic message {index}",
+            'From': f"Sender {index % 10} <{sender}>",
+            'To': 'me@example.com',
+            'Date': format_datetime(self.now + timedelta(minutes=index)),
+            'Message-ID': f"<{self.message_id(index)}@fake.gmail>"
+        }
+
+    def _html(self, text: str) -> str:
+        return f"<html><body><p>{text}</p></body></html>"
+
+    def _part(self, mime_type: str, data: bytes, part_id: str, filename: str = '') -> Dict:
+        return {
+            'partId': part_id,
+            'mimeType': mime_type,
+            'filename': filename,
+            'headers': [{'name': 'Content-Type', 'value': f"{mime_type}; charset=\"UTF-8\""}],
+            'body': {'size': len(data), 'data': _b64(data)}
+        }
+
+    def _payload(self, index: int) -> Dict:
+        structure = self._structure(index)
+        text = self._body_text(index)
+        headers = [{'name': name, 'value': value} for name, value in self._headers(index).items()]
+        plain = text.encode('utf-8')
+        html_body = self._html(text).encode('utf-8')
+
+        if structure in ('plain', 'html'):
+            mime_type = 'text/plain' if structure == 'plain' else 'text/html'
+            payload = self._part(mime_type, plain if structure == 'plain' else html_body, '')
+        else:
+            alternative = {
+                'partId': '0' if structure == 'mixed' else '',
+                'mimeType': 'multipart/alternative',
+                'filename': '',
+                'headers': [],
+                'body': {'size': 0},
+                'parts': [self._part('text/plain', plain, '0.0' if structure == 'mixed' else '0'),
+                          self._part('text/html', html_body, '0.1' if structure == 'mixed' else '1')]
+            }
+            if structure == 'alternative':
+                payload = alternative
+            else:
+                attachment = {
+                    'partId': '1',
+                    'mimeType': 'application/pdf',
+                    'filename': f"report-{index}.pdf",
+                    'headers': [],
+                    'body': {'size': 4096, 'attachmentId': f"att-{index}"}
+                }
+                payload = {'partId': '', 'mimeType': 'multipart/mixed', 'filename': '', 'headers': [],
+                           'body': {'size': 0}, 'parts': [alternative, attachment]}
+        payload['headers'] = headers + payload['headers']
+        return payload
+
+    def _mime_part(self, content_type: str, data: bytes, disposition: str = '') -> str:
+        lines = [f"Content-Type: {content_type}", 'Content-Transfer-Encoding: base64']
+        if disposition:
+            lines.append(f"Content-Disposition: {disposition}")
+        return '\r\n'.join(lines) + '\r\n\r\n' + base64.encodebytes(data).decode('ascii').replace('\n', '\r\n')
+
+    def _multipart(self, subtype: str, boundary: str, parts: List[str]) -> str:
+        body = ''.join(f"--{boundary}\r\n{part}\r\n" for part in parts)
+        return f'Content-Type: multipart/{subtype}; boundary="{boundary}"\r\n\r\n{body}--{boundary}--\r\n'
+
+    def _raw(self, index: int) -> str:
+        """The message as RFC 822 text, assembled directly (the email package is slow)."""
+        structure = self._structure(index)
+        text = self._body_text(index)
+        plain = self._mime_part('text/plain; charset="UTF-8"', text.encode('utf-8'))
+        html_part = self._mime_part('text/html; charset="UTF-8"', self._html(text).encode('utf-8'))
+        if structure == 'plain':
+            body = plain
+        elif structure == 'html':
+            body = html_part
+        else:
+            body = self._multipart('alternative', f"alt-{index}", [plain, html_part])
+            if structure == 'mixed':
+                attachment = self._mime_part('application/pdf', b'%PDF-1.4 fake',
+                                             f'attachment; filename="report-{index}.pdf"')
+                body = self._multipart('mixed', f"mixed-{index}", [body, attachment])
+        headers = ''.join(f"{name}: {value}\r\n" for name, value in self._headers(index).items())
+        return _b64((headers + 'MIME-Version: 1.0\r\n' + body).encode('utf-8'))
+
+    def get_message(self, message_id: str, format: str = 'full') -> Dict:
+        index = self._index(message_id)
+        with self._lock:
+            self.calls[f'messages.get:{format}'] += 1
+            if message_id in self.deleted:
+                raise _not_found_error()
+        message = {
+            'id': message_id,
+            'threadId': message_id,
+            'labelIds': ['INBOX'],
+            'historyId': str(FIRST_HISTORY_ID + index + 1),
+            'internalDate': str(int((self.now + timedelta(minutes=index)).timestamp() * 1000)),
+            'snippet': self._body_text(index)[:100],
+            'sizeEstimate': self.spec.body_size
+        }
+        if format == 'raw':
+            message['raw'] = self._raw(index)
+        elif format == 'metadata':
+            message['payload'] = {'headers': [{'name': name, 'value': value}
+                                              for name, value in self._headers(index).items()]}
+        else:
+            message['payload'] = self._payload(index)
+        return message
+
+    # Listing
+
+    def _listing(self, start_index: int) -> List[str]:
+        """Ids from newest to oldest starting below ``start_index``, with re-listed ids mixed in."""
+        ids = []
+        rng = random.Random(self.spec.seed + 1)
+        for index in range(start_index - 1, -1, -1):
+            ids.append(self.message_id(index))
+            if ids and rng.random() < self.spec.relist_rate:
+                ids.append(rng.choice(ids))
+        return ids
+
+    def _list_page(self, offset: int, page_size: int) -> Dict:
+        if self.list_failure_offset is not None and offset >= self.list_failure_offset:
+            raise _bad_request_error()
+        with self._lock:
+            if self._listing_size != self.size:
+                self._listing_ids = self._listing(self.size)
+                self._listing_size = self.size
+            listing = self._listing_ids
+        ids = listing[offset:offset + page_size]
+        result = {'messages': [{'id': msg_id, 'threadId': msg_id} for msg_id in ids],
+                  'resultSizeEstimate': len(listing)}
+        if offset + page_size < len(listing):
+            result['nextPageToken'] = str(offset + page_size)
+        return result
+
+    def _history_page(self, start_history_id: int, offset: int, page_size: int) -> Dict:
+        if start_history_id < self.history_floor:
+            raise _not_found_error()
+        with self._lock:
+            size = self.size
+        first = max(0, start_history_id - FIRST_HISTORY_ID)
+        indexes = range(first + offset, min(size, first + offset + page_size))
+        result = {
+            'history': [{'id': str(FIRST_HISTORY_ID + index + 1),
+                         'messagesAdded': [{'message': {'id': self.message_id(index), 'labelIds': ['INBOX']}}]}
+                        for index in indexes],
+            'historyId': str(FIRST_HISTORY_ID + size)
+        }
+        if first + offset + page_size < size:
+            result['nextPageToken'] = str(offset + page_size)
+        return result
+
+    def _profile(self) -> Dict:
+        with self._lock:
+            size = self.size
+        return {'emailAddress': 'me@example.com', 'messagesTotal': size,
+                'threadsTotal': size, 'historyId': str(FIRST_HISTORY_ID + size)}
+
+    # Transport simulation
+
+    def _round_trip(self):
+        if self.spec.latency:
+            time.sleep(self.spec.latency)
+
+    def _call(self, method: str, handler):
+        with self._lock:
+            self.calls[method] += 1
+            throttled = self.spec.rate_limit_rate and self._random.random() < self.spec.rate_limit_rate
+            if throttled:
+                self.calls['429'] += 1
+        if throttled:
+            raise _rate_limit_error()
+        return handler()
+
+def build_fetcher(service: Union[FakeGmailService, Dict[str, FakeGmailService]], root: str,
+                  settings: Optional[Dict] = None):
+    """A GmailFetcher whose config, store and sync state live under ``root`` and
+    whose (only) account talks to ``service``.
+
+    ``service`` may also map account names to services, for a fetcher with
+    one account per fake mailbox.
+    """
+    from app.services.gmail_fetcher import GmailFetcher
+
+    config_dir = os.path.join(root, 'config')
+    data_dir = os.path.join(root, 'data')
+    os.makedirs(config_dir, exist_ok=True)
+    os.makedirs(data_dir, exist_ok=True)
+    fetcher_settings = {
+        'sender_whitelist': [],
+        'storage_path': os.path.join(data_dir, 'messages.json'),
+        'lookback_hours': 24,
+        'sync_mode': 'query',
+        # The fake has no quota; pace only when a caller sets a real limit
+        'quota_units_per_second': 10 ** 9,
+        # Injected 429s carry Retry-After: 0; keep backoff short offline
+        'retry_base_delay': 0.001,
+        'retry_max_delay': 0.01
+    }
+    fetcher_settings.update(settings or {})
+    credentials = {'client_id': 'fake', 'client_secret': 'fake', 'refresh_token': 'fake', 'access_token': 'fake'}
+    if isinstance(service, dict):
+        gmail_config = {'accounts': [{'name': name, 'gmail_credentials': dict(credentials)} for name in service]}
+    else:
+        gmail_config = {'gmail_credentials': credentials}
+    with open(os.path.join(config_dir, 'gmail.json'), 'w') as f:
+        json.dump(gmail_config, f)
+    with open(os.path.join(config_dir, 'fetcherSettings.json'), 'w') as f:
+        json.dump(fetcher_settings, f)
+
+    fetcher = GmailFetcher(config_dir=config_dir)
+    fetcher.data_dir = data_dir
+    if isinstance(service, dict):
+        for account in fetcher.accounts:
+            account.service = service[account.name]
+    else:
+        fetcher.service = service
+    return fetcher
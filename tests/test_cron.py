@@ -0,0 +1,123 @@
+"""Tests for the cron expression parser and next-run calculation."""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from app.services.cron import CronExpression, _parse_field
+
+UTC = timezone.utc
+NEW_YORK = ZoneInfo('America/New_York')
+
+
+def runs(expression, start, count, tz=UTC):
+    cron = CronExpression(expression, tz)
+    times, t = [], start
+    for _ in range(count):
+        t = cron.next_after(t)
+        times.append(t)
+    return times
+
+
+def test_lists_ranges_and_steps():
+    assert _parse_field('1,5,9', 0, 59, 'minute') == {1, 5, 9}
+    assert _parse_field('10-13', 0, 59, 'minute') == {10, 11, 12, 13}
+    assert _parse_field('*/15', 0, 59, 'minute') == {0, 15, 30, 45}
+    assert _parse_field('10-20/5', 0, 59, 'minute') == {10, 15, 20}
+    assert _parse_field('50/3', 0, 59, 'minute') == {50, 53, 56, 59}
+    assert _parse_field('1-3,*/20', 0, 59, 'minute') == {0, 1, 2, 3, 20, 40}
+
+
+def test_month_and_day_names():
+    cron = CronExpression('0 9 * jan-mar mon,FRI', UTC)
+    assert cron.months == {1, 2, 3}
+    assert cron.weekdays == {1, 5}
+
+
+def test_sunday_is_zero_or_seven():
+    assert CronExpression('0 0 * * 0', UTC).weekdays == {0}
+    assert CronExpression('0 0 * * 7', UTC).weekdays == {0}
+    assert CronExpression('0 0 * * 5-7', UTC).weekdays == {0, 5, 6}
+    # 2025-06-01 is a Sunday
+    start = datetime(2025, 5, 28, tzinfo=UTC)
+    assert runs('0 0 * * 7', start, 1) == runs('0 0 * * 0', start, 1) == [datetime(2025, 6, 1, tzinfo=UTC)]
+
+
+def test_restricted_day_fields_fire_on_either():
+    # The 13th of the month or any Friday
+    times = runs('0 12 13 * fri', datetime(2025, 6, 1, tzinfo=UTC), 4)
+    assert [t.day for t in times] == [6, 13, 20, 27]
+    # 2025-06-13 is itself a Friday; it fires once
+    assert len(set(times)) == 4
+
+
+def test_star_step_day_field_is_unrestricted():
+    # "*/1" matches every day, so only the weekday restriction applies: Mondays only
+    times = runs('5 4 */1 * mon', datetime(2025, 6, 1, tzinfo=UTC), 3)
+    assert times == [datetime(2025, 6, d, 4, 5, tzinfo=UTC) for d in (2, 9, 16)]
+    # and the other way round: the 1st of every month, whatever the weekday
+    times = runs('0 0 1 * */1', datetime(2025, 6, 1, tzinfo=UTC), 2)
+    assert times == [datetime(2025, 7, 1, tzinfo=UTC), datetime(2025, 8, 1, tzinfo=UTC)]
+
+
+def test_macros_and_minute_steps():
+    assert runs('@hourly', datetime(2025, 6, 1, 10, 30, tzinfo=UTC), 2) == [
+        datetime(2025, 6, 1, 11, tzinfo=UTC), datetime(2025, 6, 1, 12, tzinfo=UTC)]
+    assert runs('*/20 * * * *', datetime(2025, 6, 1, 10, 0, tzinfo=UTC), 3) == [
+        datetime(2025, 6, 1, 10, m, tzinfo=UTC) for m in (20, 40)] + [datetime(2025, 6, 1, 11, tzinfo=UTC)]
+
+
+def test_leap_day_and_impossible_dates():
+    assert CronExpression('0 0 29 2 *', UTC).next_after(datetime(2025, 3, 1, tzinfo=UTC)) == \
+        datetime(2028, 2, 29, tzinfo=UTC)
+    assert CronExpression('0 0 30 2 *', UTC).next_after(datetime(2025, 1, 1, tzinfo=UTC)) is None
+    assert CronExpression('0 0 31 4,6 *', UTC).next_after(datetime(2025, 1, 1, tzinfo=UTC)) is None
+
+
+@pytest.mark.parametrize('expression', [
+    '* * * *',
+    '* * * * * *',
+    '60 * * * *',
+    '* 24 * * *',
+    '* * 0 * *',
+    '* * * 13 *',
+    '* * * * 8',
+    '*/0 * * * *',
+    '5-1 * * * *',
+    '1,,2 * * * *',
+    '* * * foo *',
+])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression, UTC)
+
+
+def test_dst_gap_is_skipped():
+    # 2025-03-09 02:00 EST jumps to 03:00 EDT; 02:30 does not exist that day
+    start = datetime(2025, 3, 8, 12, tzinfo=NEW_YORK)
+    times = runs('30 2 * * *', start, 2, NEW_YORK)
+    assert [t.replace(tzinfo=None) for t in times] == [datetime(2025, 3, 10, 2, 30), datetime(2025, 3, 11, 2, 30)]
+
+
+def test_dst_overlap_fires_once():
+    # 2025-11-02 02:00 EDT falls back to 01:00 EST; 01:30 happens twice that day
+    start = datetime(2025, 11, 2, 0, 0, tzinfo=NEW_YORK)
+    times = runs('30 1 * * *', start, 2, NEW_YORK)
+    assert [t.replace(tzinfo=None) for t in times] == [datetime(2025, 11, 2, 1, 30), datetime(2025, 11, 3, 1, 30)]
+    assert times[0].utcoffset() == timedelta(hours=-4)
+
+    # Starting from inside the repeated hour (01:15 EST, after the first
+    # 01:30 EDT already passed) does not fire 01:30 again
+    inside = datetime(2025, 11, 2, 6, 15, tzinfo=UTC)
+    assert inside.astimezone(NEW_YORK).replace(tzinfo=None) == datetime(2025, 11, 2, 1, 15)
+    nxt = CronExpression('30 1 * * *', NEW_YORK).next_after(inside)
+    assert nxt.replace(tzinfo=None) == datetime(2025, 11, 3, 1, 30)
+
+    # Every-minute schedules keep moving forward in real time through the overlap
+    times = runs('*/30 * * * *', datetime(2025, 11, 2, 5, 0, tzinfo=UTC), 4, NEW_YORK)
+    assert all(b > a for a, b in zip(times, times[1:]))
@@ -0,0 +1,104 @@
+"""Tests for the NDJSON message export route."""
+
+import gzip
+import json
+
+import pytest
+
+from fake_gmail import FakeGmailService, build_fetcher
+
+from app.routes import gmail as gmail_routes
+
+STORE_FILES = ['messages.json', 'messages.db']
+
+
+def make_messages():
+    """Four messages over three timestamps, stored out of order, m3 a near duplicate of m1."""
+    timestamps = {'m1': '2025-01-01T08:00:00Z', 'm2': '2025-01-02T08:00:00Z',
+                  'm3': '2025-01-02T08:00:00Z', 'm4': '2025-01-03T08:00:00Z'}
+    clusters = {'m3': 'm1'}
+    return [{'messageId': message_id, 'subject': f'Subject {message_id}', 'sender': 'a@example.com',
+             'date': '', 'retrievalTimestamp': timestamps[message_id], 'body': f'Body {message_id} é',
+             'bodyHash': f'hash-{message_id}', 'clusterId': clusters.get(message_id, message_id)}
+            for message_id in ['m4', 'm2', 'm1', 'm3']]
+
+
+@pytest.fixture(params=STORE_FILES)
+def client(request, tmp_path):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    fetcher = build_fetcher(FakeGmailService(size=0), str(tmp_path), {
+        'storage_path': str(tmp_path / 'data' / request.param),
+        'search_index': False,
+        'near_duplicate_threshold': None
+    })
+    db = fetcher._get_messages_db()
+    try:
+        db.insert_many(make_messages())
+    finally:
+        db.close()
+
+    app.dependency_overrides[gmail_routes.shared_fetcher] = lambda: fetcher
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(gmail_routes.shared_fetcher, None)
+
+
+def parse_ndjson(data: bytes):
+    text = data.decode('utf-8')
+    # One JSON object per line, each line terminated
+    assert text.endswith('\n')
+    return [json.loads(line) for line in text.split('\n')[:-1]]
+
+
+def test_export_streams_ndjson_oldest_first(client):
+    response = client.get('/api/gmail/messages/export')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    assert response.headers['content-disposition'] == 'attachment; filename="messages.ndjson"'
+    assert 'content-encoding' not in response.headers
+
+    messages = parse_ndjson(response.content)
+    assert [message['messageId'] for message in messages] == ['m1', 'm2', 'm3', 'm4']
+    assert messages[0]['body'] == 'Body m1 é'
+
+
+def test_export_gzip(client):
+    with client.stream('GET', '/api/gmail/messages/export', params={'gzip': 'true'}) as response:
+        assert response.status_code == 200
+        assert response.headers['content-encoding'] == 'gzip'
+        raw = b''.join(response.iter_raw())
+
+    # The body is a single gzip member holding the same NDJSON
+    messages = parse_ndjson(gzip.decompress(raw))
+    assert [message['messageId'] for message in messages] == ['m1', 'm2', 'm3', 'm4']
+
+
+def test_export_since_and_without_bodies(client):
+    response = client.get('/api/gmail/messages/export',
+                          params={'since': '2025-01-02T08:00:00Z', 'include_body': 'false'})
+    messages = parse_ndjson(response.content)
+    assert [message['messageId'] for message in messages] == ['m2', 'm3', 'm4']
+    assert all('body' not in message for message in messages)
+    assert messages[0]['subject'] == 'Subject m2'
+
+
+def test_export_near_dedupe(client):
+    response = client.get('/api/gmail/messages/export', params={'dedupe': 'near'})
+    assert [message['messageId'] for message in parse_ndjson(response.content)] == ['m1', 'm2', 'm4']
+
+
+def test_export_empty_store(tmp_path):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    fetcher = build_fetcher(FakeGmailService(size=0), str(tmp_path), {'search_index': False})
+    app.dependency_overrides[gmail_routes.shared_fetcher] = lambda: fetcher
+    try:
+        response = TestClient(app).get('/api/gmail/messages/export', params={'gzip': 'true'})
+        assert response.status_code == 200
+        assert response.content == b''
+    finally:
+        app.dependency_overrides.pop(gmail_routes.shared_fetcher, None)
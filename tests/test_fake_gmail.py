@@ -0,0 +1,194 @@
+from fake_gmail import FakeGmailService, MailboxSpec, build_fetcher
+
+def test_fetch_from_fake_mailbox(tmp_path):
+    service = FakeGmailService(MailboxSpec(
+        size=250,
+        body_size=300,
+        mime_mix={'plain': 1, 'html': 1, 'alternative': 1},
+        relist_rate=0.05,
+        rate_limit_rate=0.05,
+        seed=1
+    ))
+    fetcher = build_fetcher(service, str(tmp_path), {'batch_size': 50, 'list_page_size': 100})
+
+    result = fetcher.fetch_recent_emails()
+    assert result['status'] == 'success'
+    assert result['processed'] == 250
+    assert fetcher.get_message_stats()['total_messages'] == 250
+
+    # A second run lists everything again but downloads nothing
+    gets = service.calls['messages.get']
+    result = fetcher.fetch_recent_emails()
+    assert result['processed'] == 0
+    assert service.calls['messages.get'] == gets
+
+def test_incremental_sync_from_fake_history(tmp_path):
+    service = FakeGmailService(size=40, body_size=200)
+    fetcher = build_fetcher(service, str(tmp_path), {'sync_mode': 'incremental'})
+    assert fetcher.fetch_recent_emails()['processed'] == 40
+
+    service.add_messages(5)
+    result = fetcher.fetch_recent_emails()
+    assert result['sync_mode'] == 'incremental'
+    assert result['processed'] == 5
+    assert service.calls['messages.list'] == 1
+
+def test_full_and_raw_formats_store_the_same_body(tmp_path):
+    spec = MailboxSpec(size=20, body_size=200, mime_mix={'plain': 1, 'html': 1, 'alternative': 1, 'mixed': 1})
+    bodies = {}
+    for message_format in ('full', 'raw'):
+        fetcher = build_fetcher(FakeGmailService(spec), str(tmp_path / message_format),
+                                {'message_format': message_format})
+        assert fetcher.fetch_recent_emails()['processed'] == 20
+        bodies[message_format] = {message['messageId']: message['body']
+                                  for message in fetcher.get_stored_messages(limit=20)}
+
+    assert bodies['full'] == bodies['raw']
+    # Only the plain alternative is kept, and attachments are skipped
+    assert not any('<html>' in body for body in bodies['full'].values() if body.startswith('Message'))
+
+def test_html_bodies_normalize_without_markup_or_tracking(tmp_path):
+    from app.services.html_normalizer import get_html_normalizer
+    normalizer = get_html_normalizer()
+    first = '<p>Sale <a href="https://shop.example/x?u=1">now</a></p><p>Unsubscribe</p>'
+    second = '<div>Sale <a href="https://shop.example/x?u=2">now</a></div><!-- id 2 -->'
+    assert normalizer.normalize(first) == normalizer.normalize(second) == 'Sale now'
+
+    spec = MailboxSpec(size=10, body_size=200, mime_mix={'html': 1})
+    fetcher = build_fetcher(FakeGmailService(spec), str(tmp_path), {'storage_path': str(tmp_path / 'messages.db')})
+    fetcher.fetch_recent_emails()
+    messages = fetcher.get_stored_messages(limit=10)
+    assert all(message['body'].startswith('<html>') and message['normalizedHash'] for message in messages)
+    # The search index holds the text, not the markup
+    assert fetcher.search_messages('html') == []
+    assert len(fetcher.search_messages('message')) == 10
+
+def test_near_duplicates_share_a_cluster(tmp_path):
+    spec = MailboxSpec(size=60, body_size=400, duplicate_rate=0.3)
+    fetcher = build_fetcher(FakeGmailService(spec), str(tmp_path), {'storage_path': str(tmp_path / 'messages.db')})
+    fetcher.fetch_recent_emails()
+
+    messages = fetcher.get_stored_messages(limit=60, include_body=False)
+    clusters = {}
+    for message in messages:
+        clusters.setdefault(message['clusterId'], set()).add(message['normalizedHash'])
+    # The fake's distinct bodies are unrelated random texts, so only its copies cluster
+    assert len(clusters) == len({message['normalizedHash'] for message in messages}) < 60
+
+    distinct = fetcher.get_stored_messages(limit=10, include_body=False, dedupe='near')
+    following = fetcher.get_stored_messages(limit=60, include_body=False, dedupe='near',
+                                            before=(distinct[-1]['retrievalTimestamp'], distinct[-1]['messageId']))
+    exported = list(fetcher.export_messages(include_body=False, dedupe='near'))
+    assert len(distinct) == 10
+    assert {m['messageId'] for m in distinct + following} == {m['messageId'] for m in exported} == set(clusters)
+
+def test_edited_newsletter_copies_cluster(tmp_path):
+    import random
+    from app.services.message_store import open_message_store
+
+    rng = random.Random(7)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    def line():
+        return ' '.join(rng.choice(vocabulary) for _ in range(12))
+    story = [line() for _ in range(30)]
+
+    def issue(message_id, header, footer, edits=()):
+        lines = list(story)
+        for index in edits:
+            lines[index] = line()
+        body = '\n'.join([header] + lines + [footer])
+        return {'messageId': message_id, 'subject': 'Daily', 'sender': 'news@example.com', 'date': '',
+                'retrievalTimestamp': f"2025-01-01T00:00:0{message_id[-1]}Z", 'body': body, 'bodyHash': message_id}
+
+    store = open_message_store(str(tmp_path / 'messages.db'))
+    try:
+        messages = [
+            issue('m1', 'Playbook edition', 'Sent to a@example.com'),
+            # Other lists of the same publisher: new header and footer, a few lines rewritten
+            issue('m2', 'Morning briefing', 'Sent to b@example.com', edits=(3, 11, 19)),
+            issue('m3', 'Weekend read', 'Forwarded by a friend', edits=(0, 5, 8, 14, 22, 29)),
+            {**issue('m4', 'Playbook edition', 'Sent to a@example.com'), 'body': '\n'.join(line() for _ in range(32))}
+        ]
+        store.insert_many(messages)
+        assert [message['clusterId'] for message in messages] == ['m1', 'm1', 'm1', 'm4']
+        page = store.get_distinct_page(10, include_body=False)
+        assert [message['messageId'] for message in page] == ['m4', 'm1']
+    finally:
+        store.close()
+
+def test_deleted_message_does_not_hold_back_the_checkpoint(tmp_path):
+    service = FakeGmailService(size=20, body_size=200)
+    fetcher = build_fetcher(service, str(tmp_path), {'sync_mode': 'incremental'})
+    fetcher.fetch_recent_emails()
+
+    service.add_messages(5)
+    service.delete_message(service.message_id(22))
+    result = fetcher.fetch_recent_emails()
+    assert result['processed'] == 4
+    assert fetcher._load_history_checkpoint() == '1025'
+
+    # The next run starts after the deleted message instead of replaying it
+    service.add_messages(1)
+    gets = service.calls['messages.get']
+    assert fetcher.fetch_recent_emails()['processed'] == 1
+    assert service.calls['messages.get'] == gets + 1
+
+def test_history_sync_checks_sender_before_downloading(tmp_path):
+    service = FakeGmailService(size=10, body_size=200, senders=('news@example.com', 'other@example.com'))
+    fetcher = build_fetcher(service, str(tmp_path), {'sync_mode': 'incremental',
+                                                     'sender_whitelist': ['news@example.com']})
+    fetcher.fetch_recent_emails()
+
+    service.add_messages(10)
+    full_gets = service.calls['messages.get:full']
+    result = fetcher.fetch_recent_emails()
+    assert result['sync_mode'] == 'incremental'
+    assert result['processed'] == 5
+    assert service.calls['messages.get:metadata'] == 10
+    assert service.calls['messages.get:full'] == full_gets + 5
+
+def test_failed_account_does_not_mark_unstored_messages_as_known(tmp_path):
+    healthy = FakeGmailService(size=30, body_size=200)
+    failing = FakeGmailService(MailboxSpec(size=30, body_size=200, first_id=1000))
+    # The second listing page of one account is rejected partway through the run
+    failing.list_failure_offset = 10
+    fetcher = build_fetcher({'first': healthy, 'second': failing}, str(tmp_path),
+                            {'list_page_size': 10, 'max_concurrent_accounts': 2})
+
+    result = fetcher.fetch_recent_emails()
+    assert result['status'] == 'partial'
+    assert result['accounts']['first']['processed'] == 30
+    assert result['accounts']['second']['status'] == 'error'
+    assert fetcher.get_message_stats()['total_messages'] == 30
+
+    # The first page of the failed account was downloaded but never stored;
+    # the next run must fetch it again rather than skip it as known
+    failing.list_failure_offset = None
+    result = fetcher.fetch_recent_emails()
+    assert result['status'] == 'success'
+    assert result['accounts']['first']['processed'] == 0
+    assert result['accounts']['second']['processed'] == 30
+    assert fetcher.get_message_stats()['total_messages'] == 60
+
+def test_capped_runs_do_not_leak_the_listing_thread(tmp_path):
+    import threading
+    import time
+
+    def read_ahead_threads():
+        return [thread for thread in threading.enumerate() if thread.name == 'gmail-read-ahead']
+
+    def slow_consumer(stage, count):
+        # Give the lister time to read the last page and finish
+        if stage == 'listed':
+            time.sleep(0.2)
+
+    # Two pages; the capped run stops after the first
+    service = FakeGmailService(size=20, body_size=200)
+    fetcher = build_fetcher(service, str(tmp_path), {'list_page_size': 10, 'max_messages_per_run': 10})
+    for _ in range(3):
+        assert fetcher.fetch_recent_emails(progress=slow_consumer)['total_found'] == 10
+
+    deadline = time.monotonic() + 2
+    while read_ahead_threads() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert read_ahead_threads() == []
@@ -0,0 +1,91 @@
+"""Tests for the cached readiness checks and /api/gmail/health."""
+
+import threading
+import time
+
+from fake_gmail import FakeGmailService, build_fetcher
+
+from app.services import health as health_module
+from app.services.health import HealthMonitor
+
+
+class CountingMonitor(HealthMonitor):
+    """HealthMonitor whose checks return a fixed status and count their calls."""
+
+    def __init__(self, ttl, status='healthy'):
+        super().__init__(ttl)
+        self.status = status
+        self.checks = 0
+        self.checked = threading.Event()
+
+    def _check(self):
+        self.checks += 1
+        self.checked.set()
+        return {'status': self.status, 'configured': self.status != 'unhealthy', 'checks': {}}
+
+
+def test_result_is_cached_for_the_ttl():
+    monitor = CountingMonitor(ttl=60)
+    first = monitor.get()
+    assert monitor.get() is first
+    assert monitor.checks == 1
+
+    # Stale once the TTL has passed
+    monitor.checked_at -= 61
+    monitor.status = 'degraded'
+    assert monitor.get()['status'] == 'degraded'
+    assert monitor.checks == 2
+
+
+def test_background_refresh_keeps_the_result_fresh():
+    monitor = CountingMonitor(ttl=0.05)
+    monitor.start()
+    try:
+        assert monitor.checked.wait(2)
+        deadline = time.monotonic() + 2
+        while monitor.checks < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Refreshed without anyone asking
+        assert monitor.checks >= 3
+    finally:
+        monitor.stop()
+    assert not monitor.thread.is_alive()
+    checks = monitor.checks
+    time.sleep(0.15)
+    assert monitor.checks == checks
+
+
+def test_checks_from_local_state(tmp_path, monkeypatch):
+    fetcher = build_fetcher(FakeGmailService(size=0), str(tmp_path))
+    monkeypatch.setattr(health_module, 'get_gmail_fetcher', lambda: fetcher)
+    monitor = HealthMonitor()
+
+    fetcher.last_run = {'status': 'success', 'finished_at': '2025-01-01T00:00:00Z', 'message': None}
+    result = monitor.refresh()
+    assert result['status'] == 'healthy'
+    assert result['checks']['token'] == {'ok': True, 'state': 'not_initialized', 'expiry': None}
+
+    fetcher.last_run = {'status': 'error', 'finished_at': '2025-01-01T00:00:00Z', 'message': 'quota exceeded'}
+    result = monitor.refresh()
+    assert result['status'] == 'degraded'
+    assert result['checks']['last_fetch']['message'] == 'quota exceeded'
+
+    fetcher.accounts[0].credentials_data.pop('refresh_token')
+    result = monitor.refresh()
+    assert result['status'] == 'unhealthy'
+    assert result['configured'] is False
+    assert 'Missing required Gmail credentials' in result['error']
+
+
+def test_health_route_status_codes(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.routes import gmail as gmail_routes
+
+    client = TestClient(app)
+    for status, code in (('healthy', 200), ('degraded', 200), ('unhealthy', 503)):
+        monitor = CountingMonitor(ttl=60, status=status)
+        monkeypatch.setattr(gmail_routes, 'get_health_monitor', lambda: monitor)
+        response = client.get('/api/gmail/health')
+        assert response.status_code == code
+        assert response.json()['status'] == status
@@ -0,0 +1,112 @@
+"""Tests for background fetch jobs and the /jobs routes."""
+
+import threading
+import time
+
+from fake_gmail import FakeGmailService, build_fetcher
+
+from app.services.jobs import JobManager
+
+
+def wait_until_finished(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while job.active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_job_runs_in_the_background_with_progress():
+    manager = JobManager()
+    release = threading.Event()
+
+    def run(progress):
+        progress('listed', 10)
+        progress('fetched', 7)
+        progress('fetched', 3)
+        release.wait(5)
+        return {'status': 'success', 'processed': 10}
+
+    job = manager.submit('fetch', run)
+    try:
+        # submit() returns before the job finishes
+        assert job.active
+        assert manager.get(job.id) is job
+        # Only one fetch at a time: the active job is returned again
+        assert manager.submit('fetch', run) is job
+    finally:
+        release.set()
+
+    state = wait_until_finished(job).to_dict()
+    assert state['status'] == 'succeeded'
+    assert state['progress'] == {'listed': 10, 'fetched': 10, 'stored': 0}
+    assert state['result'] == {'status': 'success', 'processed': 10}
+    assert state['started_at'] and state['finished_at'] and state['error'] is None
+
+    # Once finished a new submission starts a new job
+    assert manager.submit('fetch', lambda progress: {'status': 'success', 'processed': 0}) is not job
+    manager.shutdown()
+
+
+def test_failed_jobs():
+    manager = JobManager()
+    error_result = wait_until_finished(manager.submit(
+        'fetch', lambda progress: {'status': 'error', 'message': 'quota exceeded'}))
+    assert error_result.status == 'failed'
+    assert error_result.error == 'quota exceeded'
+
+    def crash(progress):
+        raise RuntimeError('store is locked')
+
+    crashed = wait_until_finished(manager.submit('fetch', crash))
+    assert crashed.status == 'failed'
+    assert crashed.error == 'store is locked'
+    assert crashed.result is None and crashed.finished_at
+    manager.shutdown()
+
+
+def test_history_keeps_the_most_recent_jobs():
+    manager = JobManager(history_size=3)
+    jobs = [wait_until_finished(manager.submit('fetch', lambda progress: {'status': 'success', 'processed': 0}))
+            for _ in range(5)]
+    assert list(manager.jobs) == [job.id for job in jobs[2:]]
+    assert manager.get(jobs[0].id) is None
+    manager.shutdown()
+
+
+def test_job_routes(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.routes import gmail as gmail_routes
+
+    manager = JobManager()
+    monkeypatch.setattr(gmail_routes, 'get_job_manager', lambda: manager)
+    fetcher = build_fetcher(FakeGmailService(size=25, body_size=200), str(tmp_path))
+    app.dependency_overrides[gmail_routes.shared_fetcher] = lambda: fetcher
+    try:
+        client = TestClient(app)
+        response = client.post('/api/gmail/fetch')
+        assert response.status_code == 202
+        job_id = response.json()['job_id']
+        assert response.json()['kind'] == 'fetch'
+
+        wait_until_finished(manager.get(job_id))
+        response = client.get(f'/api/gmail/jobs/{job_id}')
+        assert response.status_code == 200
+        status = response.json()
+        assert status['status'] == 'succeeded'
+        assert status['result']['processed'] == 25
+        assert status['progress']['stored'] == 25
+
+        # A failed run is reported with its error
+        fetcher.fetcher_settings['message_format'] = 'bogus'
+        job_id = client.post('/api/gmail/fetch').json()['job_id']
+        wait_until_finished(manager.get(job_id))
+        status = client.get(f'/api/gmail/jobs/{job_id}').json()
+        assert status['status'] == 'failed'
+        assert status['error'] and status['result']['status'] == 'error'
+
+        response = client.get('/api/gmail/jobs/does-not-exist')
+        assert response.status_code == 404
+    finally:
+        app.dependency_overrides.pop(gmail_routes.shared_fetcher, None)
+        manager.shutdown()
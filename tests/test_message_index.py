@@ -0,0 +1,90 @@
+"""Tests for the messageId sidecar index of the JSON store."""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from tinydb import TinyDB
+
+from app.services.message_index import MessageIdIndex
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / 'messages.json')
+
+
+@pytest.fixture
+def db(store_path):
+    db = TinyDB(store_path)
+    db.insert_multiple([{'messageId': 'm1'}, {'messageId': 'm2'}, {'subject': 'no id'}])
+    yield db
+    db.close()
+
+
+def saved_index(store_path, ids):
+    """Save a sidecar for the current store holding ``ids`` and return the path it was written to."""
+    index = MessageIdIndex(store_path)
+    index.rebuild(ids)
+    index.save()
+    return index.index_path
+
+
+def load(store_path, db):
+    return MessageIdIndex(store_path).load(db)
+
+
+def test_missing_sidecar_is_built_from_the_store(store_path, db):
+    index = load(store_path, db)
+    assert index.ids == {'m1', 'm2'}
+    assert 'm1' in index and 'm3' not in index
+    assert len(index) == 2
+
+
+def test_save_stamps_the_store_signature(store_path, db):
+    path = saved_index(store_path, ['m1', 'm2'])
+    store_stat = os.stat(store_path)
+    with open(path) as f:
+        data = json.load(f)
+    assert data == {'source': {'size': store_stat.st_size, 'mtime_ns': store_stat.st_mtime_ns},
+                    'ids': ['m1', 'm2']}
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_sidecar_is_reused_while_the_store_is_unchanged(store_path, db):
+    # The sidecar's ids differ from the store's, so a rebuild would show
+    saved_index(store_path, ['m1', 'sidecar-only'])
+    assert load(store_path, db).ids == {'m1', 'sidecar-only'}
+
+
+def test_rebuilds_when_the_store_size_changes(store_path, db):
+    saved_index(store_path, ['m1', 'm2'])
+    db.insert({'messageId': 'm3'})
+    assert load(store_path, db).ids == {'m1', 'm2', 'm3'}
+
+
+def test_rebuilds_when_only_the_store_mtime_changes(store_path, db):
+    saved_index(store_path, ['m1', 'sidecar-only'])
+    store_stat = os.stat(store_path)
+    os.utime(store_path, ns=(store_stat.st_atime_ns, store_stat.st_mtime_ns + 10 ** 9))
+    assert os.stat(store_path).st_size == store_stat.st_size
+    assert load(store_path, db).ids == {'m1', 'm2'}
+
+
+@pytest.mark.parametrize('content', ['{not json', '["m1", "m2"]'])
+def test_rebuilds_when_the_sidecar_is_unreadable(store_path, db, content):
+    path = saved_index(store_path, ['sidecar-only'])
+    with open(path, 'w') as f:
+        f.write(content)
+    assert load(store_path, db).ids == {'m1', 'm2'}
+
+
+def test_rebuilt_index_is_reused_after_saving(store_path, db):
+    index = load(store_path, db)
+    index.add('m3')
+    index.save()
+    assert load(store_path, db).ids == {'m1', 'm2', 'm3'}
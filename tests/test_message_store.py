@@ -0,0 +1,165 @@
+"""Tests for the message store backends."""
+
+import base64
+import os
+import stat
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from app.services.message_store import AtomicJSONStorage, decode_cursor, encode_cursor, open_message_store, sort_key
+
+STORE_FILES = ['messages.json', 'messages.db']
+
+
+def make_messages():
+    """Nine messages over four timestamps, most of them shared, with two near-duplicate clusters."""
+    timestamps = ['2025-01-01T08:00:00Z'] * 3 + ['2025-01-01T09:00:00Z'] * 2 + \
+        ['2025-01-02T07:30:00Z'] * 3 + ['2025-01-03T00:00:00Z']
+    clusters = {'m2': 'm1', 'm3': 'm1', 'm6': 'm5', 'm8': 'm5'}
+    return [{'messageId': f'm{i}', 'subject': f'Subject {i}', 'sender': 'a@example.com', 'date': '',
+             'retrievalTimestamp': timestamp, 'body': f'Body {i}', 'bodyHash': f'hash{i}',
+             'clusterId': clusters.get(f'm{i}', f'm{i}')}
+            for i, timestamp in enumerate(timestamps, 1)]
+
+
+@pytest.fixture(params=STORE_FILES)
+def store(request, tmp_path):
+    store = open_message_store(str(tmp_path / request.param), search=False, near_threshold=None)
+    store.insert_many(make_messages())
+    yield store
+    store.close()
+
+
+def ids(messages):
+    return [message['messageId'] for message in messages]
+
+
+def newest_first(messages):
+    return ids(sorted(messages, key=sort_key, reverse=True))
+
+
+def test_atomic_json_write_keeps_file_mode(tmp_path):
+    path = str(tmp_path / 'messages.json')
+    storage = AtomicJSONStorage(path)
+    os.chmod(path, 0o644)
+    storage.write({'_default': {}})
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    assert storage.read() == {'_default': {}}
+
+    os.chmod(path, 0o640)
+    storage.write({'_default': {'1': {'messageId': 'm1'}}})
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+
+def test_atomic_json_new_file_uses_umask(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        path = str(tmp_path / 'new.json')
+        AtomicJSONStorage(path).write({})
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+
+
+def test_pages_walk_back_and_forth_through_timestamp_ties(store):
+    expected = newest_first(make_messages())
+    assert ids(store.get_page(limit=100)) == expected
+
+    # Older pages with "before", following the last message of each page
+    pages = [store.get_page(limit=2)]
+    while len(pages[-1]) == 2:
+        pages.append(store.get_page(limit=2, before=sort_key(pages[-1][-1])))
+    assert [message_id for page in pages for message_id in ids(page)] == expected
+    assert [len(page) for page in pages] == [2, 2, 2, 2, 1]
+
+    # Newer pages with "after", from the oldest page back to the first;
+    # every page is still ordered newest first
+    back = [pages[-1]]
+    while True:
+        page = store.get_page(limit=2, after=sort_key(back[-1][0]))
+        if not page:
+            break
+        back.append(page)
+    assert [message_id for page in reversed(back) for message_id in ids(page)] == expected
+    assert [ids(page) for page in back[1:]] == [ids(page) for page in reversed(pages[:-1])]
+
+
+def test_page_between_cursors_and_without_bodies(store):
+    messages = {message['messageId']: message for message in make_messages()}
+    page = store.get_page(limit=10, before=sort_key(messages['m7']), after=sort_key(messages['m2']),
+                          include_body=False)
+    # m6 shares m7's timestamp but sorts before it by id; m3 likewise after m2
+    assert ids(page) == ['m6', 'm5', 'm4', 'm3']
+    assert not any('body' in message for message in page)
+
+
+def test_distinct_pages_skip_cluster_members(store):
+    expected = [message_id for message_id in newest_first(make_messages())
+                if message_id in ('m1', 'm4', 'm5', 'm7', 'm9')]
+    first = store.get_distinct_page(limit=2)
+    assert ids(first) == expected[:2]
+    second = store.get_distinct_page(limit=2, before=sort_key(first[-1]))
+    third = store.get_distinct_page(limit=2, before=sort_key(second[-1]))
+    assert ids(first + second + third) == expected
+    # Back from the last page
+    assert ids(store.get_distinct_page(limit=2, after=sort_key(third[0]))) == ids(second)
+
+
+def test_cursor_round_trip():
+    message = {'messageId': 'id|with|pipes', 'retrievalTimestamp': '2025-01-01T08:00:00Z'}
+    cursor = encode_cursor(message)
+    assert decode_cursor(cursor) == ('2025-01-01T08:00:00Z', 'id|with|pipes')
+
+
+@pytest.mark.parametrize('cursor', [
+    'abc',  # bad padding
+    '!!!!',  # no base64 characters at all
+    base64.urlsafe_b64encode(b'no separator').decode('ascii'),
+    base64.urlsafe_b64encode(b'\xff\xfe|x').decode('ascii'),  # not UTF-8
+    'caf\u00e9',  # not ASCII
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('store_file', STORE_FILES)
+def test_messages_route_cursors(tmp_path, store_file):
+    from fastapi.testclient import TestClient
+    from fake_gmail import FakeGmailService, build_fetcher
+    from app.main import app
+    from app.routes.gmail import shared_fetcher
+
+    fetcher = build_fetcher(FakeGmailService(size=0), str(tmp_path),
+                            {'storage_path': str(tmp_path / store_file), 'search_index': False})
+    store = fetcher._get_messages_db()
+    store.insert_many(make_messages())
+    store.close()
+
+    app.dependency_overrides[shared_fetcher] = lambda: fetcher
+    try:
+        client = TestClient(app)
+        seen = []
+        response = client.get('/api/gmail/messages', params={'limit': 4})
+        while True:
+            assert response.status_code == 200
+            seen.extend(ids(response.json()))
+            if 'X-Next-Cursor' not in response.headers:
+                break
+            response = client.get('/api/gmail/messages',
+                                  params={'limit': 4, 'before': response.headers['X-Next-Cursor']})
+        assert seen == newest_first(make_messages())
+
+        previous = client.get('/api/gmail/messages', params={'limit': 4, 'after': response.headers['X-Prev-Cursor']})
+        assert ids(previous.json()) == seen[4:8]
+
+        for name in ('before', 'after'):
+            response = client.get('/api/gmail/messages', params={name: 'not a cursor'})
+            assert response.status_code == 400
+            assert 'Invalid cursor' in response.json()['detail']
+    finally:
+        app.dependency_overrides.pop(shared_fetcher, None)
@@ -0,0 +1,130 @@
+"""Tests for body extraction from Gmail full payloads and raw RFC 822 messages."""
+
+import base64
+import os
+import sys
+from email.mime.application import MIMEApplication
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from app.services.mime_parser import extract_payload_body, parse_raw_message
+
+PLAIN = 'Plain body'
+HTML = '<p>HTML body</p>'
+
+
+def b64url(data: bytes) -> str:
+    # Gmail sends unpadded base64url
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def text_part(mime_type, data: bytes, charset='utf-8', filename=''):
+    part = {
+        'mimeType': mime_type,
+        'filename': filename,
+        'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="{charset}"'}],
+        'body': {'size': len(data), 'data': b64url(data)}
+    }
+    if filename:
+        part['headers'].append({'name': 'Content-Disposition', 'value': f'attachment; filename="{filename}"'})
+    return part
+
+
+def multipart(mime_type, *parts):
+    return {'mimeType': mime_type, 'filename': '', 'headers': [], 'body': {'size': 0}, 'parts': list(parts)}
+
+
+def raw(message) -> str:
+    return b64url(message.as_bytes())
+
+
+def nested_payload():
+    """mixed > related > alternative (plain, html), an inline image and a text attachment."""
+    image = {'mimeType': 'image/png', 'filename': 'logo.png', 'headers': [],
+             'body': {'size': 10, 'attachmentId': 'att-1'}}
+    return multipart(
+        'multipart/mixed',
+        multipart('multipart/related',
+                  multipart('multipart/alternative',
+                            text_part('text/plain', PLAIN.encode()),
+                            text_part('text/html', HTML.encode())),
+                  image),
+        text_part('text/plain', b'attached notes', filename='notes.txt'))
+
+
+def nested_raw():
+    alternative = MIMEMultipart('alternative')
+    alternative.attach(MIMEText(PLAIN, 'plain', 'utf-8'))
+    alternative.attach(MIMEText(HTML, 'html', 'utf-8'))
+    related = MIMEMultipart('related')
+    related.attach(alternative)
+    related.attach(MIMEApplication(b'\x89PNG', 'png'))
+    message = MIMEMultipart('mixed')
+    message['Subject'] = 'Nested'
+    message.attach(related)
+    attachment = MIMEText('attached notes', 'plain', 'utf-8')
+    attachment.add_header('Content-Disposition', 'attachment', filename='notes.txt')
+    message.attach(attachment)
+    return raw(message)
+
+
+@pytest.mark.parametrize('preference, expected', [('plain', PLAIN), ('html', HTML)])
+def test_nested_alternative_selection(preference, expected):
+    assert extract_payload_body(nested_payload(), preference) == expected
+    assert parse_raw_message(nested_raw(), preference)[1] == expected
+
+
+def test_alternative_prefers_html_wrapped_in_related():
+    payload = multipart(
+        'multipart/alternative',
+        text_part('text/plain', PLAIN.encode()),
+        multipart('multipart/related', text_part('text/html', HTML.encode()),
+                  {'mimeType': 'image/gif', 'filename': 'a.gif', 'headers': [], 'body': {'attachmentId': 'x'}}))
+    assert extract_payload_body(payload, 'html') == HTML
+    assert extract_payload_body(payload, 'plain') == PLAIN
+
+
+def test_mixed_keeps_every_inline_text_part():
+    payload = multipart('multipart/mixed', text_part('text/plain', b'first'), text_part('text/plain', b'second'))
+    assert extract_payload_body(payload) == 'first\nsecond'
+
+
+def test_charset_decoding():
+    latin = 'Café crème à 5 €'.encode('iso-8859-15')
+    assert extract_payload_body(text_part('text/plain', latin, 'iso-8859-15')) == 'Café crème à 5 €'
+    assert parse_raw_message(raw(MIMEText('Café crème', 'plain', 'iso-8859-1')))[1] == 'Café crème'
+    # Unknown charsets fall back to UTF-8
+    assert extract_payload_body(text_part('text/plain', 'naïve'.encode(), 'x-unknown')) == 'naïve'
+
+
+def test_max_body_bytes_cut():
+    body = 'é' * 10  # 20 bytes of UTF-8
+    # A cut in the middle of a character drops that character
+    assert extract_payload_body(text_part('text/plain', body.encode()), max_bytes=5) == 'éé'
+    assert parse_raw_message(raw(MIMEText(body, 'plain', 'utf-8')), max_bytes=5)[1] == 'éé'
+    # 0 means unlimited
+    assert extract_payload_body(text_part('text/plain', body.encode()), max_bytes=0) == body
+
+    # The limit covers the whole message: later parts are skipped once it is reached
+    payload = multipart('multipart/mixed', text_part('text/plain', b'abcdef'), text_part('text/plain', b'ghi'))
+    assert extract_payload_body(payload, max_bytes=8) == 'abcdef\ngh'
+    assert extract_payload_body(payload, max_bytes=6) == 'abcdef'
+
+
+def test_raw_headers_are_decoded():
+    message = MIMEText('body', 'plain', 'utf-8')
+    message['Subject'] = '=?utf-8?q?Caf=C3=A9_news?='
+    message['From'] = 'Sender <sender@example.com>'
+    headers, body = parse_raw_message(raw(message))
+    assert headers['subject'] == 'Café news'
+    assert headers['from'] == 'Sender <sender@example.com>'
+    assert body == 'body'
+
+
+def test_unknown_preference_is_rejected():
+    with pytest.raises(ValueError):
+        extract_payload_body(text_part('text/plain', b'x'), 'markdown')
@@ -0,0 +1,109 @@
+"""Tests for the rotating JSON Lines run log."""
+
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from app.services import run_log as run_log_module
+from app.services.run_log import RunLog
+
+
+def record(n, timestamp=None):
+    return {'timestamp': timestamp or datetime.utcnow().isoformat() + 'Z', 'run': n, 'result': {'status': 'success'}}
+
+
+def runs(records):
+    return [entry['run'] for entry in records]
+
+
+def test_rotates_by_size_and_keeps_backup_count(tmp_path):
+    path = str(tmp_path / 'runs.jsonl')
+    line_size = len(json.dumps(record(0)) + '\n')
+    log = RunLog(path, max_bytes=line_size * 3, backup_count=2)
+    for n in range(10):
+        log.append(record(n))
+
+    # Three records per file, newest in the active file
+    assert sorted(os.listdir(tmp_path)) == ['runs.jsonl', 'runs.jsonl.1', 'runs.jsonl.2']
+    with open(path) as f:
+        assert [json.loads(line)['run'] for line in f] == [9]
+    with open(path + '.1') as f:
+        assert [json.loads(line)['run'] for line in f] == [6, 7, 8]
+    assert all(os.path.getsize(name) <= line_size * 3 for name in (path, path + '.1', path + '.2'))
+    # Runs 0-2 were rotated out of the last backup
+    assert runs(log.tail(100)) == list(range(3, 10))
+
+
+def test_rotates_when_the_first_record_is_too_old(tmp_path):
+    path = str(tmp_path / 'runs.jsonl')
+    old = (datetime.utcnow() - timedelta(days=40)).isoformat() + 'Z'
+    with open(path, 'w') as f:
+        f.write(json.dumps(record(0, old)) + '\n')
+
+    log = RunLog(path, max_age_days=30)
+    log.append(record(1))
+    log.append(record(2))
+    assert runs(RunLog(path + '.1').tail(10)) == [0]
+    assert runs(RunLog(path, backup_count=0).tail(10)) == [1, 2]
+
+
+def test_tail_reads_across_rotated_files(tmp_path, monkeypatch):
+    # Small blocks so the backwards scan spans several reads
+    monkeypatch.setattr(run_log_module, 'TAIL_BLOCK_SIZE', 16)
+    path = str(tmp_path / 'runs.jsonl')
+    line_size = len(json.dumps(record(0)) + '\n')
+    log = RunLog(path, max_bytes=line_size * 4, backup_count=3)
+    for n in range(14):
+        log.append(record(n))
+
+    assert runs(log.tail(3)) == [11, 12, 13]
+    # Oldest first, continuing into the backups
+    assert runs(log.tail(7)) == list(range(7, 14))
+    assert runs(log.tail(100)) == list(range(14))
+    assert log.tail(0) == []
+
+
+def test_tail_skips_malformed_lines(tmp_path):
+    path = str(tmp_path / 'runs.jsonl')
+    with open(path, 'w') as f:
+        f.write(json.dumps(record(1)) + '\n{"truncated\n' + json.dumps(record(2)) + '\n')
+    assert runs(RunLog(path).tail(10)) == [1, 2]
+    assert RunLog(str(tmp_path / 'missing.jsonl')).tail(10) == []
+
+
+def test_imports_the_legacy_log_once(tmp_path):
+    path = str(tmp_path / 'runs.jsonl')
+    legacy = str(tmp_path / 'gmail_fetch_log.json')
+    old = datetime.utcnow() - timedelta(days=90)
+    with open(legacy, 'w') as f:
+        json.dump([record(n, (old + timedelta(days=n)).isoformat() + 'Z') for n in range(8)], f)
+
+    # Months-old records do not trigger age rotation while importing
+    log = RunLog(path, backup_count=2)
+    assert log.import_legacy(legacy) == 8
+    assert not os.path.exists(legacy)
+    assert os.path.exists(legacy + '.imported')
+    assert runs(log.tail(10)) == list(range(8))
+    assert not os.path.exists(path + '.1')
+
+    # The first live record rotates the imported ones into a backup
+    log.append(record(8))
+    assert runs(log.tail(10)) == list(range(9))
+    assert runs(RunLog(path, backup_count=0).tail(10)) == [8]
+
+    # Already imported: nothing happens
+    assert log.import_legacy(legacy) == 0
+    assert runs(log.tail(10)) == list(range(9))
+
+
+def test_unreadable_legacy_log_is_set_aside(tmp_path):
+    legacy = str(tmp_path / 'gmail_fetch_log.json')
+    with open(legacy, 'w') as f:
+        f.write('[{"timestamp": ')
+    log = RunLog(str(tmp_path / 'runs.jsonl'))
+    assert log.import_legacy(legacy) == 0
+    assert os.path.exists(legacy + '.imported')
+    assert log.tail(10) == []
@@ -0,0 +1,84 @@
+"""Tests for the scheduler's start/stop lifecycle."""
+
+import os
+import sys
+import threading
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from app.services import scheduler as scheduler_module
+from app.services.scheduler import GmailScheduler
+
+
+class EveryInstant:
+    """Cron stand-in that is due again 20ms after the previous run."""
+
+    expression = 'test'
+
+    def next_after(self, after):
+        return after + timedelta(milliseconds=20)
+
+
+class BlockingFetcher:
+    fetcher_settings = {'schedule': '* * * * *'}
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_restart_during_a_running_job_keeps_a_single_loop(monkeypatch):
+    release = threading.Event()
+    runs = []
+
+    def run_job(progress=None, trigger='manual'):
+        runs.append(threading.current_thread())
+        release.wait(5)
+        return {'status': 'success'}
+
+    monkeypatch.setattr(scheduler_module, 'get_gmail_fetcher', lambda: BlockingFetcher())
+    monkeypatch.setattr(scheduler_module, 'CronExpression', lambda expression, tz=None: EveryInstant())
+    scheduler = GmailScheduler()
+    monkeypatch.setattr(scheduler, '_run_fetch_job', run_job)
+
+    scheduler.start()
+    first_loop = scheduler.thread
+    assert wait_for(lambda: len(runs) == 1)
+
+    # stop() returns at once even though the job is still running
+    started = time.monotonic()
+    scheduler.stop()
+    assert time.monotonic() - started < 0.5
+    assert scheduler.get_next_run_time() is None
+
+    scheduler.start()
+    second_loop = scheduler.thread
+    assert second_loop is not first_loop
+    try:
+        assert wait_for(lambda: len(runs) == 2)
+        release.set()
+        # The first loop finishes its job and exits instead of firing again
+        assert wait_for(lambda: not first_loop.is_alive())
+        count = len(runs)
+        assert wait_for(lambda: len(runs) > count + 3)
+        assert set(runs[1:]) == {second_loop}
+        assert scheduler.get_next_run_time() is not None
+    finally:
+        scheduler.stop()
+    assert wait_for(lambda: not second_loop.is_alive())
+
+
+def test_stop_wakes_a_sleeping_loop(monkeypatch):
+    monkeypatch.setattr(scheduler_module, 'get_gmail_fetcher', lambda: BlockingFetcher())
+    scheduler = GmailScheduler()
+    scheduler.start()
+    loop = scheduler.thread
+    assert scheduler.get_next_run_time() is not None
+    scheduler.stop()
+    assert wait_for(lambda: not loop.is_alive(), timeout=1)
+    assert not scheduler.running
@@ -0,0 +1,140 @@
+"""Tests for access token refresh ahead of expiry."""
+
+import json
+import os
+import stat
+import threading
+import time
+from datetime import datetime, timedelta
+
+from fake_gmail import FakeGmailService, build_fetcher
+from google.oauth2.credentials import Credentials
+
+from app.services.token_manager import DEFAULT_TOKEN_LIFETIME, TokenManager, parse_token_expiry
+
+
+class RefreshingCredentials(Credentials):
+    """Credentials whose refresh issues a new token locally instead of calling Google."""
+
+    def __init__(self, token='token-0', expires_in=3600, lifetime=3600):
+        super().__init__(token=token, refresh_token='refresh')
+        self.expiry = datetime.utcnow() + timedelta(seconds=expires_in) if expires_in is not None else None
+        self.lifetime = lifetime
+        self.refreshes = 0
+
+    def refresh(self, request):
+        # Slow enough for concurrent callers to pile up on the lock
+        time.sleep(0.02)
+        self.refreshes += 1
+        self.token = f'token-{self.refreshes}'
+        self.expiry = datetime.utcnow() + timedelta(seconds=self.lifetime) if self.lifetime is not None else None
+
+
+def test_refresh_is_due_margin_before_expiry():
+    manager = TokenManager(RefreshingCredentials(expires_in=400), refresh_margin=300)
+    assert 95 <= manager.seconds_until_refresh() <= 100
+    # Already inside the margin
+    assert TokenManager(RefreshingCredentials(expires_in=200), refresh_margin=300).seconds_until_refresh() == 0
+    # No token at all
+    assert TokenManager(RefreshingCredentials(token=None)).seconds_until_refresh() == 0
+
+
+def test_unknown_expiry_is_learned_by_one_refresh():
+    manager = TokenManager(RefreshingCredentials(expires_in=None, lifetime=None))
+    assert manager.seconds_until_refresh() == 0
+    manager.refresh()
+    assert manager.seconds_until_refresh() == DEFAULT_TOKEN_LIFETIME
+
+
+def test_get_credentials_refreshes_only_unusable_tokens():
+    credentials = RefreshingCredentials(expires_in=280)
+    manager = TokenManager(credentials, refresh_margin=300)
+    # Inside the margin but still valid: left to the background refresh
+    assert manager.get_credentials().token == 'token-0'
+    credentials.expiry = datetime.utcnow() - timedelta(seconds=1)
+    assert manager.get_credentials().token == 'token-1'
+
+
+def test_concurrent_refreshes_share_one():
+    refreshed = []
+    credentials = RefreshingCredentials()
+    manager = TokenManager(credentials, on_refresh=lambda token, expiry: refreshed.append(token))
+    threads = [threading.Thread(target=manager.refresh) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert credentials.refreshes == 1
+    assert refreshed == ['token-1']
+
+
+def test_background_refresh_and_stop():
+    refreshed = threading.Event()
+    persisted = []
+
+    def on_refresh(token, expiry):
+        persisted.append((token, expiry))
+        refreshed.set()
+
+    # Due now; the new token lasts an hour, so the thread then sleeps
+    credentials = RefreshingCredentials(expires_in=100)
+    manager = TokenManager(credentials, on_refresh=on_refresh, refresh_margin=300)
+    manager.start()
+    try:
+        assert refreshed.wait(2)
+        assert persisted[0][0] == 'token-1'
+        assert 3290 <= manager.seconds_until_refresh() <= 3300
+    finally:
+        started = time.monotonic()
+        manager.stop()
+    # The sleeping thread wakes up for stop() instead of waiting out the hour
+    assert time.monotonic() - started < 1
+    assert not manager.thread.is_alive()
+    assert credentials.refreshes == 1
+
+
+def test_failed_background_refresh_is_retried():
+    credentials = RefreshingCredentials(expires_in=0)
+    attempts = []
+    refresh = credentials.refresh
+
+    def flaky_refresh(request):
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RuntimeError('token endpoint unavailable')
+        refresh(request)
+
+    credentials.refresh = flaky_refresh
+    manager = TokenManager(credentials, retry_interval=0.05)
+    manager.start()
+    try:
+        deadline = time.monotonic() + 2
+        while credentials.refreshes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        manager.stop()
+    assert credentials.refreshes == 1
+    assert attempts[1] - attempts[0] >= 0.05
+
+
+def test_parse_token_expiry():
+    assert parse_token_expiry('2025-01-01T10:00:00Z') == datetime(2025, 1, 1, 10)
+    assert parse_token_expiry('2025-01-01T12:00:00+02:00') == datetime(2025, 1, 1, 10)
+    assert parse_token_expiry('not a date') is None
+    assert parse_token_expiry(None) is None
+
+
+def test_persisted_token_keeps_config_file_mode(tmp_path):
+    fetcher = build_fetcher(FakeGmailService(size=0), str(tmp_path))
+    config_path = os.path.join(fetcher.config_dir, 'gmail.json')
+    os.chmod(config_path, 0o600)
+
+    expiry = datetime(2025, 1, 1, 10)
+    fetcher._update_access_token('new-token', expiry)
+
+    assert stat.S_IMODE(os.stat(config_path).st_mode) == 0o600
+    with open(config_path) as f:
+        credentials = json.load(f)['gmail_credentials']
+    assert credentials['access_token'] == 'new-token'
+    assert credentials['token_expiry'] == expiry.isoformat()
+    assert sorted(os.listdir(fetcher.config_dir)) == ['fetcherSettings.json', 'gmail.json']